@@ -2,7 +2,7 @@ import os
 import sys
 import logging
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from pydantic import BaseModel, ValidationError, Field
 from typing import Any, Dict, Optional, List
 from backend.services.trading_service import TradingService
@@ -109,20 +109,50 @@ class MarketDataRequest(BaseModel):
 
 @api.route('/market/klines', methods=['GET'])
 def get_klines():
-    """ 获取K线数据 """
+    """ 获取K线数据
+
+    format=json（默认）按 cursor/limit 分页返回；format=ndjson 或 binary 流式返回整个时间范围
+    """
     symbol = request.args.get('symbol')
     if not symbol:
         return error_response("缺少必要参数: symbol", 400)
     interval = request.args.get('interval', '1m')
     start_time = request.args.get('start_time')
     end_time = request.args.get('end_time')
+    cursor = request.args.get('cursor')
+    fmt = request.args.get('format', 'json')
+    try:
+        limit = min(max(int(request.args.get('limit', 1000)), 1), 10000)
+    except ValueError:
+        return error_response("参数错误: limit 必须为整数", 400)
     
     try:
+        if fmt in ('ndjson', 'binary'):
+            # 先取第一块，参数错误时仍可返回错误响应
+            chunks = trading_service.stream_klines(
+                symbol=symbol,
+                interval=interval,
+                start_time=start_time,
+                end_time=end_time,
+                cursor=cursor,
+                fmt=fmt
+            )
+            first = next(chunks, b'')
+
+            def generate():
+                yield first
+                yield from chunks
+
+            mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/octet-stream'
+            return Response(stream_with_context(generate()), mimetype=mimetype)
+
         klines = trading_service.get_klines(
             symbol=symbol,
             interval=interval,
             start_time=start_time,
-            end_time=end_time
+            end_time=end_time,
+            cursor=cursor,
+            limit=limit
         )
         return success_response(data=klines, message="K线数据获取成功")
     except Exception as e:
@@ -211,7 +241,8 @@ def run_backtest(strategy_id):
             end_date=input_data.end_date,
             initial_capital=input_data.initial_capital
         )
-        return success_response(data=results, message="回测成功")
+        message = "回测成功（缓存）" if results.get("cached") else "回测成功"
+        return success_response(data=results, message=message)
     except Exception as e:
         logger.exception("运行回测时发生错误")
         return error_response(str(e), 400)
@@ -0,0 +1,157 @@
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+BAR_TYPES = ('time', 'volume', 'dollar')
+
+def bar_label(bar_type: str, threshold: float) -> str:
+    """K线周期标识：时间K线为 1m/5m/1h 等，成交量和成交额K线为 vol1000/dollar1e+06 等"""
+    if bar_type != 'time':
+        prefix = 'vol' if bar_type == 'volume' else 'dollar'
+        return f"{prefix}{threshold:g}"
+    seconds = int(threshold)
+    for unit, size in (('d', 86400), ('h', 3600), ('m', 60)):
+        if seconds % size == 0:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+class _Bar:
+    """正在形成的K线，每笔成交 O(1) 更新"""
+
+    __slots__ = ('start', 'open_time', 'close_time', 'open', 'high', 'low', 'close',
+                 'volume', 'amount', 'ticks')
+
+    def __init__(self, start: float):
+        self.start = start
+        self.open_time = float('inf')
+        self.close_time = float('-inf')
+        self.open = self.close = 0.0
+        self.high = float('-inf')
+        self.low = float('inf')
+        self.volume = 0.0
+        self.amount = 0.0
+        self.ticks = 0
+
+    def add(self, timestamp: float, price: float, volume: float):
+        # 乱序成交按成交时间决定开盘价和收盘价
+        if timestamp < self.open_time:
+            self.open_time = timestamp
+            self.open = price
+        if timestamp >= self.close_time:
+            self.close_time = timestamp
+            self.close = price
+        if price > self.high:
+            self.high = price
+        if price < self.low:
+            self.low = price
+        self.volume += volume
+        self.amount += price * volume
+        self.ticks += 1
+
+    def to_kline(self, label: str, timestamp: Optional[float] = None) -> Dict:
+        return {
+            'timestamp': self.open_time if timestamp is None else timestamp,
+            'interval': label,
+            'open': self.open,
+            'high': self.high,
+            'low': self.low,
+            'close': self.close,
+            'volume': self.volume,
+            'amount': self.amount,
+            'tick_count': self.ticks,
+            'end_time': self.close_time
+        }
+
+class BarAggregator:
+    """逐笔成交聚合为K线（时间K线、成交量K线、成交额K线）
+
+    以事件时间处理乱序：水位线为已见最大成交时间减去 lateness，
+    早于水位线的成交视为迟到并丢弃。时间K线在水位线越过周期终点时输出；
+    成交量/成交额K线先在按时间排序的小缓冲区中等待水位线，再按顺序累计，
+    lateness 为 0 时缓冲区最多只有一笔成交。
+    """
+
+    def __init__(self, bar_type: str = 'time', threshold: float = 60, lateness: float = 0.0):
+        if bar_type not in BAR_TYPES:
+            raise ValueError(f"Unsupported bar type: {bar_type}")
+        if threshold <= 0:
+            raise ValueError("threshold must be positive")
+        self.bar_type = bar_type
+        self.threshold = threshold
+        self.lateness = lateness
+        self.label = bar_label(bar_type, threshold)
+
+        self._watermarks: Dict[str, float] = {}
+        # 时间K线：合约 -> 周期起点 -> 正在形成的K线
+        self._open_bars: Dict[str, Dict[float, _Bar]] = {}
+        # 成交量/成交额K线：合约 -> 等待水位线的成交 / 正在形成的K线
+        self._pending: Dict[str, List[Tuple[float, int, float, float]]] = {}
+        self._current: Dict[str, _Bar] = {}
+        self._sequence = 0
+
+        # 统计
+        self.late_ticks: int = 0
+        self.bars_emitted: int = 0
+
+    def watermark(self, symbol: str) -> float:
+        return self._watermarks.get(symbol, float('-inf'))
+
+    def on_tick(self, symbol: str, timestamp: float, price: float, volume: float = 0.0) -> List[Dict]:
+        """处理一笔成交（时间为 Unix 秒），返回因此完成的K线"""
+        watermark = self.watermark(symbol)
+        if timestamp < watermark:
+            self.late_ticks += 1
+            return []
+
+        if self.bar_type == 'time':
+            start = timestamp // self.threshold * self.threshold
+            bars = self._open_bars.setdefault(symbol, {})
+            bar = bars.get(start)
+            if bar is None:
+                bar = bars[start] = _Bar(start)
+            bar.add(timestamp, price, volume)
+        else:
+            self._sequence += 1
+            heapq.heappush(self._pending.setdefault(symbol, []), (timestamp, self._sequence, price, volume))
+
+        return self.advance(symbol, timestamp - self.lateness)
+
+    def advance(self, symbol: str, watermark: float) -> List[Dict]:
+        """推进水位线（也可在无成交时按时钟调用），返回已完成的K线"""
+        if watermark <= self.watermark(symbol):
+            return []
+        self._watermarks[symbol] = watermark
+
+        if self.bar_type == 'time':
+            bars = self._open_bars.get(symbol, {})
+            closed = sorted(start for start in bars if start + self.threshold <= watermark)
+            emitted = [bars.pop(start).to_kline(self.label, start) for start in closed]
+        else:
+            emitted = []
+            pending = self._pending.get(symbol, [])
+            while pending and pending[0][0] <= watermark:
+                timestamp, _, price, volume = heapq.heappop(pending)
+                bar = self._current.get(symbol)
+                if bar is None:
+                    bar = self._current[symbol] = _Bar(timestamp)
+                bar.add(timestamp, price, volume)
+                measure = bar.volume if self.bar_type == 'volume' else bar.amount
+                if measure >= self.threshold:
+                    emitted.append(self._current.pop(symbol).to_kline(self.label))
+
+        self.bars_emitted += len(emitted)
+        return emitted
+
+    def flush(self, symbol: Optional[str] = None) -> List[Tuple[str, Dict]]:
+        """输出全部未完成的K线（包括未达到阈值的成交量/成交额K线），返回 (合约, K线)"""
+        symbols = [symbol] if symbol is not None else sorted(
+            set(self._open_bars) | set(self._pending) | set(self._current)
+        )
+        emitted = []
+        for name in symbols:
+            bars = self.advance(name, float('inf'))
+            if name in self._current:
+                bars.append(self._current.pop(name).to_kline(self.label))
+                self.bars_emitted += 1
+            emitted.extend((name, bar) for bar in bars)
+            self._watermarks.pop(name, None)
+        return emitted
@@ -0,0 +1,225 @@
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+import numpy as np
+import pandas as pd
+
+# 列名与类型：时间戳为纳秒 int64，价格和成交量为 float64
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+VALUE_COLUMNS = COLUMNS[1:]
+
+def _to_ns(value) -> int:
+    return int(pd.Timestamp(value).as_unit('ns').value)
+
+class ColumnarStore:
+    """按列存储的历史K线
+
+    目录结构为 root/<symbol>/<YYYY-MM>/<column>.npy，每个分区内按时间戳排序。
+    读取时以 mmap 方式打开，单个分区内的区间查询直接返回视图，不复制数据。
+    """
+
+    def __init__(self, root: str = 'data/columnar'):
+        self.root = root
+
+    def symbols(self) -> List[str]:
+        """已存储的合约"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(unquote(name) for name in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, name)))
+
+    def has_symbol(self, symbol: str) -> bool:
+        return bool(self._partitions(symbol))
+
+    def first_timestamp(self, symbol: str) -> Optional[datetime]:
+        """合约第一根K线的时间"""
+        partitions = self._partitions(symbol)
+        if not partitions:
+            return None
+        timestamps = self._load(partitions[0][1], 'timestamp')
+        return pd.Timestamp(int(timestamps[0])).to_pydatetime() if len(timestamps) else None
+
+    def last_timestamp(self, symbol: str) -> Optional[datetime]:
+        """合约最后一根K线的时间"""
+        partitions = self._partitions(symbol)
+        if not partitions:
+            return None
+        timestamps = self._load(partitions[-1][1], 'timestamp')
+        return pd.Timestamp(int(timestamps[-1])).to_pydatetime() if len(timestamps) else None
+
+    def write(self, symbol: str, data: Dict[str, np.ndarray]):
+        """写入K线（与已有数据按时间戳合并去重，后写入的覆盖先写入的）"""
+        timestamps = np.asarray(data['timestamp'])
+        if np.issubdtype(timestamps.dtype, np.datetime64):
+            timestamps = timestamps.astype('datetime64[ns]').astype(np.int64)
+        columns = {'timestamp': timestamps.astype(np.int64)}
+        for column in VALUE_COLUMNS:
+            columns[column] = np.asarray(data[column], dtype=np.float64)
+        if len(timestamps) == 0:
+            return
+
+        months = columns['timestamp'].astype('datetime64[ns]').astype('datetime64[M]')
+        for month in np.unique(months):
+            mask = months == month
+            self._write_partition(symbol, str(month), {name: values[mask] for name, values in columns.items()})
+
+    def write_frame(self, symbol: str, frame: pd.DataFrame):
+        """写入以时间为索引的 DataFrame"""
+        self.write(symbol, {
+            'timestamp': frame.index.to_numpy(dtype='datetime64[ns]'),
+            **{column: frame[column].to_numpy(dtype=float) for column in VALUE_COLUMNS}
+        })
+
+    def iter_chunks(self, symbol: str, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> Iterator[Dict[str, np.ndarray]]:
+        """按分区返回 [start, end] 内的列视图（mmap，不复制）"""
+        start_ns = _to_ns(start) if start is not None else None
+        end_ns = _to_ns(end) if end is not None else None
+        start_month = np.datetime64(start_ns, 'ns').astype('datetime64[M]') if start_ns is not None else None
+        end_month = np.datetime64(end_ns, 'ns').astype('datetime64[M]') if end_ns is not None else None
+
+        for month, path in self._partitions(symbol):
+            month_value = np.datetime64(month, 'M')
+            if start_month is not None and month_value < start_month:
+                continue
+            if end_month is not None and month_value > end_month:
+                break
+            timestamps = self._load(path, 'timestamp')
+            lo = np.searchsorted(timestamps, start_ns, side='left') if start_ns is not None else 0
+            hi = np.searchsorted(timestamps, end_ns, side='right') if end_ns is not None else len(timestamps)
+            if hi <= lo:
+                continue
+            yield {column: self._load(path, column)[lo:hi] for column in COLUMNS}
+
+    def read(self, symbol: str, start: Optional[datetime] = None,
+             end: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+        """读取 [start, end] 内的列数组；只涉及一个分区时为零拷贝视图"""
+        chunks = list(self.iter_chunks(symbol, start, end))
+        if len(chunks) == 1:
+            return chunks[0]
+        if not chunks:
+            return {
+                column: np.empty(0, dtype=np.int64 if column == 'timestamp' else np.float64)
+                for column in COLUMNS
+            }
+        return {column: np.concatenate([chunk[column] for chunk in chunks]) for column in COLUMNS}
+
+    def read_frame(self, symbol: str, start: Optional[datetime] = None,
+                   end: Optional[datetime] = None) -> pd.DataFrame:
+        """读取为以时间为索引的 DataFrame"""
+        columns = self.read(symbol, start, end)
+        index = pd.DatetimeIndex(columns['timestamp'].astype('datetime64[ns]'), name='timestamp')
+        return pd.DataFrame({column: columns[column] for column in VALUE_COLUMNS}, index=index)
+
+    def export_from_database(self, session, symbols: Optional[List[str]] = None,
+                             start: Optional[datetime] = None, end: Optional[datetime] = None,
+                             batch_size: int = 100000, interval: str = '1m') -> Dict[str, int]:
+        """从 market_data 表导出指定周期的K线到列式存储，返回每个合约导出的行数"""
+        from backend.models.database import MarketData
+
+        query = session.query(
+            MarketData.symbol, MarketData.timestamp, MarketData.open, MarketData.high,
+            MarketData.low, MarketData.close, MarketData.volume
+        ).filter(MarketData.interval == interval)
+        if symbols:
+            query = query.filter(MarketData.symbol.in_(symbols))
+        if start is not None:
+            query = query.filter(MarketData.timestamp >= start)
+        if end is not None:
+            query = query.filter(MarketData.timestamp <= end)
+        query = query.order_by(MarketData.symbol, MarketData.timestamp).yield_per(batch_size)
+
+        counts: Dict[str, int] = {}
+        buffer: List[Tuple] = []
+        current = None
+        for row in query:
+            if row[0] != current or len(buffer) >= batch_size:
+                self._flush_rows(current, buffer, counts)
+                buffer = []
+                current = row[0]
+            buffer.append(row)
+        self._flush_rows(current, buffer, counts)
+        return counts
+
+    def _flush_rows(self, symbol: Optional[str], rows: List[Tuple], counts: Dict[str, int]):
+        if not rows:
+            return
+        self.write(symbol, {
+            'timestamp': np.array([row[1] for row in rows], dtype='datetime64[ns]'),
+            **{column: np.array([float(row[i]) for row in rows]) for i, column in enumerate(VALUE_COLUMNS, start=2)}
+        })
+        counts[symbol] = counts.get(symbol, 0) + len(rows)
+
+    def _symbol_dir(self, symbol: str) -> str:
+        return os.path.join(self.root, quote(symbol, safe=''))
+
+    def _partitions(self, symbol: str) -> List[Tuple[str, str]]:
+        """按月份排序的 (月份, 目录)"""
+        directory = self._symbol_dir(symbol)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            (name, os.path.join(directory, name)) for name in os.listdir(directory)
+            if len(name) == 7 and name[4] == '-'
+        )
+
+    @staticmethod
+    def _load(path: str, column: str) -> np.ndarray:
+        return np.load(os.path.join(path, f"{column}.npy"), mmap_mode='r')
+
+    def _write_partition(self, symbol: str, month: str, columns: Dict[str, np.ndarray]):
+        """合并写入一个月份分区：写入临时目录后替换"""
+        path = os.path.join(self._symbol_dir(symbol), month)
+        if os.path.isdir(path):
+            existing = {column: np.array(self._load(path, column)) for column in COLUMNS}
+            columns = {column: np.concatenate([existing[column], columns[column]]) for column in COLUMNS}
+
+        # 稳定排序后按时间戳去重，保留最后写入的值
+        order = np.argsort(columns['timestamp'], kind='stable')
+        columns = {column: values[order] for column, values in columns.items()}
+        timestamps = columns['timestamp']
+        keep = np.append(timestamps[1:] != timestamps[:-1], True) if len(timestamps) else timestamps.astype(bool)
+        columns = {column: values[keep] for column, values in columns.items()}
+
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for column in COLUMNS:
+            np.save(os.path.join(tmp_path, f"{column}.npy"), columns[column])
+
+        old_path = f"{path}.old"
+        if os.path.isdir(path):
+            shutil.rmtree(old_path, ignore_errors=True)
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+def main():
+    import argparse
+    from backend.models.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="将 market_data 表导出为列式存储")
+    parser.add_argument('--root', default='data/columnar', help='列式存储目录')
+    parser.add_argument('--symbol', action='append', default=None, help='只导出指定合约（可重复）')
+    parser.add_argument('--start', default=None, help='开始日期 YYYY-MM-DD')
+    parser.add_argument('--end', default=None, help='结束日期 YYYY-MM-DD')
+    args = parser.parse_args()
+
+    store = ColumnarStore(args.root)
+    session = SessionLocal()
+    try:
+        counts = store.export_from_database(
+            session,
+            symbols=args.symbol,
+            start=datetime.strptime(args.start, '%Y-%m-%d') if args.start else None,
+            end=datetime.strptime(args.end, '%Y-%m-%d') if args.end else None
+        )
+    finally:
+        session.close()
+    for symbol, count in sorted(counts.items()):
+        print(f"{symbol}: {count} rows")
+
+if __name__ == "__main__":
+    main()
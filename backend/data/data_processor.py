@@ -1,48 +1,76 @@
 import pandas as pd
 import numpy as np
-from typing import List, Dict
+from typing import Iterable, List, Dict
 from datetime import datetime, timedelta
-import talib
 from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
 from config import Config
+from backend.data.columnar_store import ColumnarStore
+from backend.data.kline_query import load_kline_frame, load_kline_frame_with_store
+from backend.data import indicators
+from backend.data.windowing import WindowBatchGenerator, sliding_windows
+from backend.data.window_dataset import FeatureArrayWriter
+from backend.data.feature_store import FeatureStore, shared_feature_store
 
 class DataProcessor:
-    def __init__(self):
+    def __init__(self, store: ColumnarStore = None, feature_store: FeatureStore = None, config=None):
         self.engine = create_engine(Config.DATABASE_URL)
+        get = config.get if hasattr(config, 'get') else (lambda key, default=None: default)
+        self.store = store or ColumnarStore(get('data.columnar_root', 'data/columnar'))
+        self.feature_store = feature_store or shared_feature_store(get('data.feature_root', 'data/features'))
         
-    def fetch_market_data(self, symbol: str, start_date: datetime, end_date: datetime) -> pd.DataFrame:
-        """获取市场数据"""
-        query = f"""
-        SELECT timestamp, open, high, low, close, volume 
-        FROM market_data 
-        WHERE symbol = '{symbol}' 
-        AND timestamp BETWEEN '{start_date}' AND '{end_date}'
-        ORDER BY timestamp
+    def fetch_market_data(self, symbol: str, start_date: datetime, end_date: datetime,
+                          interval: str = '1m') -> pd.DataFrame:
+        """获取市场数据：列式存储覆盖的部分从存储读取，未覆盖的部分从数据库补齐
+
+        其他周期直接读取已汇总的K线，不再重新采样
         """
-        return pd.read_sql(query, self.engine)
+        if interval != '1m':
+            return self._query_database(symbol, start_date, end_date, interval)
+        with Session(self.engine) as session:
+            return load_kline_frame_with_store(self.store, session, symbol, start_date, end_date).reset_index()
+
+    def _query_database(self, symbol: str, start_date: datetime, end_date: datetime,
+                        interval: str = '1m') -> pd.DataFrame:
+        """从数据库获取市场数据（键集分页读取列数组）"""
+        with Session(self.engine) as session:
+            return load_kline_frame(session, symbol, start_date, end_date, interval).reset_index()
 
-    def calculate_technical_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        """计算技术指标"""
+    def calculate_technical_indicators(self, df: pd.DataFrame, symbol: str = None,
+                                       interval: str = '1m') -> pd.DataFrame:
+        """计算技术指标
+
+        指定 symbol 时从特征存储读取（只计算存储中还没有的新K线），
+        df 中有早于存储起点的K线时整段重新计算。
+        """
+        if symbol is not None:
+            features = self.feature_store.features(symbol, df, interval=interval)
+            if features is not None:
+                df[list(features.columns)] = features.to_numpy()
+                return df
+
+        close = df['close'].to_numpy(dtype=float)
+        
         # 移动平均线
-        df['MA5'] = talib.MA(df['close'], timeperiod=5)
-        df['MA10'] = talib.MA(df['close'], timeperiod=10)
-        df['MA20'] = talib.MA(df['close'], timeperiod=20)
+        df['MA5'] = indicators.sma(close, 5)
+        df['MA10'] = indicators.sma(close, 10)
+        df['MA20'] = indicators.sma(close, 20)
         
         # RSI
-        df['RSI'] = talib.RSI(df['close'], timeperiod=14)
+        df['RSI'] = indicators.rsi(close, 14)
         
         # MACD
-        df['MACD'], df['MACD_signal'], df['MACD_hist'] = talib.MACD(
-            df['close'], 
-            fastperiod=12, 
-            slowperiod=26, 
-            signalperiod=9
+        df['MACD'], df['MACD_signal'], df['MACD_hist'] = indicators.macd(
+            close, 
+            fast=12, 
+            slow=26, 
+            signal=9
         )
         
         # 布林带
-        df['BB_upper'], df['BB_middle'], df['BB_lower'] = talib.BBANDS(
-            df['close'],
-            timeperiod=20,
+        df['BB_upper'], df['BB_middle'], df['BB_lower'] = indicators.bbands(
+            close,
+            period=20,
             nbdevup=2,
             nbdevdn=2
         )
@@ -73,20 +101,47 @@ class DataProcessor:
         })
         return resampled.dropna()
 
-    def prepare_training_data(self, df: pd.DataFrame, lookback: int = 20) -> tuple:
-        """准备模型训练数据"""
-        df = self.calculate_technical_indicators(df)
+    def prepare_training_data(self, df: pd.DataFrame, lookback: int = 20, symbol: str = None) -> tuple:
+        """准备模型训练数据
+
+        X 为滑动窗口的步长视图（不复制数据），第 i 个样本为特征的第 i 到 i + lookback - 1 行，
+        标签为第 i + lookback 个时间点的下一根K线是否上涨
+        """
+        X, y = self._training_arrays(df, symbol)
+        count = len(X) - lookback - 1
+        X_sequences = sliding_windows(X, lookback, count)
+        y_sequences = y[lookback:lookback + max(count, 0)]
+        return X_sequences, y_sequences
+
+    def training_batches(self, df: pd.DataFrame, lookback: int = 20, batch_size: int = 32,
+                         shuffle: bool = False, symbol: str = None) -> WindowBatchGenerator:
+        """按批次生成训练数据，窗口在取批次时才复制"""
+        X, y = self._training_arrays(df, symbol)
+        return WindowBatchGenerator(X, y, lookback, batch_size, shuffle=shuffle)
+
+    def write_training_arrays(self, frames: Iterable[pd.DataFrame], directory: str) -> int:
+        """将多段K线的特征和标签写入磁盘（每段一个合约），供 WindowDataset 按批读取，返回写入行数"""
+        writer = None
+        try:
+            for df in frames:
+                X, y = self._training_arrays(df)
+                # 跳过指标预热期
+                valid = np.flatnonzero(np.isfinite(X).all(axis=1))
+                if len(valid) == 0:
+                    continue
+                if writer is None:
+                    writer = FeatureArrayWriter(directory, X.shape[1])
+                writer.append(X[valid[0]:], y[valid[0]:])
+        finally:
+            if writer is not None:
+                writer.close()
+        return writer.rows if writer is not None else 0
+
+    def _training_arrays(self, df: pd.DataFrame, symbol: str = None) -> tuple:
+        """特征矩阵和涨跌标签"""
+        df = self.calculate_technical_indicators(df, symbol)
         
         features = ['MA5', 'MA10', 'MA20', 'RSI', 'MACD', 'BB_upper', 'BB_lower']
         X = df[features].values
         y = (df['close'].shift(-1) > df['close']).values[:-1]  # 预测下一个时间点的涨跌
-        
-        # 创建时间序列特征
-        X_sequences = []
-        y_sequences = []
-        
-        for i in range(len(X) - lookback - 1):
-            X_sequences.append(X[i:(i + lookback)])
-            y_sequences.append(y[i + lookback])
-            
-        return np.array(X_sequences), np.array(y_sequences) 
\ No newline at end of file
+        return X, y
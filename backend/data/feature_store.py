@@ -0,0 +1,303 @@
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+from backend.data.indicators import INDICATORS, MACD, BBANDS, restore_indicator
+from backend.data.kline_rollup import ROLLUP_INTERVALS
+
+# 指标实现或存储格式变化时递增，旧版本的数据不再读取
+FEATURE_VERSION = 1
+
+# DataProcessor 使用的特征（列名与 calculate_technical_indicators 相同）
+DEFAULT_FEATURES = {
+    'MA5': {'type': 'sma', 'period': 5},
+    'MA10': {'type': 'sma', 'period': 10},
+    'MA20': {'type': 'sma', 'period': 20},
+    'RSI': {'type': 'rsi', 'period': 14},
+    'MACD': {'type': 'macd', 'fast': 12, 'slow': 26, 'signal': 9},
+    'BB': {'type': 'bbands', 'period': 20, 'nbdevup': 2.0, 'nbdevdn': 2.0}
+}
+
+META_FILE = 'meta.json'
+
+# 各周期的秒数，用于判断K线是否已完成
+INTERVAL_SECONDS = {'1m': 60, **ROLLUP_INTERVALS}
+
+# append 不检查已存储数据的末尾
+_UNCHECKED = object()
+
+def indicator_key(params: Dict) -> str:
+    """指标的规范名称，例如 macd(fast=12,signal=9,slow=26)；参数相同的指标共用一份数据"""
+    args = ','.join(f"{key}={float(value):g}" for key, value in sorted(params.items()) if key != 'type')
+    return f"{params['type']}({args})"
+
+def output_names(params: Dict) -> tuple:
+    """指标各输出在存储中的列名"""
+    indicator_class = INDICATORS[params['type']]
+    if indicator_class is MACD:
+        return ('macd', 'signal', 'hist')
+    if indicator_class is BBANDS:
+        return ('upper', 'middle', 'lower')
+    return ('value',)
+
+def feature_columns(name: str, params: Dict) -> List[str]:
+    """特征列名（多输出指标的展开方式与 IndicatorSet.values 相同）"""
+    outputs = output_names(params)
+    if len(outputs) == 1:
+        return [name]
+    if INDICATORS[params['type']] is MACD:
+        return [name, f"{name}_signal", f"{name}_hist"]
+    return [f"{name}_{output}" for output in outputs]
+
+def _timestamps_ns(values) -> np.ndarray:
+    return pd.DatetimeIndex(pd.to_datetime(values)).as_unit('ns').asi8
+
+def _frame_timestamps(frame: pd.DataFrame) -> np.ndarray:
+    return _timestamps_ns(frame['timestamp'] if 'timestamp' in frame.columns else frame.index)
+
+def closed_cutoff(interval: str, now: Optional[datetime] = None) -> Optional[int]:
+    """已完成K线的最晚开始时间（纳秒，与 market_data 表相同的本地时间），未知周期返回 None"""
+    seconds = INTERVAL_SECONDS.get(interval)
+    if seconds is None:
+        return None
+    return _timestamps_ns([(now or datetime.now()) - pd.Timedelta(seconds=seconds)])[0]
+
+_shared_stores: Dict[str, 'FeatureStore'] = {}
+_shared_lock = threading.Lock()
+
+def shared_feature_store(root: str = 'data/features') -> 'FeatureStore':
+    """进程内按目录共用的 FeatureStore 实例"""
+    key = os.path.abspath(root)
+    with _shared_lock:
+        store = _shared_stores.get(key)
+        if store is None:
+            store = _shared_stores[key] = FeatureStore(root)
+        return store
+
+class FeatureStore:
+    """按 (合约, 周期, 指标参数) 持久化的技术指标列
+
+    目录结构为 root/v<版本>/<symbol>/<interval>/<指标>/，每个输出一列（float64 二进制文件，
+    时间戳为纳秒 int64，另存计算时的收盘价用于校验），只追加不改写。meta.json 记录已提交的行数和指标的增量状态，
+    新K线到达时从保存的状态继续计算，每根K线每个指标只计算一次。
+    只追加已完成且与存储末尾相接的K线；同一目录只允许一个进程写入。
+    features() 读取时也可能追加，进程内的各服务应通过 shared_feature_store 共用同一个实例（同一把锁）。
+    """
+
+    def __init__(self, root: str = 'data/features'):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def append(self, symbol: str, timestamps, close, interval: str = '1m',
+               spec: Optional[Dict[str, Dict]] = None, after=_UNCHECKED) -> int:
+        """追加K线并计算 spec 中的各个指标，早于已有数据的K线被忽略，返回新增的最多行数
+
+        after 为这批K线之前的一根K线的时间（None 表示之前没有K线）：给出时只追加到末尾恰为 after 的指标，
+        避免指标状态跨过缺失的K线继续计算。
+        """
+        timestamps = _timestamps_ns(timestamps)
+        close = np.asarray(close, dtype=float)
+        if len(timestamps) == 0:
+            return 0
+
+        # 按时间排序，同一时间保留最后一根
+        order = np.argsort(timestamps, kind='stable')
+        timestamps, close = timestamps[order], close[order]
+        keep = np.append(timestamps[1:] != timestamps[:-1], True)
+        timestamps, close = timestamps[keep], close[keep]
+
+        appended = 0
+        with self._lock:
+            for params in self._unique(spec or DEFAULT_FEATURES):
+                appended = max(appended, self._append_indicator(symbol, interval, params, timestamps, close, after))
+        return appended
+
+    def append_frame(self, symbol: str, frame: pd.DataFrame, interval: str = '1m',
+                     spec: Optional[Dict[str, Dict]] = None) -> int:
+        """追加 DataFrame 中的K线（时间取 timestamp 列或索引）"""
+        return self.append(symbol, _frame_timestamps(frame), frame['close'].to_numpy(dtype=float), interval, spec)
+
+    def last_timestamp(self, symbol: str, params: Dict, interval: str = '1m') -> Optional[datetime]:
+        """指标已计算到的最后一根K线时间"""
+        meta = self._load_meta(self._path(symbol, interval, params))
+        if meta is None or meta['last_timestamp'] is None:
+            return None
+        return pd.Timestamp(meta['last_timestamp']).to_pydatetime()
+
+    def read(self, symbol: str, params: Dict, start: Optional[datetime] = None,
+             end: Optional[datetime] = None, interval: str = '1m') -> Dict[str, np.ndarray]:
+        """读取一个指标在 [start, end] 内的列（mmap 视图，不复制）"""
+        path = self._path(symbol, interval, params)
+        meta = self._load_meta(path)
+        columns = ('timestamp', 'close') + output_names(params)
+        if meta is None or meta['rows'] == 0:
+            return {column: np.empty(0, dtype=np.int64 if column == 'timestamp' else np.float64)
+                    for column in columns}
+
+        data = {column: self._column(path, column, meta['rows']) for column in columns}
+        timestamps = data['timestamp']
+        lo = np.searchsorted(timestamps, _timestamps_ns([start])[0], side='left') if start is not None else 0
+        hi = np.searchsorted(timestamps, _timestamps_ns([end])[0], side='right') if end is not None else len(timestamps)
+        return {column: values[lo:hi] for column, values in data.items()}
+
+    def features(self, symbol: str, frame: pd.DataFrame, spec: Optional[Dict[str, Dict]] = None,
+                 interval: str = '1m', now: Optional[datetime] = None) -> Optional[pd.DataFrame]:
+        """与 frame 逐行对齐的特征矩阵（索引与 frame 相同）
+
+        frame 与已存储数据相接（包含存储的最后一根K线，或尚无数据）时，把其后已完成的K线追加到存储；
+        尚未完成的K线从保存的状态在内存中继续计算，不写入。frame 与存储之间有缺口、有K线早于存储起点，
+        或收盘价与计算指标时不同（历史K线被修正）时返回 None，由调用方自行计算。
+        """
+        spec = spec or DEFAULT_FEATURES
+        timestamps = _frame_timestamps(frame)
+        if len(timestamps) == 0:
+            columns = [column for name, params in spec.items() for column in feature_columns(name, params)]
+            return pd.DataFrame(index=frame.index, columns=columns, dtype=float)
+
+        close = frame['close'].to_numpy(dtype=float)
+        order = np.argsort(timestamps, kind='stable')
+        cutoff = closed_cutoff(interval, now)
+        series = {}
+        for params in self._unique(spec):
+            data = self._series(symbol, interval, params, timestamps[order], close[order], cutoff)
+            if data is None:
+                return None
+            series[indicator_key(params)] = data
+
+        result = pd.DataFrame(index=frame.index)
+        for name, params in spec.items():
+            data = series[indicator_key(params)]
+            positions = np.searchsorted(data['timestamp'], timestamps)
+            found = positions < len(data['timestamp'])
+            if not found.all() or not (data['timestamp'][positions] == timestamps).all():
+                return None
+            if not np.array_equal(data['close'][positions], close, equal_nan=True):
+                return None
+            for column, output in zip(feature_columns(name, params), output_names(params)):
+                result[column] = data[output][positions]
+        return result
+
+    def _series(self, symbol: str, interval: str, params: Dict, timestamps: np.ndarray,
+                close: np.ndarray, cutoff: Optional[int]) -> Optional[Dict[str, np.ndarray]]:
+        """一个指标覆盖 [timestamps[0], timestamps[-1]] 的数据（timestamps 已排序），有缺口时返回 None"""
+        with self._lock:
+            path = self._path(symbol, interval, params)
+            meta = self._load_meta(path)
+            last = meta['last_timestamp'] if meta is not None else None
+            new = timestamps > last if last is not None else np.ones(len(timestamps), dtype=bool)
+            if new.any() and last is not None and last not in timestamps:
+                return None
+
+            closed = new & (timestamps <= cutoff) if cutoff is not None else new
+            if closed.any():
+                after = pd.Timestamp(last) if last is not None else None
+                self._append_indicator(symbol, interval, params, timestamps[closed], close[closed], after)
+                meta = self._load_meta(path)
+
+            data = self.read(symbol, params, pd.Timestamp(timestamps[0]), pd.Timestamp(timestamps[-1]), interval)
+            forming = new & ~closed
+            if not forming.any():
+                return data
+
+            # 未完成的K线：从已保存的状态继续计算，不写入存储
+            indicator = restore_indicator(meta['state']) if meta is not None else self._create(params)
+            values = np.array([indicator.update(float(value)) for value in close[forming]],
+                              dtype=float).reshape(int(forming.sum()), -1)
+            extra = {'timestamp': timestamps[forming], 'close': close[forming]}
+            extra.update({output: values[:, i] for i, output in enumerate(output_names(params))})
+            return {column: np.concatenate([data[column], extra[column]]) for column in data}
+
+    def sync_from_columnar(self, symbol: str, store, interval: str = '1m',
+                           spec: Optional[Dict[str, Dict]] = None) -> int:
+        """从列式K线存储补齐指标（只计算各指标尚未覆盖的K线），返回新增行数"""
+        spec = spec or DEFAULT_FEATURES
+        last = [self.last_timestamp(symbol, params, interval) for params in self._unique(spec)]
+        start = None if any(value is None for value in last) else min(last)
+        appended = 0
+        for chunk in store.iter_chunks(symbol, start):
+            appended += self.append(symbol, chunk['timestamp'].astype('datetime64[ns]'), chunk['close'], interval, spec)
+        return appended
+
+    def rebuild(self, symbol: str, interval: str = '1m', spec: Optional[Dict[str, Dict]] = None):
+        """删除已计算的指标（历史K线被修正后调用，下次追加时从头计算）"""
+        with self._lock:
+            for params in self._unique(spec or DEFAULT_FEATURES):
+                shutil.rmtree(self._path(symbol, interval, params), ignore_errors=True)
+
+    @staticmethod
+    def _unique(spec: Dict[str, Dict]) -> List[Dict]:
+        unique = {}
+        for params in spec.values():
+            unique.setdefault(indicator_key(params), params)
+        return list(unique.values())
+
+    def _path(self, symbol: str, interval: str, params: Dict) -> str:
+        return os.path.join(
+            self.root, f"v{FEATURE_VERSION}", quote(symbol, safe=''), interval,
+            quote(indicator_key(params), safe='(),=')
+        )
+
+    @staticmethod
+    def _load_meta(path: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _column(path: str, column: str, rows: int) -> np.ndarray:
+        dtype = np.int64 if column == 'timestamp' else np.float64
+        return np.memmap(os.path.join(path, f"{column}.bin"), dtype=dtype, mode='r', shape=(rows,))
+
+    @staticmethod
+    def _create(params: Dict):
+        return INDICATORS[params['type']](**{k: v for k, v in params.items() if k != 'type'})
+
+    def _append_indicator(self, symbol: str, interval: str, params: Dict,
+                          timestamps: np.ndarray, close: np.ndarray, after=_UNCHECKED) -> int:
+        path = self._path(symbol, interval, params)
+        meta = self._load_meta(path)
+        if after is not _UNCHECKED:
+            expected = _timestamps_ns([after])[0] if after is not None else None
+            if (meta['last_timestamp'] if meta is not None else None) != expected:
+                return 0
+        if meta is None:
+            indicator = self._create(params)
+            meta = {'params': params, 'rows': 0, 'last_timestamp': None}
+        else:
+            indicator = restore_indicator(meta['state'])
+
+        if meta['last_timestamp'] is not None:
+            new = timestamps > meta['last_timestamp']
+            timestamps, close = timestamps[new], close[new]
+        if len(timestamps) == 0:
+            return 0
+
+        outputs = output_names(params)
+        values = np.array([indicator.update(float(value)) for value in close], dtype=float).reshape(len(close), -1)
+
+        # 先截掉上次未提交的数据再追加，meta.json 替换成功后新数据才可见
+        os.makedirs(path, exist_ok=True)
+        columns = {'timestamp': timestamps.astype(np.int64), 'close': close}
+        columns.update({output: values[:, i] for i, output in enumerate(outputs)})
+        for column, data in columns.items():
+            with open(os.path.join(path, f"{column}.bin"), 'ab') as f:
+                f.truncate(meta['rows'] * data.dtype.itemsize)
+                f.write(np.ascontiguousarray(data).tobytes())
+
+        meta.update({
+            'rows': meta['rows'] + len(timestamps),
+            'last_timestamp': int(timestamps[-1]),
+            'state': indicator.snapshot()
+        })
+        tmp_path = os.path.join(path, f"{META_FILE}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(path, META_FILE))
+        return len(timestamps)
@@ -0,0 +1,376 @@
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+
+NAN = float('nan')
+
+class Indicator(ABC):
+    """增量指标基类
+
+    每根新K线调用一次 update，O(1) 更新内部状态；预热期间返回 NaN，
+    输出与 TA-Lib 默认参数下的批量计算一致。snapshot/restore 用于保存和恢复状态，
+    checkpoint/rollback 用于撤销最近一次 update。子类的每次 update 向每个窗口 deque 恰好追加一个值。
+    """
+
+    name = ''
+
+    @abstractmethod
+    def update(self, value: float):
+        """加入一个新值，返回最新指标值"""
+        pass
+
+    @property
+    @abstractmethod
+    def value(self):
+        """最新指标值"""
+        pass
+
+    @property
+    def ready(self) -> bool:
+        value = self.value
+        first = value[0] if isinstance(value, tuple) else value
+        return not math.isnan(first)
+
+    def snapshot(self) -> Dict:
+        """保存状态（可 JSON 序列化）"""
+        state = {key: (list(value) if isinstance(value, deque) else value)
+                 for key, value in self.__dict__.items()}
+        state['type'] = self.name
+        return state
+
+    def restore(self, state: Dict):
+        """恢复 snapshot 保存的状态"""
+        for key, value in state.items():
+            if key == 'type':
+                continue
+            current = self.__dict__.get(key)
+            if isinstance(current, deque):
+                value = deque(value, maxlen=current.maxlen)
+            elif isinstance(current, Indicator):
+                current.restore(value)
+                continue
+            elif isinstance(current, tuple):
+                value = tuple(value)
+            self.__dict__[key] = value
+        return self
+
+    def checkpoint(self) -> Dict:
+        """记录撤销下一次 update 所需的状态：标量原样保存，窗口只保存将被挤出的最早值，O(1)
+
+        可 JSON 序列化，窗口未满时记为 None。
+        """
+        state = {}
+        for key, value in self.__dict__.items():
+            if isinstance(value, deque):
+                state[key] = value[0] if len(value) == value.maxlen else None
+            elif isinstance(value, Indicator):
+                state[key] = value.checkpoint()
+            else:
+                state[key] = value
+        return state
+
+    def rollback(self, state: Dict):
+        """撤销 checkpoint 之后的一次 update"""
+        for key, value in state.items():
+            current = self.__dict__.get(key)
+            if isinstance(current, deque):
+                # 去掉这次追加的值，窗口原本已满时补回被挤出的最早值
+                current.pop()
+                if value is not None:
+                    current.appendleft(value)
+            elif isinstance(current, Indicator):
+                current.rollback(value)
+            else:
+                self.__dict__[key] = tuple(value) if isinstance(current, tuple) else value
+        return self
+
+class SMA(Indicator):
+    """简单移动平均（同 TA-Lib SMA）"""
+
+    name = 'sma'
+
+    def __init__(self, period: int = 30):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.current = NAN
+
+    def update(self, value: float) -> float:
+        # 与 TA-Lib 相同的累加顺序：先加入新值求均值，再减去下次移出窗口的值
+        self.window.append(value)
+        self.total += value
+        if len(self.window) == self.period:
+            self.current = self.total / self.period
+            self.total -= self.window[0]
+        return self.current
+
+    @property
+    def value(self) -> float:
+        return self.current
+
+class EMA(Indicator):
+    """指数移动平均：前 period 个值的简单平均作为初值（同 TA-Lib EMA）"""
+
+    name = 'ema'
+
+    def __init__(self, period: int = 30):
+        self.period = period
+        self.k = 2.0 / (period + 1)
+        self.count = 0
+        self.total = 0.0
+        self.current = NAN
+
+    def update(self, value: float) -> float:
+        self.count += 1
+        if self.count < self.period:
+            self.total += value
+        elif self.count == self.period:
+            self.current = (self.total + value) / self.period
+        else:
+            self.current += (value - self.current) * self.k
+        return self.current
+
+    def seed(self, value: float):
+        """直接以给定初值开始平滑"""
+        self.count = self.period
+        self.current = value
+
+    @property
+    def value(self) -> float:
+        return self.current
+
+class RSI(Indicator):
+    """相对强弱指数：Wilder 平滑（同 TA-Lib RSI）"""
+
+    name = 'rsi'
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.previous = NAN
+        self.count = 0
+        self.gain = 0.0
+        self.loss = 0.0
+        self.current = NAN
+
+    def update(self, value: float) -> float:
+        if math.isnan(self.previous):
+            self.previous = value
+            return self.current
+        change = value - self.previous
+        self.previous = value
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+
+        self.count += 1
+        if self.count <= self.period:
+            self.gain += gain
+            self.loss += loss
+            if self.count < self.period:
+                return self.current
+            self.gain /= self.period
+            self.loss /= self.period
+        else:
+            self.gain = (self.gain * (self.period - 1) + gain) / self.period
+            self.loss = (self.loss * (self.period - 1) + loss) / self.period
+
+        total = self.gain + self.loss
+        self.current = 100.0 * self.gain / total if total != 0 else 0.0
+        return self.current
+
+    @property
+    def value(self) -> float:
+        return self.current
+
+class MACD(Indicator):
+    """MACD（同 TA-Lib MACD）
+
+    与 TA-Lib 一致，快线 EMA 以慢线预热结束前 fast 个值的平均作为初值，两条线同时开始；
+    信号线以前 signal 个 MACD 值的平均作为初值，信号线就绪后才输出。
+    """
+
+    name = 'macd'
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        if fast > slow:
+            fast, slow = slow, fast
+        self.fast_period = fast
+        self.slow_period = slow
+        self.recent = deque(maxlen=fast)
+        self.count = 0
+        self.slow_total = 0.0
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+        self.current: Tuple[float, float, float] = (NAN, NAN, NAN)
+
+    def update(self, value: float) -> Tuple[float, float, float]:
+        self.count += 1
+        # 预热结束后 recent 不再使用，仍照常追加以便 rollback 撤销
+        self.recent.append(value)
+        if self.count < self.slow_period:
+            self.slow_total += value
+            return self.current
+        if self.count == self.slow_period:
+            self.fast.seed(sum(self.recent) / self.fast_period)
+            self.slow.seed((self.slow_total + value) / self.slow_period)
+        else:
+            self.fast.update(value)
+            self.slow.update(value)
+
+        macd = self.fast.value - self.slow.value
+        signal = self.signal.update(macd)
+        if not math.isnan(signal):
+            self.current = (macd, signal, macd - signal)
+        return self.current
+
+    @property
+    def value(self) -> Tuple[float, float, float]:
+        return self.current
+
+    def snapshot(self) -> Dict:
+        state = super().snapshot()
+        for key in ('fast', 'slow', 'signal'):
+            state[key] = getattr(self, key).snapshot()
+        return state
+
+class BBANDS(Indicator):
+    """布林带：中轨为简单移动平均，标准差为总体标准差（同 TA-Lib BBANDS，matype=SMA）"""
+
+    name = 'bbands'
+
+    def __init__(self, period: int = 5, nbdevup: float = 2.0, nbdevdn: float = 2.0):
+        self.period = period
+        self.nbdevup = nbdevup
+        self.nbdevdn = nbdevdn
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.current: Tuple[float, float, float] = (NAN, NAN, NAN)
+
+    def update(self, value: float) -> Tuple[float, float, float]:
+        self.window.append(value)
+        self.total += value
+        self.total_sq += value * value
+        if len(self.window) < self.period:
+            return self.current
+
+        mean = self.total / self.period
+        variance = self.total_sq / self.period - mean * mean
+        std = math.sqrt(variance) if variance > 0 else 0.0
+        self.current = (mean + self.nbdevup * std, mean, mean - self.nbdevdn * std)
+
+        oldest = self.window[0]
+        self.total -= oldest
+        self.total_sq -= oldest * oldest
+        return self.current
+
+    @property
+    def value(self) -> Tuple[float, float, float]:
+        return self.current
+
+INDICATORS = {cls.name: cls for cls in (SMA, EMA, RSI, MACD, BBANDS)}
+
+def restore_indicator(state: Dict) -> Indicator:
+    """由 snapshot 重建指标"""
+    return INDICATORS[state['type']](*_constructor_args(state)).restore(state)
+
+def _constructor_args(state: Dict) -> tuple:
+    kind = state['type']
+    if kind == 'macd':
+        return state['fast_period'], state['slow_period'], state['signal']['period']
+    if kind == 'bbands':
+        return state['period'], state['nbdevup'], state['nbdevdn']
+    return (state['period'],)
+
+def run_batch(indicator: Indicator, values: Iterable[float]) -> np.ndarray:
+    """对整段数据逐个更新，返回与 TA-Lib 对齐的输出数组（多输出指标为 N×3）"""
+    return np.array([indicator.update(float(value)) for value in values], dtype=float)
+
+def sma(values, period: int = 30) -> np.ndarray:
+    return run_batch(SMA(period), values)
+
+def ema(values, period: int = 30) -> np.ndarray:
+    return run_batch(EMA(period), values)
+
+def rsi(values, period: int = 14) -> np.ndarray:
+    return run_batch(RSI(period), values)
+
+def macd(values, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    result = run_batch(MACD(fast, slow, signal), values).reshape(-1, 3)
+    return result[:, 0], result[:, 1], result[:, 2]
+
+def bbands(values, period: int = 5, nbdevup: float = 2.0, nbdevdn: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    result = run_batch(BBANDS(period, nbdevup, nbdevdn), values).reshape(-1, 3)
+    return result[:, 0], result[:, 1], result[:, 2]
+
+class IndicatorSet:
+    """一个合约的一组增量指标，由收盘价驱动
+
+    同一时间的K线重复推送时（未完成K线的更新）先撤销这根K线上一次的更新再计算，
+    不会把同一根K线计入两次。每根新K线只记录 O(1) 的 checkpoint，不复制窗口。
+    """
+
+    def __init__(self, indicators: Optional[Dict[str, Indicator]] = None):
+        self.indicators = indicators if indicators is not None else self.default()
+        self.last_timestamp = None
+        self._before_last: Optional[Dict] = None
+
+    @staticmethod
+    def default(window: int = 20) -> Dict[str, Indicator]:
+        return {
+            'ma5': SMA(5),
+            'ma10': SMA(10),
+            'ma20': SMA(20),
+            'rsi': RSI(14),
+            'macd': MACD(12, 26, 9),
+            'bbands': BBANDS(window, 2.0, 2.0)
+        }
+
+    def update(self, close: float, timestamp=None) -> Dict:
+        """加入一根K线的收盘价，返回最新指标值"""
+        if timestamp is not None and timestamp == self.last_timestamp and self._before_last is not None:
+            self._rollback_all(self._before_last)
+        elif timestamp is not None:
+            self._before_last = self._checkpoint_all()
+        self.last_timestamp = timestamp
+        for indicator in self.indicators.values():
+            indicator.update(close)
+        return self.values()
+
+    def values(self) -> Dict:
+        """当前指标值（多输出指标展开为多个键）"""
+        values = {}
+        for name, indicator in self.indicators.items():
+            value = indicator.value
+            if isinstance(indicator, MACD):
+                values[name], values[f"{name}_signal"], values[f"{name}_hist"] = value
+            elif isinstance(indicator, BBANDS):
+                values[f"{name}_upper"], values[f"{name}_middle"], values[f"{name}_lower"] = value
+            else:
+                values[name] = value
+        return values
+
+    def snapshot(self) -> Dict:
+        return {
+            'indicators': self._snapshot_all(),
+            'last_timestamp': self.last_timestamp,
+            'before_last': self._before_last
+        }
+
+    @classmethod
+    def from_snapshot(cls, state: Dict) -> 'IndicatorSet':
+        indicator_set = cls({name: restore_indicator(s) for name, s in state['indicators'].items()})
+        indicator_set.last_timestamp = state.get('last_timestamp')
+        indicator_set._before_last = state.get('before_last')
+        return indicator_set
+
+    def _snapshot_all(self) -> Dict:
+        return {name: indicator.snapshot() for name, indicator in self.indicators.items()}
+
+    def _checkpoint_all(self) -> Dict:
+        return {name: indicator.checkpoint() for name, indicator in self.indicators.items()}
+
+    def _rollback_all(self, states: Dict):
+        for name, state in states.items():
+            self.indicators[name].rollback(state)
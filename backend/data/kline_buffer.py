@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# K线结构化数据类型（时间戳为 Unix 秒）
+KLINE_DTYPE = np.dtype([
+    ('timestamp', 'f8'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8')
+])
+
+KLINE_FIELDS = KLINE_DTYPE.names
+
+class KlineRingBuffer:
+    """固定容量的K线环形缓冲区
+
+    底层为 2 倍容量的预分配结构化数组，每根K线同时写入 i 和 i + capacity 两个位置，
+    因此任意"最近 N 根"始终是一段连续内存，可以零拷贝返回视图。追加为 O(1)。
+    """
+
+    def __init__(self, capacity: int = 1000):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._data = np.zeros(capacity * 2, dtype=KLINE_DTYPE)
+        self._count = 0  # 累计写入次数
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def append(self, kline: Dict):
+        """追加一根K线（字典格式）"""
+        timestamp = kline['timestamp']
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        self.append_values(
+            timestamp,
+            kline['open'],
+            kline['high'],
+            kline['low'],
+            kline['close'],
+            kline['volume']
+        )
+
+    def append_values(self, timestamp: float, open_: float, high: float,
+                      low: float, close: float, volume: float):
+        """追加一根K线（标量格式）"""
+        slot = self._count % self.capacity
+        record = (timestamp, open_, high, low, close, volume)
+        self._data[slot] = record
+        self._data[slot + self.capacity] = record
+        self._count += 1
+
+    def last(self, n: Optional[int] = None) -> np.ndarray:
+        """返回最近 n 根K线的结构化数组视图（按时间升序，零拷贝）"""
+        size = len(self)
+        n = size if n is None else min(n, size)
+        if n <= 0:
+            return self._data[:0]
+        end = (self._count - 1) % self.capacity + self.capacity + 1
+        return self._data[end - n:end]
+
+    def column(self, field: str, n: Optional[int] = None) -> np.ndarray:
+        """返回最近 n 根K线某一列的视图"""
+        return self.last(n)[field]
+
+    def latest(self) -> Optional[Dict]:
+        """返回最新一根K线"""
+        if self._count == 0:
+            return None
+        record = self.last(1)[0]
+        return {field: float(record[field]) for field in KLINE_FIELDS}
+
+    def to_frame(self, n: Optional[int] = None) -> pd.DataFrame:
+        """返回最近 n 根K线的 DataFrame（以时间为索引）"""
+        view = self.last(n)
+        df = pd.DataFrame(
+            {field: view[field] for field in KLINE_FIELDS[1:]},
+            copy=False
+        )
+        df.index = pd.to_datetime(view['timestamp'], unit='s')
+        df.index.name = 'timestamp'
+        return df
+
+    def to_dicts(self, n: Optional[int] = None) -> List[Dict]:
+        """返回最近 n 根K线的字典列表（兼容旧的列表缓存格式）"""
+        view = self.last(n)
+        return [
+            {field: float(record[field]) for field in KLINE_FIELDS}
+            for record in view
+        ]
+
+    def clear(self):
+        """清空缓冲区"""
+        self._count = 0
@@ -0,0 +1,112 @@
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from backend.models.database import MarketData
+
+# 返回的列：时间戳为纳秒 int64，价格和成交量为 float64
+KLINE_COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+def _empty_page() -> Dict[str, np.ndarray]:
+    return {
+        column: np.empty(0, dtype=np.int64 if column == 'timestamp' else np.float64)
+        for column in KLINE_COLUMNS
+    }
+
+def query_kline_page(session, symbol: str, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None, interval: str = '1m',
+                     limit: int = 10000, after: Optional[datetime] = None
+                     ) -> Tuple[Dict[str, np.ndarray], Optional[datetime]]:
+    """按时间升序查询一页K线，返回 (列数组, 下一页游标)
+
+    使用键集分页：下一页从上一页最后一根K线的时间之后开始（timestamp > after），
+    借助 (symbol, interval, timestamp) 唯一索引直接定位，不随页数增加而变慢。
+    没有更多数据时游标为 None。
+    """
+    stmt = select(
+        MarketData.timestamp, MarketData.open, MarketData.high,
+        MarketData.low, MarketData.close, MarketData.volume
+    ).where(
+        MarketData.symbol == symbol,
+        MarketData.interval == interval
+    )
+    if after is not None:
+        stmt = stmt.where(MarketData.timestamp > after)
+    if start is not None:
+        stmt = stmt.where(MarketData.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(MarketData.timestamp <= end)
+    rows = session.execute(stmt.order_by(MarketData.timestamp).limit(limit)).all()
+
+    if not rows:
+        return _empty_page(), None
+
+    timestamps, *values = zip(*rows)
+    page = {'timestamp': np.array(timestamps, dtype='datetime64[ns]').astype(np.int64)}
+    for column, column_values in zip(KLINE_COLUMNS[1:], values):
+        page[column] = np.array(column_values, dtype=np.float64)
+
+    cursor = timestamps[-1] if len(rows) == limit else None
+    return page, cursor
+
+def iter_kline_pages(session, symbol: str, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None, interval: str = '1m',
+                     page_size: int = 10000, after: Optional[datetime] = None
+                     ) -> Iterator[Dict[str, np.ndarray]]:
+    """逐页返回 [start, end] 内的K线列数组，内存占用只与页大小有关"""
+    while True:
+        page, after = query_kline_page(session, symbol, start, end, interval, page_size, after)
+        if len(page['timestamp']):
+            yield page
+        if after is None:
+            return
+
+def load_kline_frame(session, symbol: str, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None, interval: str = '1m',
+                     page_size: int = 10000) -> pd.DataFrame:
+    """读取 [start, end] 内的全部K线为以时间为索引的 DataFrame"""
+    pages = list(iter_kline_pages(session, symbol, start, end, interval, page_size))
+    columns = {
+        column: np.concatenate([page[column] for page in pages]) for column in KLINE_COLUMNS
+    } if pages else _empty_page()
+    index = pd.DatetimeIndex(columns['timestamp'].astype('datetime64[ns]'), name='timestamp')
+    return pd.DataFrame({column: columns[column] for column in KLINE_COLUMNS[1:]}, index=index)
+
+def count_klines(session, symbol: str, start: Optional[datetime] = None,
+                 end: Optional[datetime] = None, interval: str = '1m') -> int:
+    """统计 [start, end] 内的K线数量（走 (symbol, interval, timestamp) 索引）"""
+    stmt = select(func.count()).select_from(MarketData).where(
+        MarketData.symbol == symbol,
+        MarketData.interval == interval
+    )
+    if start is not None:
+        stmt = stmt.where(MarketData.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(MarketData.timestamp <= end)
+    return session.execute(stmt).scalar_one()
+
+def load_kline_frame_with_store(store, session, symbol: str, start: datetime,
+                                end: datetime) -> pd.DataFrame:
+    """读取 [start, end] 内的1分钟K线：列式存储覆盖的部分从存储读取，其余部分从数据库补齐
+
+    存储覆盖 [first, last]：start 之前、last 之后的部分从数据库读取；
+    重叠区间内存储的行数与数据库不一致（导出有缺口或之后补录了数据）时整段从数据库读取。
+    """
+    first, last = store.first_timestamp(symbol), store.last_timestamp(symbol)
+    if first is None or start > last or end < first:
+        return load_kline_frame(session, symbol, start, end)
+
+    stored = store.read_frame(symbol, max(start, first), min(end, last))
+    if count_klines(session, symbol, max(start, first), min(end, last)) != len(stored):
+        return load_kline_frame(session, symbol, start, end)
+
+    parts = []
+    if start < first:
+        head = load_kline_frame(session, symbol, start, first)
+        parts.append(head[head.index < first])
+    parts.append(stored)
+    if end > last:
+        tail = load_kline_frame(session, symbol, last, end)
+        parts.append(tail[tail.index > last])
+    return pd.concat(parts) if len(parts) > 1 else stored
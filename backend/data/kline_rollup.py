@@ -0,0 +1,212 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# 支持的汇总周期（秒）
+ROLLUP_INTERVALS = {
+    '5m': 300,
+    '15m': 900,
+    '1h': 3600,
+    '1d': 86400
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+def to_wall_clock(timestamp) -> datetime:
+    """转换为与 market_data 表一致的本地时间（Unix 秒按本地时区转换，与 KlinePersister 相同）"""
+    if isinstance(timestamp, datetime):
+        return timestamp
+    return datetime.fromtimestamp(timestamp)
+
+def bucket_start(timestamp: datetime, seconds: int, offset: int = 0) -> datetime:
+    """K线所属周期的起始时间，周期边界按表中时间对齐，offset 为边界偏移（秒）"""
+    elapsed = int((timestamp - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=(elapsed + offset) // seconds * seconds - offset)
+
+class _Bucket:
+    """一个周期内正在形成的K线
+
+    最近一根1分钟K线单独保存，更早的部分累计在 high/low/volume 中；同一分钟重复推送时
+    只替换最近一根，不会重复累计成交量，每次更新都是 O(1)。各分钟的K线按分钟保存在 minutes 中，
+    更早的某一分钟被重新推送时由 minutes 重新累计（少见情况，O(周期内分钟数)）。
+    """
+
+    __slots__ = ('start', 'open_time', 'open', 'high', 'low', 'volume', 'last_time', 'last', 'minutes')
+
+    def __init__(self, start: datetime, time: datetime, kline: Dict):
+        self.start = start
+        self.open_time = time
+        self.open = kline['open']
+        self.high = float('-inf')
+        self.low = float('inf')
+        self.volume = 0.0
+        self.last_time = time
+        self.last = kline
+        self.minutes: Dict[datetime, Dict] = {time: kline}
+
+    def update(self, time: datetime, kline: Dict):
+        repushed = time in self.minutes
+        self.minutes[time] = kline
+        if time == self.last_time:
+            self.last = kline
+        elif time > self.last_time:
+            self._fold(self.last)
+            self.last_time = time
+            self.last = kline
+        elif repushed:
+            # 更早的某一分钟被重新推送：替换该分钟后重新累计
+            self._refold()
+        else:
+            # 周期内迟到的K线直接累计
+            self._fold(kline)
+        if time <= self.open_time:
+            self.open_time = time
+            self.open = kline['open']
+
+    def _refold(self):
+        self.high = float('-inf')
+        self.low = float('inf')
+        self.volume = 0.0
+        for time, kline in self.minutes.items():
+            if time != self.last_time:
+                self._fold(kline)
+
+    def _fold(self, kline: Dict):
+        self.high = max(self.high, kline['high'])
+        self.low = min(self.low, kline['low'])
+        self.volume += kline['volume']
+
+    def to_kline(self, interval: str) -> Dict:
+        return {
+            'timestamp': self.start,
+            'interval': interval,
+            'open': self.open,
+            'high': max(self.high, self.last['high']),
+            'low': min(self.low, self.last['low']),
+            'close': self.last['close'],
+            'volume': self.volume + self.last['volume']
+        }
+
+class KlineRollup:
+    """由1分钟K线增量维护多周期K线
+
+    每收到一根1分钟K线，更新各周期正在形成的K线并返回其最新值，
+    由 KlinePersister 按 (symbol, interval, timestamp) 覆盖写入，
+    因此数据库中始终有截至最新一分钟的各周期K线，查询时无需重新采样。
+    """
+
+    def __init__(self, intervals: Iterable[str] = tuple(ROLLUP_INTERVALS), offset: int = 0):
+        unknown = set(intervals) - set(ROLLUP_INTERVALS)
+        if unknown:
+            raise ValueError(f"Unsupported rollup intervals: {sorted(unknown)}")
+        self.intervals: List[Tuple[str, int]] = sorted(
+            ((name, ROLLUP_INTERVALS[name]) for name in intervals), key=lambda item: item[1]
+        )
+        self.offset = offset
+        self._buckets: Dict[Tuple[str, str], _Bucket] = {}
+
+        # 统计：早于当前周期、无法再汇总的K线
+        self.late_klines: int = 0
+
+    def update(self, symbol: str, kline: Dict) -> List[Dict]:
+        """加入一根1分钟K线，返回受影响的各周期K线（时间戳为周期起始时间）"""
+        time = to_wall_clock(kline['timestamp'])
+        bars = []
+        for interval, seconds in self.intervals:
+            start = bucket_start(time, seconds, self.offset)
+            key = (symbol, interval)
+            bucket = self._buckets.get(key)
+            if bucket is None or start > bucket.start:
+                bucket = self._buckets[key] = _Bucket(start, time, kline)
+            elif start < bucket.start:
+                self.late_klines += 1
+                continue
+            else:
+                bucket.update(time, kline)
+            bars.append(bucket.to_kline(interval))
+        return bars
+
+    def current(self, symbol: str, interval: str) -> Optional[Dict]:
+        """正在形成的K线"""
+        bucket = self._buckets.get((symbol, interval))
+        return bucket.to_kline(interval) if bucket else None
+
+def rollup_frame(frame: pd.DataFrame, interval: str, offset: int = 0) -> pd.DataFrame:
+    """将按时间排序的1分钟K线汇总为指定周期（用于回填历史数据）"""
+    if frame.empty:
+        return frame.copy()
+    step = ROLLUP_INTERVALS[interval] * 10**9
+    shift = offset * 10**9
+    timestamps = frame.index.as_unit('ns').asi8
+    buckets = (timestamps + shift) // step * step - shift
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1) != 0)
+    ends = np.append(starts[1:], len(buckets)) - 1
+
+    return pd.DataFrame({
+        'open': frame['open'].to_numpy(dtype=float)[starts],
+        'high': np.maximum.reduceat(frame['high'].to_numpy(dtype=float), starts),
+        'low': np.minimum.reduceat(frame['low'].to_numpy(dtype=float), starts),
+        'close': frame['close'].to_numpy(dtype=float)[ends],
+        'volume': np.add.reduceat(frame['volume'].to_numpy(dtype=float), starts)
+    }, index=pd.DatetimeIndex(buckets[starts].astype('datetime64[ns]'), name='timestamp'))
+
+def backfill_rollups(engine, symbol: str, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None, intervals: Iterable[str] = tuple(ROLLUP_INTERVALS),
+                     offset: int = 0) -> Dict[str, int]:
+    """由数据库中的1分钟K线重新计算各周期K线并写入，返回每个周期写入的行数"""
+    from sqlalchemy.orm import Session
+    from backend.data.kline_query import load_kline_frame
+    from backend.services.kline_persister import KlinePersister
+
+    # 区间扩展到最长周期的边界，避免首尾周期只汇总了部分数据
+    widest = max(ROLLUP_INTERVALS[interval] for interval in intervals)
+    if start is not None:
+        start = bucket_start(start, widest, offset)
+    if end is not None:
+        end = bucket_start(end, widest, offset) + timedelta(seconds=widest) - timedelta(microseconds=1)
+    with Session(engine) as session:
+        frame = load_kline_frame(session, symbol, start, end)
+
+    persister = KlinePersister(engine)
+    counts = {}
+    for interval in intervals:
+        rolled = rollup_frame(frame, interval, offset)
+        persister.write([
+            {
+                'symbol': symbol,
+                'interval': interval,
+                'timestamp': timestamp.to_pydatetime(),
+                **{column: float(value) for column, value in zip(rolled.columns, values)}
+            }
+            for timestamp, values in zip(rolled.index, rolled.to_numpy())
+        ])
+        counts[interval] = len(rolled)
+    return counts
+
+def main():
+    import argparse
+    from backend.models.database import engine
+
+    parser = argparse.ArgumentParser(description="由1分钟K线回填多周期K线")
+    parser.add_argument('--symbol', action='append', required=True, help='合约代码（可重复）')
+    parser.add_argument('--interval', action='append', default=None, choices=sorted(ROLLUP_INTERVALS),
+                        help='汇总周期（可重复，默认全部）')
+    parser.add_argument('--start', default=None, help='开始日期 YYYY-MM-DD')
+    parser.add_argument('--end', default=None, help='结束日期 YYYY-MM-DD')
+    parser.add_argument('--offset', type=int, default=0, help='周期边界偏移（秒）')
+    args = parser.parse_args()
+
+    for symbol in args.symbol:
+        counts = backfill_rollups(
+            engine, symbol,
+            start=datetime.strptime(args.start, '%Y-%m-%d') if args.start else None,
+            end=datetime.strptime(args.end, '%Y-%m-%d') if args.end else None,
+            intervals=args.interval or tuple(ROLLUP_INTERVALS),
+            offset=args.offset
+        )
+        for interval, count in counts.items():
+            print(f"{symbol} {interval}: {count} rows")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from backend.data.windowing import sliding_windows
+
+META_FILE = 'meta.json'
+FEATURES_FILE = 'features.bin'
+TARGETS_FILE = 'targets.bin'
+
+class FeatureArrayWriter:
+    """将特征矩阵和标签按段追加写入磁盘（每个合约一段），读取时以 memmap 打开
+
+    标签与特征按行对齐：第 j 行的标签为该行之后的涨跌；段内最后一行没有标签，补 0 且不会被采样。
+    """
+
+    def __init__(self, directory: str, n_features: int, dtype: str = 'float32'):
+        self.directory = directory
+        self.n_features = n_features
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self.segments: List[Tuple[int, int]] = []
+        os.makedirs(directory, exist_ok=True)
+        self._features = open(os.path.join(directory, FEATURES_FILE), 'wb')
+        self._targets = open(os.path.join(directory, TARGETS_FILE), 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def append(self, X: np.ndarray, y: np.ndarray):
+        """追加一段连续的时间序列"""
+        X = np.ascontiguousarray(X, dtype=self.dtype)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected features with {self.n_features} columns, got shape {X.shape}")
+        targets = np.zeros(len(X), dtype=self.dtype)
+        targets[:min(len(y), len(X))] = np.asarray(y, dtype=self.dtype)[:len(X)]
+
+        self._features.write(X.tobytes())
+        self._targets.write(targets.tobytes())
+        self.segments.append((self.rows, self.rows + len(X)))
+        self.rows += len(X)
+
+    def close(self):
+        """写入元数据；元数据存在即表示数据完整"""
+        if self._features.closed:
+            return
+        self._features.close()
+        self._targets.close()
+        with open(os.path.join(self.directory, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({
+                'rows': self.rows,
+                'n_features': self.n_features,
+                'dtype': self.dtype.str,
+                'segments': self.segments
+            }, f)
+
+def open_feature_arrays(directory: str) -> Tuple[np.ndarray, np.ndarray, List[Tuple[int, int]]]:
+    """以只读 memmap 打开特征矩阵和标签，返回 (X, y, 分段)"""
+    with open(os.path.join(directory, META_FILE), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    rows, n_features, dtype = meta['rows'], meta['n_features'], np.dtype(meta['dtype'])
+    if rows == 0:
+        return np.empty((0, n_features), dtype=dtype), np.empty(0, dtype=dtype), []
+    X = np.memmap(os.path.join(directory, FEATURES_FILE), dtype=dtype, mode='r', shape=(rows, n_features))
+    y = np.memmap(os.path.join(directory, TARGETS_FILE), dtype=dtype, mode='r', shape=(rows,))
+    return X, y, [tuple(segment) for segment in meta['segments']]
+
+class WindowDataset:
+    """按批次读取的滑动窗口数据集（可超过内存）
+
+    样本 i 的输入为 X[s:s + lookback]，标签为 y[s + lookback]，s 为样本起点；
+    窗口不跨越分段，每段的样本数为 段长 - lookback - 1（与 DataProcessor.prepare_training_data 相同）。
+    批次在取用时才从 memmap 复制，prefetch 用线程池并行组装后续批次。
+    """
+
+    def __init__(self, X: np.ndarray, y: np.ndarray, lookback: int, batch_size: int = 32,
+                 segments: Optional[Sequence[Tuple[int, int]]] = None,
+                 starts: Optional[np.ndarray] = None, shuffle: bool = False, seed: Optional[int] = None):
+        self.X = X
+        self.y = y
+        self.lookback = lookback
+        self.batch_size = batch_size
+        self.segments = list(segments) if segments is not None else [(0, len(X))]
+        self.windows = sliding_windows(X, lookback)
+        self.starts = starts if starts is not None else np.concatenate([
+            np.arange(a, max(a, b - lookback - 1), dtype=np.int64) for a, b in self.segments
+        ] or [np.empty(0, dtype=np.int64)])
+        self.shuffle = shuffle
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_directory(cls, directory: str, lookback: int, **kwargs) -> 'WindowDataset':
+        X, y, segments = open_feature_arrays(directory)
+        return cls(X, y, lookback, segments=segments, **kwargs)
+
+    @property
+    def n_features(self) -> int:
+        return self.X.shape[1]
+
+    @property
+    def num_samples(self) -> int:
+        return len(self.starts)
+
+    def __len__(self) -> int:
+        return -(-self.num_samples // self.batch_size)
+
+    def split(self, validation_split: float) -> Tuple['WindowDataset', 'WindowDataset']:
+        """按时间顺序划分：每段前面的样本用于训练，后面的样本用于验证"""
+        train, val = [], []
+        for a, b in self.segments:
+            starts = self.starts[(self.starts >= a) & (self.starts < b)]
+            boundary = int(len(starts) * (1 - validation_split))
+            train.append(starts[:boundary])
+            val.append(starts[boundary:])
+        return self._subset(np.concatenate(train)), self._subset(np.concatenate(val), shuffle=False)
+
+    def batch(self, starts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """按样本起点组装一个批次"""
+        return self.windows[starts], np.asarray(self.y[starts + self.lookback])
+
+    def batch_starts(self) -> List[np.ndarray]:
+        """本轮各批次的样本起点（shuffle 时每轮重新打乱）"""
+        order = self._rng.permutation(self.starts) if self.shuffle else self.starts
+        return [np.sort(order[i:i + self.batch_size]) for i in range(0, len(order), self.batch_size)]
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        for starts in self.batch_starts():
+            yield self.batch(starts)
+
+    def prefetch(self, buffer_size: int = 2, workers: int = 2) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """后台线程并行组装批次，最多提前 buffer_size 个批次，按顺序返回"""
+        batches = iter(self.batch_starts())
+        buffer_size = max(buffer_size, 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque(executor.submit(self.batch, starts) for _, starts in zip(range(buffer_size), batches))
+            while pending:
+                result = pending.popleft().result()
+                starts = next(batches, None)
+                if starts is not None:
+                    pending.append(executor.submit(self.batch, starts))
+                yield result
+
+    def _subset(self, starts: np.ndarray, shuffle: Optional[bool] = None) -> 'WindowDataset':
+        return WindowDataset(
+            self.X, self.y, self.lookback, self.batch_size, self.segments, starts,
+            self.shuffle if shuffle is None else shuffle, int(self._rng.integers(2**32))
+        )
@@ -0,0 +1,79 @@
+import math
+from typing import Iterator, Optional, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def sliding_windows(X: np.ndarray, lookback: int, count: Optional[int] = None) -> np.ndarray:
+    """按时间滑动的窗口视图，形状为 (count, lookback, 特征数)，第 i 个窗口为 X[i:i + lookback]
+
+    基于 sliding_window_view 的步长视图，不复制数据（结果只读）；X 可以是 np.memmap。
+    """
+    if X.ndim == 1:
+        X = X[:, None]
+    available = max(len(X) - lookback + 1, 0)
+    count = available if count is None else max(min(count, available), 0)
+    if count == 0:
+        return np.empty((0, lookback, X.shape[1]), dtype=X.dtype)
+    windows = sliding_window_view(X, lookback, axis=0)
+    return np.moveaxis(windows, -1, 1)[:count]
+
+class WindowBatchGenerator:
+    """按批次生成 (窗口, 标签)，每次只复制一个批次的数据
+
+    第 i 个样本为 (X[i:i + lookback], y[i + target_offset])；start/stop 限定样本下标范围，
+    便于按时间顺序划分训练集和验证集。shuffle 在 [start, stop) 范围内打乱样本顺序。
+    """
+
+    def __init__(self, X: np.ndarray, y: np.ndarray, lookback: int, batch_size: int = 32,
+                 start: int = 0, stop: Optional[int] = None, target_offset: Optional[int] = None,
+                 shuffle: bool = False, seed: Optional[int] = None):
+        self.lookback = lookback
+        self.target_offset = lookback if target_offset is None else target_offset
+        count = min(len(X) - lookback + 1, len(y) - self.target_offset)
+        self.windows = sliding_windows(X, lookback, count)
+        self.y = y
+        self.batch_size = batch_size
+        self.start = start
+        self.stop = len(self.windows) if stop is None else min(stop, len(self.windows))
+        self.shuffle = shuffle
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self) -> int:
+        return math.ceil(max(self.stop - self.start, 0) / self.batch_size)
+
+    @property
+    def num_samples(self) -> int:
+        return max(self.stop - self.start, 0)
+
+    def __getitem__(self, index: int) -> Tuple[np.ndarray, np.ndarray]:
+        """第 index 个批次（按顺序）"""
+        begin = self.start + index * self.batch_size
+        end = min(begin + self.batch_size, self.stop)
+        if index < 0 or begin >= self.stop:
+            raise IndexError(index)
+        return (
+            np.ascontiguousarray(self.windows[begin:end]),
+            np.asarray(self.y[begin + self.target_offset:end + self.target_offset])
+        )
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        if not self.shuffle:
+            for index in range(len(self)):
+                yield self[index]
+            return
+        order = self.start + self._rng.permutation(self.num_samples)
+        for begin in range(0, len(order), self.batch_size):
+            indices = np.sort(order[begin:begin + self.batch_size])
+            yield self.windows[indices], np.asarray(self.y[indices + self.target_offset])
+
+    def split(self, validation_split: float) -> Tuple['WindowBatchGenerator', 'WindowBatchGenerator']:
+        """按时间顺序划分为训练集和验证集（验证集在后）"""
+        boundary = self.start + int(self.num_samples * (1 - validation_split))
+        return self._with_range(self.start, boundary), self._with_range(boundary, self.stop)
+
+    def _with_range(self, start: int, stop: int) -> 'WindowBatchGenerator':
+        generator = WindowBatchGenerator.__new__(WindowBatchGenerator)
+        generator.__dict__.update(self.__dict__)
+        generator.start, generator.stop = start, stop
+        generator._rng = np.random.default_rng(self._rng.integers(2**32))
+        return generator
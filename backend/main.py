@@ -36,6 +36,10 @@ async def startup():
     await risk_service.start_monitoring()
     await execution_engine.start()
 
+@app.on_event("shutdown")
+async def shutdown():
+    await execution_engine.stop()
+
 @app.get("/")
 async def root():
     return {"message": "乾元量化交易系统API"} 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Numeric, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Numeric, Boolean, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 from sqlalchemy import create_engine
@@ -46,6 +46,7 @@ class Trade(Base):
     side = Column(String)  # BUY, SELL
     quantity = Column(Numeric(precision=18, scale=8))
     price = Column(Numeric(precision=18, scale=8))
+    commission = Column(Numeric(precision=18, scale=8))
     timestamp = Column(DateTime, default=datetime.utcnow)
     user = relationship("User", back_populates="trades")
     order = relationship("Order", back_populates="trades")
@@ -63,15 +64,22 @@ class Position(Base):
 class Order(Base):
     __tablename__ = "orders"
     id = Column(Integer, primary_key=True)
+    order_id = Column(String(36), unique=True, index=True)  # 执行引擎生成的订单ID
+    client_order_id = Column(String)
     user_id = Column(Integer, ForeignKey("users.id"))
     strategy_id = Column(Integer, ForeignKey("strategies.id"))
     symbol = Column(String)
-    order_type = Column(String)  # MARKET, LIMIT
+    order_type = Column(String)  # MARKET, LIMIT, STOP
     side = Column(String)  # BUY, SELL
     quantity = Column(Numeric(precision=18, scale=8))
     price = Column(Numeric(precision=18, scale=8))
+    stop_price = Column(Numeric(precision=18, scale=8))
+    time_in_force = Column(String)  # GTC, IOC, FOK
     status = Column(String)  # PENDING, FILLED, CANCELLED
+    executed_quantity = Column(Numeric(precision=18, scale=8))
+    average_price = Column(Numeric(precision=18, scale=8))
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime)
     filled_price = Column(Numeric(precision=18, scale=8))
     filled_time = Column(DateTime)
     user = relationship("User", back_populates="orders")
@@ -79,8 +87,15 @@ class Order(Base):
 
 class MarketData(Base):
     __tablename__ = "market_data"
+    __table_args__ = (
+        # 按 (合约, 周期, 时间) 区间查询走索引，同时防止重复写入
+        UniqueConstraint('symbol', 'interval', 'timestamp', name='uq_market_data_symbol_interval_timestamp'),
+        # 按时间清理旧数据
+        Index('ix_market_data_timestamp', 'timestamp'),
+    )
     id = Column(Integer, primary_key=True)
     symbol = Column(String)
+    interval = Column(String(8), nullable=False, default='1m', server_default='1m')
     timestamp = Column(DateTime)
     open = Column(Numeric(precision=18, scale=8))
     high = Column(Numeric(precision=18, scale=8))
@@ -1,11 +1,13 @@
 import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
+import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Dropout
 from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
 import joblib
 import logging
+from backend.data.window_dataset import WindowDataset
 
 class ModelTrainer:
     def __init__(self, model_path: str = 'models/saved_models/'):
@@ -40,25 +42,36 @@ class ModelTrainer:
 
             self.model = self.build_lstm_model(input_shape=(X.shape[1], X.shape[2]))
 
-            callbacks = [
-                EarlyStopping(
-                    monitor='val_loss',
-                    patience=5,
-                    restore_best_weights=True
-                ),
-                ModelCheckpoint(
-                    filepath=f"{self.model_path}/best_model.h5",
-                    monitor='val_loss',
-                    save_best_only=True
-                )
-            ]
-
             history = self.model.fit(
                 X_train, y_train,
                 epochs=100,
                 batch_size=32,
                 validation_data=(X_val, y_val),
-                callbacks=callbacks,
+                callbacks=self._callbacks(),
+                verbose=1
+            )
+
+            self.save_model()
+            return history
+
+        except Exception as e:
+            self.logger.error(f"Model training failed: {str(e)}")
+            raise
+
+    def train_from_dataset(self, dataset: WindowDataset, validation_split=0.2, epochs: int = 100,
+                           prefetch: int = 4, workers: int = 2):
+        """流式训练：按批次从磁盘读取窗口，内存占用只与批次大小和预取数量有关"""
+        try:
+            # 按时间顺序划分，验证集在每段的末尾
+            train, val = dataset.split(validation_split)
+
+            self.model = self.build_lstm_model(input_shape=(dataset.lookback, dataset.n_features))
+
+            history = self.model.fit(
+                self._to_tf_dataset(train, prefetch, workers),
+                epochs=epochs,
+                validation_data=self._to_tf_dataset(val, prefetch, workers),
+                callbacks=self._callbacks(),
                 verbose=1
             )
 
@@ -69,6 +82,38 @@ class ModelTrainer:
             self.logger.error(f"Model training failed: {str(e)}")
             raise
 
+    def train_from_directory(self, directory: str, lookback: int = 20, batch_size: int = 32,
+                             validation_split=0.2, shuffle: bool = True, **kwargs):
+        """从 DataProcessor.write_training_arrays 写出的目录流式训练"""
+        dataset = WindowDataset.from_directory(directory, lookback, batch_size=batch_size, shuffle=shuffle)
+        return self.train_from_dataset(dataset, validation_split, **kwargs)
+
+    @staticmethod
+    def _to_tf_dataset(dataset: WindowDataset, prefetch: int, workers: int):
+        """包装为 tf.data 数据集，每轮重新调用生成器"""
+        signature = (
+            tf.TensorSpec(shape=(None, dataset.lookback, dataset.n_features), dtype=tf.float32),
+            tf.TensorSpec(shape=(None,), dtype=tf.float32)
+        )
+        return tf.data.Dataset.from_generator(
+            lambda: ((X.astype(np.float32), y.astype(np.float32)) for X, y in dataset.prefetch(prefetch, workers)),
+            output_signature=signature
+        ).prefetch(tf.data.AUTOTUNE)
+
+    def _callbacks(self):
+        return [
+            EarlyStopping(
+                monitor='val_loss',
+                patience=5,
+                restore_best_weights=True
+            ),
+            ModelCheckpoint(
+                filepath=f"{self.model_path}/best_model.h5",
+                monitor='val_loss',
+                save_best_only=True
+            )
+        ]
+
     def save_model(self):
         """保存模型"""
         if self.model is not None:
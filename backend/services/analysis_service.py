@@ -2,13 +2,15 @@ import pandas as pd
 import numpy as np
 from scipy import stats
 from typing import Dict, List, Tuple
-import talib
 from datetime import datetime, timedelta
 import logging
+from backend.data import indicators
+from backend.data.feature_store import FeatureStore
 
 class AnalysisService:
-    def __init__(self):
+    def __init__(self, feature_store: FeatureStore = None):
         self.logger = logging.getLogger(__name__)
+        self.feature_store = feature_store
 
     def calculate_performance_metrics(
         self,
@@ -169,21 +171,30 @@ class AnalysisService:
     def generate_signals(
         self,
         data: pd.DataFrame,
-        strategy_type: str = 'momentum'
+        strategy_type: str = 'momentum',
+        symbol: str = None
     ) -> List[Dict]:
-        """生成交易信号"""
+        """生成交易信号（指定 symbol 且配置了特征存储时，指标从特征存储读取）"""
         try:
             signals = []
             df = data.copy()
             
             if strategy_type == 'momentum':
+                features = None
+                if symbol is not None and self.feature_store is not None:
+                    features = self.feature_store.features(symbol, df)
+                
                 # RSI信号
-                df['rsi'] = talib.RSI(df['close'])
+                if features is not None:
+                    df['rsi'] = features['RSI']
+                    macd, signal = features['MACD'].to_numpy(), features['MACD_signal'].to_numpy()
+                else:
+                    df['rsi'] = indicators.rsi(df['close'].to_numpy(dtype=float))
+                    macd, signal, hist = indicators.macd(df['close'].to_numpy(dtype=float))
                 df['rsi_signal'] = np.where(df['rsi'] < 30, 'BUY', 
                                           np.where(df['rsi'] > 70, 'SELL', 'HOLD'))
                 
                 # MACD信号
-                macd, signal, hist = talib.MACD(df['close'])
                 df['macd_signal'] = np.where(macd > signal, 'BUY', 
                                            np.where(macd < signal, 'SELL', 'HOLD'))
                 
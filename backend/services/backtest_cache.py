@@ -0,0 +1,239 @@
+import hashlib
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import logging
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+import numpy as np
+import pandas as pd
+
+# 交易记录按列存储
+TRADE_COLUMNS = ('timestamp', 'type', 'price', 'quantity', 'commission', 'pnl')
+
+@lru_cache(maxsize=None)
+def strategy_code_version(strategy_cls) -> str:
+    """策略代码版本：策略类所在模块源码的哈希，代码改动后缓存自动失效"""
+    module = sys.modules.get(strategy_cls.__module__)
+    try:
+        source = inspect.getsource(module) if module is not None else inspect.getsource(strategy_cls)
+    except (OSError, TypeError):
+        source = f"{strategy_cls.__module__}.{strategy_cls.__qualname__}"
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+# 计算回测结果的模块，源码改动后缓存自动失效
+ENGINE_MODULES = ('backend.services.backtest_service', 'backend.strategy.base_strategy')
+
+@lru_cache(maxsize=None)
+def engine_code_version() -> str:
+    """回测引擎代码版本：回测引擎和策略基类源码的哈希"""
+    import importlib
+
+    digest = hashlib.sha256()
+    for name in ENGINE_MODULES:
+        digest.update(inspect.getsource(importlib.import_module(name)).encode('utf-8'))
+    return digest.hexdigest()
+
+def _canonical(value):
+    """转换为可稳定序列化的值"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def make_cache_key(strategy_cls, parameters: Dict, data_fingerprint: str,
+                   start_date, end_date) -> str:
+    """计算回测缓存键：sha256(策略和引擎代码版本, 参数, 数据指纹, 日期范围)"""
+    payload = json.dumps({
+        'strategy': f"{strategy_cls.__module__}.{strategy_cls.__qualname__}",
+        'code_version': strategy_code_version(strategy_cls),
+        'engine_version': engine_code_version(),
+        'parameters': _canonical(parameters),
+        'data': data_fingerprint,
+        'start': _canonical(start_date),
+        'end': _canonical(end_date)
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class BacktestCache:
+    """按内容寻址的回测结果缓存
+
+    每个结果存为一个压缩 npz（权益曲线、按列存放的交易记录）和一个 json（指标），
+    文件修改时间作为最近访问时间，超过条目数或总大小时按 LRU 淘汰。
+    缓存目录在第一次写入时创建。
+    """
+
+    def __init__(self, cache_dir: str = 'data/backtest_cache', max_entries: int = 1000,
+                 max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+        # key -> (大小, 最近访问时间)
+        self._entries: Dict[str, list] = {}
+        self._total_bytes = 0
+
+        # 统计
+        self.hits: int = 0
+        self.misses: int = 0
+
+        if os.path.isdir(cache_dir):
+            self._scan()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """读取缓存结果，未命中返回 None"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                result = self._read(key)
+            except Exception as e:
+                self.logger.warning(f"Dropping unreadable backtest cache entry {key}: {str(e)}")
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._touch(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: str, result: Dict):
+        """写入回测结果（metrics、equity_curve、trades）"""
+        with self._lock:
+            npz_path, json_path = self._paths(key)
+            trades = result.get('trades') or []
+            arrays = {'equity_curve': np.asarray(result.get('equity_curve', []), dtype=float)}
+            for column in TRADE_COLUMNS:
+                values = [trade.get(column) for trade in trades]
+                if column == 'timestamp':
+                    arrays[column] = np.asarray(pd.to_datetime(values).as_unit('ns').asi8, dtype=np.int64)
+                elif column == 'type':
+                    arrays[column] = np.asarray(values, dtype='U4')
+                else:
+                    arrays[column] = np.asarray(values, dtype=float)
+
+            # 先写 npz 再写 json，json 存在即表示条目完整
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_npz = f"{npz_path}.tmp"
+            with open(tmp_npz, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_npz, npz_path)
+            tmp_json = f"{json_path}.tmp"
+            with open(tmp_json, 'w', encoding='utf-8') as f:
+                json.dump({'metrics': result.get('metrics', {}), 'created_at': time.time()}, f)
+            os.replace(tmp_json, json_path)
+
+            if key in self._entries:
+                self._total_bytes -= self._entries[key][0]
+            size = os.path.getsize(npz_path) + os.path.getsize(json_path)
+            self._entries[key] = [size, time.time()]
+            self._total_bytes += size
+            self._evict()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict]) -> Dict:
+        """命中直接返回，否则计算并写入缓存"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        result = compute()
+        self.put(key, result)
+        return result
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def get_metrics(self) -> Dict:
+        """获取缓存统计"""
+        return {
+            'entries': len(self._entries),
+            'bytes': self._total_bytes,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.npz", f"{base}.json"
+
+    def _read(self, key: str) -> Dict:
+        npz_path, json_path = self._paths(key)
+        with open(json_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with np.load(npz_path) as arrays:
+            timestamps = pd.to_datetime(arrays['timestamp'], unit='ns')
+            columns = {column: arrays[column].tolist() for column in TRADE_COLUMNS if column != 'timestamp'}
+            trades = [
+                {'timestamp': timestamps[i], **{column: values[i] for column, values in columns.items()}}
+                for i in range(len(timestamps))
+            ]
+            equity_curve = arrays['equity_curve'].tolist()
+        return {'metrics': meta['metrics'], 'equity_curve': equity_curve, 'trades': trades}
+
+    def _touch(self, key: str):
+        now = time.time()
+        self._entries[key][1] = now
+        npz_path, _ = self._paths(key)
+        try:
+            os.utime(npz_path, (now, now))
+        except OSError:
+            pass
+
+    def _remove(self, key: str):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        size, _ = self._entries.pop(key, (0, 0))
+        self._total_bytes -= size
+
+    def _evict(self):
+        """按最近访问时间淘汰，直到满足条目数和大小限制"""
+        if len(self._entries) <= self.max_entries and self._total_bytes <= self.max_bytes:
+            return
+        for key, _ in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if len(self._entries) <= self.max_entries and self._total_bytes <= self.max_bytes:
+                break
+            self._remove(key)
+
+    def _scan(self):
+        """启动时加载已有条目，清理不完整的文件"""
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.tmp'):
+                os.remove(path)
+                continue
+            if name.endswith('.json') and not os.path.exists(path[:-5] + '.npz'):
+                os.remove(path)
+                continue
+            if not name.endswith('.npz'):
+                continue
+            key = name[:-4]
+            npz_path, json_path = self._paths(key)
+            if not os.path.exists(json_path):
+                os.remove(npz_path)
+                continue
+            size = os.path.getsize(npz_path) + os.path.getsize(json_path)
+            self._entries[key] = [size, os.path.getmtime(npz_path)]
+            self._total_bytes += size
+        self._evict()
@@ -1,8 +1,12 @@
+import hashlib
 import pandas as pd
 import numpy as np
-from typing import Dict, List
-from models.database import Strategy, MarketData
-from strategy.base_strategy import BaseStrategy
+from typing import Dict, List, Optional
+from backend.data.columnar_store import ColumnarStore
+from backend.data.feature_store import FeatureStore, shared_feature_store
+from backend.data.kline_query import load_kline_frame_with_store
+from backend.models.database import Strategy, SessionLocal
+from backend.strategy.base_strategy import BaseStrategy
 from datetime import datetime
 
 class BacktestResult:
@@ -46,64 +50,101 @@ class BacktestResult:
         return gross_profit / gross_loss if gross_loss != 0 else float('inf')
 
 class BacktestService:
-    def __init__(self):
+    def __init__(self, store: Optional[ColumnarStore] = None, feature_store: Optional[FeatureStore] = None,
+                 config=None):
         self.result = BacktestResult()
+        get = config.get if hasattr(config, 'get') else (lambda key, default=None: default)
+        self.store = store or ColumnarStore(get('data.columnar_root', 'data/columnar'))
+        self.feature_store = feature_store or shared_feature_store(get('data.feature_root', 'data/features'))
         
     def run_backtest(
         self,
         strategy: BaseStrategy,
         start_date: datetime,
         end_date: datetime,
-        initial_capital: float = 100000.0
+        initial_capital: float = 100000.0,
+        commission_rate: float = 0.0
     ) -> Dict:
-        """运行回测"""
+        """运行回测（向量化：信号在完整数据上只计算一次）"""
         # 获取历史数据
-        historical_data = self._get_historical_data(
-            strategy.symbol,
-            start_date,
-            end_date
+        historical_data = self.load_backtest_data(strategy, start_date, end_date)
+        return self.run_on_data(strategy, historical_data, initial_capital, commission_rate)
+    
+    def load_backtest_data(self, strategy: BaseStrategy, start_date: datetime, end_date: datetime) -> pd.DataFrame:
+        """读取回测使用的K线，并加入策略使用的特征列"""
+        historical_data = self._get_historical_data(strategy.symbol, start_date, end_date)
+        return self._add_features(strategy, historical_data)
+    
+    def run_on_data(
+        self,
+        strategy: BaseStrategy,
+        historical_data: pd.DataFrame,
+        initial_capital: float = 100000.0,
+        commission_rate: float = 0.0
+    ) -> Dict:
+        """在已读取的数据上运行回测"""
+        # 一次性计算每根K线的目标仓位
+        positions = strategy.generate_positions(historical_data)
+        
+        return self.run_vectorized(
+            historical_data,
+            positions,
+            initial_capital=initial_capital,
+            commission_rate=commission_rate
         )
+    
+    def run_vectorized(
+        self,
+        data: pd.DataFrame,
+        positions: np.ndarray,
+        initial_capital: float = 100000.0,
+        commission_rate: float = 0.0
+    ) -> Dict:
+        """根据目标仓位序列向量化计算成交、手续费、权益曲线和收益率
+
+        第 i 根K线的目标仓位按该K线收盘价成交。
+        """
+        self.result = BacktestResult()
+        close = data['close'].to_numpy(dtype=float)
+        positions = np.asarray(positions, dtype=float)
+        if len(close) == 0:
+            return {'metrics': {}, 'equity_curve': [], 'trades': []}
         
-        # 初始化回测环境
-        capital = initial_capital
-        position = 0
+        # 仓位变化即成交
+        delta = np.diff(positions, prepend=0.0)
+        trade_value = delta * close
+        commission = np.abs(trade_value) * commission_rate
         
-        # 遍历历史数据
-        for i in range(len(historical_data)):
-            # 生成交易信号
-            signals = strategy.generate_signals(historical_data.iloc[:i+1])
-            
-            if signals:
-                latest_signal = signals[-1]
-                # 计算仓位
-                target_position = strategy.calculate_position_size(latest_signal)
-                
-                if target_position != position:
-                    # 记录交易
-                    trade = {
-                        'timestamp': historical_data.index[i],
-                        'type': 'BUY' if target_position > position else 'SELL',
-                        'price': historical_data['close'].iloc[i],
-                        'quantity': abs(target_position - position),
-                        'pnl': 0.0  # 将在交易结束时计算
-                    }
-                    
-                    # 更新仓位和资金
-                    position = target_position
-                    trade_value = trade['price'] * trade['quantity']
-                    capital -= trade_value
-                    
-                    self.result.trades.append(trade)
-            
-            # 更新权益曲线
-            market_value = position * historical_data['close'].iloc[i]
-            equity = capital + market_value
-            self.result.equity_curve.append(equity)
-            
-            # 计算收益率
-            if i > 0:
-                returns = (equity - self.result.equity_curve[-2]) / self.result.equity_curve[-2]
-                self.result.returns.append(returns)
+        # 资金与权益
+        cash = initial_capital - np.cumsum(trade_value + commission)
+        equity = cash + positions * close
+        returns = equity[1:] / equity[:-1] - 1.0
+        
+        # 交易记录：每笔交易的盈亏为其建立的仓位持有期间的权益变化
+        trade_idx = np.flatnonzero(delta)
+        entry_equity = equity[trade_idx]
+        exit_equity = np.append(entry_equity[1:], equity[-1])
+        pnl = exit_equity - entry_equity
+        timestamps = data.index[trade_idx]
+        self.result.trades = [
+            {
+                'timestamp': timestamp,
+                'type': 'BUY' if change > 0 else 'SELL',
+                'price': price,
+                'quantity': abs(change),
+                'commission': fee,
+                'pnl': trade_pnl
+            }
+            for timestamp, change, price, fee, trade_pnl in zip(
+                timestamps,
+                delta[trade_idx].tolist(),
+                close[trade_idx].tolist(),
+                commission[trade_idx].tolist(),
+                pnl.tolist()
+            )
+        ]
+        self.result.equity_curve = equity.tolist()
+        self.result.returns = returns.tolist()
         
         # 计算回测指标
         metrics = self.result.calculate_metrics()
@@ -114,27 +155,40 @@ class BacktestService:
             'trades': self.result.trades
         }
     
+    @staticmethod
+    def data_fingerprint(data: pd.DataFrame) -> str:
+        """回测数据指纹：对实际读取的时间戳、OHLCV 和特征列取哈希
+
+        数据来自列式存储、数据库还是特征存储都一样，K线被覆盖写入或特征重新计算后指纹随之变化。
+        """
+        digest = hashlib.sha256()
+        index = data.index.to_numpy(dtype='datetime64[ns]') if isinstance(data.index, pd.DatetimeIndex) else data.index.to_numpy()
+        digest.update(np.ascontiguousarray(index).tobytes())
+        for column in sorted(data.columns):
+            digest.update(str(column).encode('utf-8'))
+            digest.update(np.ascontiguousarray(data[column].to_numpy(dtype=float)).tobytes())
+        return f"{len(data)}:{digest.hexdigest()}"
+    
+    def _add_features(self, strategy: BaseStrategy, data: pd.DataFrame) -> pd.DataFrame:
+        """从特征存储加入策略使用的指标列，存储未覆盖整段数据时由策略自行计算"""
+        spec = strategy.feature_spec()
+        if not spec or data.empty:
+            return data
+        features = self.feature_store.features(strategy.symbol, data, spec)
+        if features is None:
+            return data
+        # 数据复用于其他参数组合时可能已有同名列，以本次读取的特征为准
+        return pd.concat([data.drop(columns=features.columns, errors='ignore'), features], axis=1)
+
     def _get_historical_data(
         self,
         symbol: str,
         start_date: datetime,
         end_date: datetime
     ) -> pd.DataFrame:
-        """获取历史数据"""
-        # 从数据库获取历史数据
-        data = MarketData.query.filter(
-            MarketData.symbol == symbol,
-            MarketData.timestamp.between(start_date, end_date)
-        ).all()
-        
-        # 转换为DataFrame
-        df = pd.DataFrame([{
-            'timestamp': d.timestamp,
-            'open': d.open,
-            'high': d.high,
-            'low': d.low,
-            'close': d.close,
-            'volume': d.volume
-        } for d in data])
-        
-        return df.set_index('timestamp') 
\ No newline at end of file
+        """获取历史数据：列式存储覆盖的部分从存储读取，未覆盖的部分从数据库补齐"""
+        session = SessionLocal()
+        try:
+            return load_kline_frame_with_store(self.store, session, symbol, start_date, end_date)
+        finally:
+            session.close()
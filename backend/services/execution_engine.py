@@ -1,33 +1,23 @@
 import asyncio
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime
+from collections import deque
+import time
 import uuid
+import zlib
 import logging
 from decimal import Decimal
-from enum import Enum
-from dataclasses import dataclass
-from sqlalchemy.orm import Session
-from backend.models.database import Order, Trade, Position, SessionLocal
+from dataclasses import dataclass, field
+from backend.models.database import Order, Trade, SessionLocal
 from backend.services.market_data_service import MarketDataService
 from backend.services.risk_control_service import RiskControlService
-from config.config_manager import ConfigManager
-
-class OrderStatus(Enum):
-    PENDING = "PENDING"
-    PARTIAL = "PARTIAL"
-    FILLED = "FILLED"
-    CANCELLED = "CANCELLED"
-    REJECTED = "REJECTED"
-
-class OrderType(Enum):
-    MARKET = "MARKET"
-    LIMIT = "LIMIT"
-    STOP = "STOP"
-    STOP_LIMIT = "STOP_LIMIT"
-
-class OrderSide(Enum):
-    BUY = "BUY"
-    SELL = "SELL"
+from backend.services.order_types import OrderSide, OrderStatus, OrderType
+from backend.services.trigger_book import TriggerBook
+from backend.services.position_ledger import PositionLedger
+from backend.services.order_journal import (
+    OrderJournal, OrderProjector, order_to_event, order_from_event,
+    SUBMITTED, CANCELLED, FILLED, REJECTED
+)
 
 @dataclass
 class OrderRequest:
@@ -41,6 +31,15 @@ class OrderRequest:
     client_order_id: Optional[str] = None
     user_id: int = None
 
+def shard_for(symbol: str, shard_count: int) -> int:
+    """按合约计算分片编号（crc32 跨进程稳定，可用于多进程路由）"""
+    return zlib.crc32(symbol.encode('utf-8')) % shard_count
+
+@dataclass
+class ShardStats:
+    processed: int = 0
+    latency: deque = field(default_factory=lambda: deque(maxlen=1000))
+
 class ExecutionEngine:
     def __init__(self, market_data_service: MarketDataService, risk_service: RiskControlService, config: Dict):
         self.market_data_service = market_data_service
@@ -53,13 +52,51 @@ class ExecutionEngine:
         
         # 订单管理
         self.active_orders: Dict[str, Order] = {}
-        self.order_queue: asyncio.Queue = asyncio.Queue()
+        # 成交或撤单事件正在写日志的订单，避免同一订单同时成交和撤单
+        self.finalizing_orders: Set[str] = set()
+        
+        # 按合约分片的订单队列：同一合约的订单由同一个工作协程按顺序处理
+        self.worker_count = max(1, int(config.get('trading.order_workers', 4)))
+        self.order_queues: List[asyncio.Queue] = [
+            asyncio.Queue() for _ in range(self.worker_count)
+        ]
+        self.shard_stats: List[ShardStats] = [ShardStats() for _ in range(self.worker_count)]
+        self.worker_tasks: List[asyncio.Task] = []
+        
+        # 多进程部署时，每个进程只处理属于自己分片的合约（由调用方按合约路由订单，进程之间不转发）
+        self.process_count = max(1, int(config.get('trading.process_count', 1)))
+        self.process_index = int(config.get('trading.process_index', 0))
+        
+        # 限价单/止损单触发价索引
+        self.trigger_book = TriggerBook()
         
         # 性能监控
         self.execution_latency: List[float] = []
         self.order_count: int = 0
         self.rejection_count: int = 0
         
+        # 内存持仓账本（与风控共用），通过成交日志和定期快照持久化
+        self.position_ledger = PositionLedger(
+            journal_path=config.get('trading.position_journal', 'data/journal/positions.log'),
+            fsync=config.get('trading.journal_fsync', False)
+        )
+        self.position_snapshot_interval = config.get('trading.position_snapshot_interval', 5.0)
+        self.risk_service.attach_position_ledger(self.position_ledger)
+        
+        # 订单事件日志（组提交），由后台投影写入 orders/trades 表
+        journal_path = config.get('trading.order_journal', 'data/journal/orders.journal')
+        self.order_journal = OrderJournal(
+            journal_path,
+            fsync=config.get('trading.order_journal_fsync', True)
+        )
+        self.order_projector = OrderProjector(
+            SessionLocal,
+            checkpoint_path=f"{journal_path}.projected",
+            batch_size=config.get('trading.projector_batch_size', 500),
+            interval=config.get('trading.projector_interval', 0.5)
+        )
+        self.order_journal.listeners.append(self.order_projector.enqueue)
+        
         # 订单执行配置
         self.max_slippage = Decimal(config.get('trading.max_slippage', '0.001'))
         self.min_order_size = Decimal(config.get('trading.min_order_size', '0.001'))
@@ -68,11 +105,29 @@ class ExecutionEngine:
     async def start(self):
         """启动执行引擎"""
         try:
+            # 恢复持仓：数据库快照 + 成交日志
+            self.position_ledger.load(self.db)
+            self.snapshot_task = asyncio.create_task(
+                self.position_ledger.run_snapshots(SessionLocal, self.position_snapshot_interval)
+            )
+            
+            # 恢复订单：重放订单日志
+            restored_orders = await self._recover_orders()
+            await self.order_journal.start()
+            self.projector_task = asyncio.create_task(self.order_projector.run())
+            
             # 注册市场数据回调
             self.market_data_service.register_price_callback(self._handle_price_update)
             
-            # 启动订单处理循环
-            asyncio.create_task(self._process_order_queue())
+            # 启动分片订单处理协程
+            self.worker_tasks = [
+                asyncio.create_task(self._process_order_queue(shard))
+                for shard in range(self.worker_count)
+            ]
+            for order in restored_orders:
+                self.order_queues[shard_for(order.symbol, self.worker_count)].put_nowait(
+                    (order, time.perf_counter())
+                )
             
             self.logger.info("Execution engine started successfully")
             
@@ -80,9 +135,91 @@ class ExecutionEngine:
             self.logger.error(f"Error starting execution engine: {str(e)}")
             raise
 
+    async def stop(self):
+        """停止执行引擎，写完并投影剩余的订单事件"""
+        for task in self.worker_tasks:
+            task.cancel()
+        if hasattr(self, 'projector_task'):
+            self.projector_task.cancel()
+        await self.order_journal.stop()
+        await self.order_projector.flush()
+        if hasattr(self, 'snapshot_task'):
+            self.snapshot_task.cancel()
+        await self.position_ledger.snapshot_async(SessionLocal)
+
+    async def _recover_orders(self) -> List[Order]:
+        """重放订单日志，重建活动订单并补投未投影的事件"""
+        events = self.order_journal.replay()
+        # 序号不能低于已投影的检查点，否则新事件会被投影器当作已投影而跳过
+        self.order_journal.seq = max(self.order_journal.seq, self.order_projector.projected_seq)
+        active: Dict[str, Order] = {}
+        submitted: Dict[str, Dict] = {}
+        for event in events:
+            order_id = event['data']['order_id']
+            if event['type'] == SUBMITTED:
+                active[order_id] = order_from_event(event['data'])
+                submitted[order_id] = event
+            else:
+                active.pop(order_id, None)
+                submitted.pop(order_id, None)
+        
+        # 补投上次退出前未写入数据库的事件
+        await asyncio.to_thread(self.order_projector.apply, events)
+        
+        # 补记未写入持仓账本的成交；压缩会删除 FILLED 事件，因此先将持仓快照到数据库
+        self._reconcile_positions(events)
+        await self.position_ledger.snapshot_async(self.order_projector.session_factory)
+        
+        # 已结束订单的事件均已投影，日志只保留活动订单
+        if events:
+            self.order_journal.compact(list(submitted.values()))
+        
+        for order_id, order in active.items():
+            self.active_orders[order_id] = order
+            self.trigger_book.add(order)
+        if active:
+            self.logger.info(f"Recovered {len(active)} active orders from journal")
+        return list(active.values())
+
+    def _reconcile_positions(self, events: List[Dict]) -> int:
+        """按订单日志中序号大于账本 applied_seq 的 FILLED 事件补记持仓，返回补记的成交数"""
+        submitted: Dict[str, Dict] = {}
+        reconciled = 0
+        for event in events:
+            data = event['data']
+            if event['type'] == SUBMITTED:
+                submitted[data['order_id']] = data
+                continue
+            if event['type'] != FILLED or event['seq'] <= self.position_ledger.applied_seq:
+                continue
+            order = submitted.get(data['order_id'])
+            if order is None:
+                self.logger.error(f"Cannot reconcile fill of unknown order {data['order_id']}")
+                continue
+            self.position_ledger.apply_fill(
+                order['user_id'],
+                order['symbol'],
+                order['side'],
+                Decimal(data['executed_quantity']),
+                Decimal(data['average_price']),
+                seq=event['seq']
+            )
+            reconciled += 1
+        if reconciled:
+            self.logger.warning(f"Reconciled {reconciled} fills missing from the position ledger")
+        return reconciled
+
     async def submit_order(self, order_request: OrderRequest) -> Tuple[bool, str, Optional[str]]:
-        """提交订单"""
+        """提交订单
+
+        多进程部署时订单必须由调用方发送到合约所属的进程（见 owns_symbol），
+        本方法不会转发订单，其他进程的合约直接拒绝。
+        """
         try:
+            # 检查合约是否由本进程处理
+            if not self.owns_symbol(order_request.symbol):
+                return False, "Symbol is routed to another engine process", None
+                
             # 验证订单
             if not self._validate_order(order_request):
                 return False, "Order validation failed", None
@@ -110,21 +247,22 @@ class ExecutionEngine:
                 created_at=datetime.utcnow()
             )
             
-            # 保存订单到数据库
-            self.db.add(order)
-            self.db.commit()
+            # 写入订单日志，等待组提交落盘
+            await self.order_journal.append(SUBMITTED, order_to_event(order))
             
             # 添加到活动订单
             self.active_orders[order_id] = order
+            self.trigger_book.add(order)
             
-            # 放入订单队列
-            await self.order_queue.put(order)
+            # 放入该合约所在分片的订单队列
+            await self.order_queues[shard_for(order.symbol, self.worker_count)].put(
+                (order, time.perf_counter())
+            )
             
             return True, "Order submitted successfully", order_id
             
         except Exception as e:
             self.logger.error(f"Error submitting order: {str(e)}")
-            self.db.rollback()
             return False, f"Error submitting order: {str(e)}", None
 
     async def cancel_order(self, order_id: str) -> Tuple[bool, str]:
@@ -137,94 +275,179 @@ class ExecutionEngine:
             
             if order.status not in [OrderStatus.PENDING.value, OrderStatus.PARTIAL.value]:
                 return False, f"Order cannot be cancelled in status: {order.status}"
-                
-            order.status = OrderStatus.CANCELLED.value
-            order.updated_at = datetime.utcnow()
+            if order_id in self.finalizing_orders:
+                return False, "Order is being filled or cancelled"
             
-            # 更新数据库
-            self.db.commit()
+            # 先写入订单日志，落盘后再修改内存状态
+            updated_at = datetime.utcnow()
+            self.finalizing_orders.add(order_id)
+            try:
+                await self.order_journal.append(CANCELLED, {
+                    'order_id': order_id,
+                    'status': OrderStatus.CANCELLED.value,
+                    'updated_at': updated_at.isoformat()
+                })
+            finally:
+                self.finalizing_orders.discard(order_id)
+            
+            order.status = OrderStatus.CANCELLED.value
+            order.updated_at = updated_at
             
             # 从活动订单中移除
-            del self.active_orders[order_id]
+            self.active_orders.pop(order_id, None)
+            self.trigger_book.discard(order_id)
             
             return True, "Order cancelled successfully"
             
         except Exception as e:
             self.logger.error(f"Error cancelling order: {str(e)}")
-            self.db.rollback()
             return False, f"Error cancelling order: {str(e)}"
 
-    async def _process_order_queue(self):
-        """处理订单队列"""
+    def owns_symbol(self, symbol: str) -> bool:
+        """判断合约是否由当前进程处理
+
+        进程之间不转发订单：调用方需按 shard_for(symbol, process_count) 把订单路由到对应进程，
+        否则只能以 process_count == 1 部署。
+        """
+        return shard_for(symbol, self.process_count) == self.process_index
+
+    def get_shard_metrics(self) -> List[Dict]:
+        """获取各分片的队列深度和处理延迟"""
+        metrics = []
+        for shard, (queue, stats) in enumerate(zip(self.order_queues, self.shard_stats)):
+            latencies = list(stats.latency)
+            metrics.append({
+                'shard': shard,
+                'queue_depth': queue.qsize(),
+                'processed': stats.processed,
+                'avg_latency': sum(latencies) / len(latencies) if latencies else 0.0,
+                'max_latency': max(latencies) if latencies else 0.0
+            })
+        return metrics
+
+    async def _process_order_queue(self, shard: int = 0):
+        """处理单个分片的订单队列"""
+        queue = self.order_queues[shard]
+        stats = self.shard_stats[shard]
         while True:
             try:
-                order = await self.order_queue.get()
-                
-                # 检查订单是否仍然有效
-                if order.status not in [OrderStatus.PENDING.value, OrderStatus.PARTIAL.value]:
-                    continue
-                
-                # 获取当前市场价格
-                current_price = self.market_data_service.price_cache.get(order.symbol)
-                if not current_price:
-                    continue
-                
-                # 执行订单
-                start_time = datetime.utcnow()
-                
-                if order.order_type == OrderType.MARKET.value:
-                    await self._execute_market_order(order, Decimal(str(current_price)))
-                elif order.order_type == OrderType.LIMIT.value:
-                    await self._execute_limit_order(order, Decimal(str(current_price)))
-                elif order.order_type == OrderType.STOP.value:
-                    await self._execute_stop_order(order, Decimal(str(current_price)))
-                
-                # 记录执行延迟
-                execution_time = (datetime.utcnow() - start_time).total_seconds()
-                self.execution_latency.append(execution_time)
+                order, enqueued_at = await queue.get()
+                try:
+                    # 检查订单是否仍然有效
+                    if order.status not in [OrderStatus.PENDING.value, OrderStatus.PARTIAL.value]:
+                        continue
+                    
+                    # 获取当前市场价格
+                    current_price = self.market_data_service.price_cache.get(order.symbol)
+                    if not current_price:
+                        continue
+                    
+                    # 执行订单
+                    start_time = datetime.utcnow()
+                    
+                    if order.order_type == OrderType.MARKET.value:
+                        await self._execute_market_order(order, Decimal(str(current_price)))
+                    elif order.order_type == OrderType.LIMIT.value:
+                        await self._execute_limit_order(order, Decimal(str(current_price)))
+                    elif order.order_type == OrderType.STOP.value:
+                        await self._execute_stop_order(order, Decimal(str(current_price)))
+                    
+                    # 记录执行延迟
+                    execution_time = (datetime.utcnow() - start_time).total_seconds()
+                    self.execution_latency.append(execution_time)
+                finally:
+                    # 由行情触发但未成交（价格已回到触发价之外）的限价单/止损单重新加入触发索引
+                    if order.order_id in self.active_orders and order.order_id not in self.trigger_book:
+                        self.trigger_book.add(order)
+                    # 记录分片延迟（入队到处理完成）
+                    stats.processed += 1
+                    stats.latency.append(time.perf_counter() - enqueued_at)
                 
             except Exception as e:
                 self.logger.error(f"Error processing order: {str(e)}")
                 await asyncio.sleep(0.1)
 
     async def _execute_market_order(self, order: Order, current_price: Decimal):
-        """执行市价单"""
+        """执行市价单
+
+        先等待 FILLED 事件落盘，再修改内存中的订单状态和持仓；
+        写日志失败时订单保持活动状态，可在下一次行情时重新触发。
+        """
+        if order.order_id in self.finalizing_orders:
+            # 同一订单的成交或撤单正在写日志
+            return
+        self.finalizing_orders.add(order.order_id)
         try:
             # 检查滑点
             execution_price = self._calculate_execution_price(order, current_price)
             
             # 创建成交记录
+            executed_at = datetime.utcnow()
             trade = Trade(
-                order_id=order.order_id,
+                user_id=order.user_id,
                 symbol=order.symbol,
                 side=order.side,
                 quantity=order.quantity,
                 price=execution_price,
                 commission=self._calculate_commission(order.quantity, execution_price),
-                executed_at=datetime.utcnow()
+                timestamp=executed_at
             )
-            
-            # 更新订单状态
-            order.status = OrderStatus.FILLED.value
-            order.executed_quantity = order.quantity
-            order.average_price = execution_price
-            order.updated_at = datetime.utcnow()
-            
-            # 更新持仓
-            await self._update_position(order, trade)
-            
-            # 保存到数据库
-            self.db.add(trade)
-            self.db.commit()
-            
-            # 从活动订单中移除
-            del self.active_orders[order.order_id]
-            
         except Exception as e:
+            self.finalizing_orders.discard(order.order_id)
             self.logger.error(f"Error executing market order: {str(e)}")
-            self.db.rollback()
-            order.status = OrderStatus.REJECTED.value
-            self.db.commit()
+            await self._reject_order(order)
+            return
+        
+        try:
+            # 写入订单日志（成交记录由投影写入 trades 表）；两步之间崩溃时，
+            # 重启由 _reconcile_positions 按 FILLED 事件补记持仓
+            seq = await self.order_journal.append(FILLED, {
+                'order_id': order.order_id,
+                'status': OrderStatus.FILLED.value,
+                'executed_quantity': str(order.quantity),
+                'average_price': str(execution_price),
+                'commission': str(trade.commission),
+                'executed_at': executed_at.isoformat(),
+                'updated_at': executed_at.isoformat()
+            })
+        except Exception as e:
+            self.logger.error(f"Error journaling fill of order {order.order_id}: {str(e)}")
+            # 订单未成交，重新加入触发索引（已弹出的限价单/止损单）
+            if order.order_id in self.active_orders and order.order_id not in self.trigger_book:
+                self.trigger_book.add(order)
+            return
+        finally:
+            self.finalizing_orders.discard(order.order_id)
+        
+        # 日志落盘后更新订单状态
+        order.status = OrderStatus.FILLED.value
+        order.executed_quantity = order.quantity
+        order.average_price = execution_price
+        order.updated_at = executed_at
+        
+        # 从活动订单中移除
+        self.active_orders.pop(order.order_id, None)
+        self.trigger_book.discard(order.order_id)
+        
+        # 更新持仓
+        await self._update_position(order, trade, seq)
+
+    async def _reject_order(self, order: Order):
+        """拒绝订单：先写日志，落盘后再从活动订单中移除"""
+        updated_at = datetime.utcnow()
+        try:
+            await self.order_journal.append(REJECTED, {
+                'order_id': order.order_id,
+                'status': OrderStatus.REJECTED.value,
+                'updated_at': updated_at.isoformat()
+            })
+        except Exception as journal_error:
+            self.logger.error(f"Error journaling rejected order: {str(journal_error)}")
+            return
+        order.status = OrderStatus.REJECTED.value
+        order.updated_at = updated_at
+        self.active_orders.pop(order.order_id, None)
+        self.trigger_book.discard(order.order_id)
 
     async def _execute_limit_order(self, order: Order, current_price: Decimal):
         """执行限价单"""
@@ -248,40 +471,19 @@ class ExecutionEngine:
         except Exception as e:
             self.logger.error(f"Error executing stop order: {str(e)}")
 
-    async def _update_position(self, order: Order, trade: Trade):
-        """更新持仓"""
+    async def _update_position(self, order: Order, trade: Trade, seq: Optional[int] = None):
+        """更新持仓（内存账本，数据库由后台快照异步写入）"""
         try:
-            position = self.db.query(Position).filter(
-                Position.user_id == order.user_id,
-                Position.symbol == order.symbol
-            ).first()
-            
-            if not position:
-                position = Position(
-                    user_id=order.user_id,
-                    symbol=order.symbol,
-                    quantity=Decimal('0'),
-                    average_price=Decimal('0')
-                )
-                self.db.add(position)
-            
-            if order.side == OrderSide.BUY.value:
-                new_quantity = position.quantity + trade.quantity
-                new_cost = (position.quantity * position.average_price +
-                           trade.quantity * trade.price)
-                position.average_price = new_cost / new_quantity
-                position.quantity = new_quantity
-            else:
-                position.quantity -= trade.quantity
-                
-            if position.quantity == 0:
-                self.db.delete(position)
-                
-            self.db.commit()
-            
+            self.position_ledger.apply_fill(
+                order.user_id,
+                order.symbol,
+                order.side,
+                Decimal(str(trade.quantity)),
+                Decimal(str(trade.price)),
+                seq=seq
+            )
         except Exception as e:
             self.logger.error(f"Error updating position: {str(e)}")
-            self.db.rollback()
 
     def _validate_order(self, order_request: OrderRequest) -> bool:
         """验证订单"""
@@ -317,10 +519,7 @@ class ExecutionEngine:
         """检查风险限制"""
         try:
             # 获取当前持仓
-            position = self.db.query(Position).filter(
-                Position.user_id == order_request.user_id,
-                Position.symbol == order_request.symbol
-            ).first()
+            position = self.position_ledger.get(order_request.user_id, order_request.symbol)
             
             # 检查风险限制
             risk_check = await self.risk_service.check_order_risk(
@@ -351,19 +550,19 @@ class ExecutionEngine:
 
     async def _handle_price_update(self, symbol: str, price: float):
         """处理价格更新"""
-        # 检查限价单和止损单
-        for order in list(self.active_orders.values()):
-            if order.symbol != symbol:
+        current_price = Decimal(str(price))
+        
+        # 只处理触发价被穿越的限价单和止损单，交给合约所在分片按顺序执行
+        for order in self.trigger_book.pop_triggered(symbol, current_price):
+            if order.status not in [OrderStatus.PENDING.value, OrderStatus.PARTIAL.value]:
                 continue
-                
-            current_price = Decimal(str(price))
-            
-            if order.order_type == OrderType.LIMIT.value:
-                await self._execute_limit_order(order, current_price)
-            elif order.order_type == OrderType.STOP.value:
-                await self._execute_stop_order(order, current_price)
+            await self.order_queues[shard_for(order.symbol, self.worker_count)].put(
+                (order, time.perf_counter())
+            )
 
     def __del__(self):
         """析构函数中关闭数据库连接"""
+        if hasattr(self, 'position_ledger'):
+            self.position_ledger.close()
         if hasattr(self, 'db'):
             self.db.close() 
\ No newline at end of file
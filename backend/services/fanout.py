@@ -0,0 +1,218 @@
+import asyncio
+import json
+import time
+import itertools
+import logging
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Hashable, Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# 不可合并消息使用的内部 key 前缀
+_SEQUENCE_KEY = object()
+
+class ConflatingOutbox:
+    """可合并的连接发件箱
+
+    带 key 的消息（如某合约的最新价、订单簿）在客户端落后时只保留最新一条，并保持其在队列中的位置；
+    不带 key 的消息按顺序排队。队列条目数以 max_size 为上限，内存占用有界。
+    """
+
+    def __init__(self, max_size: int = 100):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[Hashable, str]' = OrderedDict()
+        self._seq = itertools.count()
+        self._ready = asyncio.Event()
+
+        # 统计
+        self.conflated_count: int = 0
+        self.dropped_count: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def qsize(self) -> int:
+        return len(self._entries)
+
+    def put(self, message: str, key: Optional[Hashable] = None) -> bool:
+        """放入消息：同 key 的待发送消息直接被覆盖；队列已满时返回 False"""
+        if key is not None and key in self._entries:
+            self._entries[key] = message
+            self.conflated_count += 1
+            return True
+
+        if len(self._entries) >= self.max_size:
+            self.dropped_count += 1
+            return False
+
+        if key is None:
+            key = (_SEQUENCE_KEY, next(self._seq))
+        self._entries[key] = message
+        self._ready.set()
+        return True
+
+    async def get(self) -> str:
+        """取出最早的一条消息（对合并消息而言是其最新内容）"""
+        while not self._entries:
+            self._ready.clear()
+            await self._ready.wait()
+        _, message = self._entries.popitem(last=False)
+        return message
+
+class ConnectionSender:
+    """单个连接的发送协程
+
+    每个连接拥有独立的发件箱和发送协程，慢客户端只会堆积自己的发件箱，不会阻塞其他订阅者。
+    """
+
+    def __init__(self, websocket, fanout: 'BroadcastFanout'):
+        self.websocket = websocket
+        self.fanout = fanout
+        self.outbox = ConflatingOutbox(fanout.max_queue_size)
+        self.closed = False
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def offer(self, message: str, key: Optional[Hashable] = None) -> bool:
+        """非阻塞入队，队列已满时返回 False"""
+        return self.outbox.put(message, key)
+
+    async def _run(self):
+        """按顺序发送队列中的消息"""
+        try:
+            while True:
+                message = await self.outbox.get()
+                start_time = time.perf_counter()
+                await asyncio.wait_for(
+                    self.websocket.send(message), timeout=self.fanout.send_timeout
+                )
+                self.fanout.sent_count += 1
+                self.fanout.send_latency.append(time.perf_counter() - start_time)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self.fanout.timeout_count += 1
+            await self.fanout.disconnect(self.websocket, 1013, "Send timeout")
+        except Exception as e:
+            logger.debug(f"Connection send failed: {str(e)}")
+            await self.fanout.disconnect(self.websocket)
+
+    def cancel(self):
+        """停止发送协程"""
+        self.closed = True
+        if not self.task.done() and self.task is not asyncio.current_task():
+            self.task.cancel()
+
+class BroadcastFanout:
+    """行情广播扇出引擎
+
+    每条消息只序列化一次，然后放入各订阅者的发件箱并发发送；
+    带 conflation key 的行情在客户端落后时合并为最新值，
+    发件箱超过上限的慢客户端按 laggard_policy 丢弃消息（drop）或断开连接（disconnect）。
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = 100,
+        send_timeout: float = 5.0,
+        laggard_policy: str = 'drop',
+        on_disconnect: Optional[Callable] = None,
+        latency_window: int = 10000
+    ):
+        if laggard_policy not in ('drop', 'disconnect'):
+            raise ValueError(f"Unknown laggard policy: {laggard_policy}")
+        self.max_queue_size = max_queue_size
+        self.send_timeout = send_timeout
+        self.laggard_policy = laggard_policy
+        self.on_disconnect = on_disconnect
+        self.senders: Dict[object, ConnectionSender] = {}
+
+        # 统计
+        self.sent_count: int = 0
+        self.conflated_count: int = 0
+        self.dropped_count: int = 0
+        self.timeout_count: int = 0
+        self.disconnect_count: int = 0
+        self.send_latency: deque = deque(maxlen=latency_window)
+
+    def publish(self, connections: Iterable, message: Union[Dict, str],
+                key: Optional[Hashable] = None) -> int:
+        """向一组连接广播消息，返回成功入队的连接数
+
+        key 不为空时该消息可被同 key 的后续消息覆盖（如 ('price', symbol)）。
+        """
+        connections = list(connections)
+        if not connections:
+            return 0
+
+        payload = message if isinstance(message, str) else json.dumps(message)
+        delivered = 0
+        for websocket in connections:
+            sender = self._get_sender(websocket)
+            conflated = key is not None and key in sender.outbox
+            if sender.offer(payload, key):
+                delivered += 1
+                if conflated:
+                    self.conflated_count += 1
+            elif self.laggard_policy == 'disconnect':
+                asyncio.get_running_loop().create_task(
+                    self.disconnect(websocket, 1013, "Client too slow")
+                )
+            else:
+                self.dropped_count += 1
+        return delivered
+
+    def remove(self, websocket):
+        """移除连接（连接正常关闭时调用）"""
+        sender = self.senders.pop(websocket, None)
+        if sender:
+            sender.cancel()
+
+    async def disconnect(self, websocket, code: int = 1011, reason: str = ""):
+        """断开并移除连接"""
+        sender = self.senders.get(websocket)
+        if sender is None or sender.closed:
+            return
+        self.remove(websocket)
+        self.disconnect_count += 1
+        # 先从订阅列表中移除，避免关闭期间继续向该连接广播
+        if self.on_disconnect:
+            self.on_disconnect(websocket)
+        try:
+            await asyncio.wait_for(websocket.close(code, reason), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+    async def close(self):
+        """关闭所有发送协程"""
+        for websocket in list(self.senders):
+            self.remove(websocket)
+
+    def queue_depth(self, websocket) -> int:
+        """获取连接发件箱中待发送的消息数"""
+        sender = self.senders.get(websocket)
+        return sender.outbox.qsize() if sender else 0
+
+    def get_metrics(self) -> Dict:
+        """获取广播指标"""
+        latencies = list(self.send_latency)
+        depths = [sender.outbox.qsize() for sender in self.senders.values()]
+        return {
+            'connections': len(self.senders),
+            'sent': self.sent_count,
+            'conflated': self.conflated_count,
+            'dropped': self.dropped_count,
+            'timeouts': self.timeout_count,
+            'disconnected': self.disconnect_count,
+            'max_queue_depth': max(depths) if depths else 0,
+            'avg_send_latency': sum(latencies) / len(latencies) if latencies else 0.0
+        }
+
+    def _get_sender(self, websocket) -> ConnectionSender:
+        sender = self.senders.get(websocket)
+        if sender is None:
+            sender = ConnectionSender(websocket, self)
+            self.senders[websocket] = sender
+        return sender
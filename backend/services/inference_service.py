@@ -0,0 +1,222 @@
+import asyncio
+import bisect
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# 默认分桶上界：批次大小（行数）和请求延迟（秒）
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+class Histogram:
+    """固定分桶的直方图，counts[i] 为落在 (bounds[i-1], bounds[i]] 内的次数，最后一个桶为 +Inf"""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'buckets': dict(zip([*map(str, self.bounds), '+Inf'], self.counts)),
+                'count': self.count,
+                'sum': self.sum
+            }
+
+class InferenceService:
+    """模型推理微批处理服务
+
+    各策略/合约提交的预测请求进入队列，由后台线程合并为批次：从批次中第一个请求入队起，
+    最多等待 max_latency 秒或凑满 max_batch_size 行后执行一次前向计算，结果通过 Future 按请求拆分返回。
+    model 只需提供 predict(X)（Keras 模型或 ModelTrainer 均可）；swap_model 替换模型时
+    正在计算的批次使用旧模型完成，之后的批次使用新模型，队列中的请求不会丢失。
+    """
+
+    def __init__(self, model=None, max_batch_size: int = 64, max_latency: float = 0.005,
+                 batch_size_buckets: Sequence[float] = BATCH_SIZE_BUCKETS,
+                 latency_buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.logger = logging.getLogger(__name__)
+
+        self._model = model
+        self._model_lock = threading.Lock()
+        self.model_version: int = 0 if model is None else 1
+
+        self._queue: queue.Queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self._carry: Optional[Tuple] = None
+
+        # 性能监控
+        self.batch_size_histogram = Histogram(batch_size_buckets)
+        self.latency_histogram = Histogram(latency_buckets)
+        self.inference_histogram = Histogram(latency_buckets)
+        self.requests_served: int = 0
+        self.failed_requests: int = 0
+        self.batch_count: int = 0
+
+    def start(self):
+        """启动后台推理线程（多个线程同时调用时只启动一个）"""
+        with self._worker_lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._stop_event.clear()
+            self._worker = threading.Thread(
+                target=self._run, name="inference-service", daemon=True
+            )
+            self._worker.start()
+
+    def submit(self, X: np.ndarray) -> Future:
+        """提交预测请求（非阻塞）
+
+        X 为单个样本 (lookback, 特征数) 或多个样本 (n, lookback, 特征数)；
+        Future 的结果为对应样本的预测值，单个样本时去掉第一维。
+        """
+        X = np.asarray(X, dtype=np.float32)
+        single = X.ndim == 2
+        future: Future = Future()
+        self._queue.put((X[None] if single else X, single, future, time.perf_counter()))
+
+        if not self._worker or not self._worker.is_alive():
+            self.start()
+        return future
+
+    async def predict(self, X: np.ndarray) -> np.ndarray:
+        """在事件循环中等待预测结果"""
+        return await asyncio.wrap_future(self.submit(X))
+
+    def predict_sync(self, X: np.ndarray, timeout: Optional[float] = None) -> np.ndarray:
+        """阻塞等待预测结果"""
+        return self.submit(X).result(timeout)
+
+    def swap_model(self, model):
+        """热替换模型，返回旧模型"""
+        with self._model_lock:
+            previous, self._model = self._model, model
+            self.model_version += 1
+        self.logger.info(f"Inference model swapped to version {self.model_version}")
+        return previous
+
+    @property
+    def queue_depth(self) -> int:
+        """等待推理的请求数量"""
+        return self._queue.qsize() + (1 if self._carry is not None else 0)
+
+    def get_metrics(self) -> Dict:
+        """获取推理性能指标"""
+        return {
+            'queue_depth': self.queue_depth,
+            'model_version': self.model_version,
+            'batch_count': self.batch_count,
+            'requests_served': self.requests_served,
+            'failed_requests': self.failed_requests,
+            'batch_size': self.batch_size_histogram.snapshot(),
+            'request_latency': self.latency_histogram.snapshot(),
+            'inference_latency': self.inference_histogram.snapshot()
+        }
+
+    def close(self, timeout: Optional[float] = None):
+        """停止推理线程，队列中剩余的请求计算完成后返回"""
+        self._stop_event.set()
+        if self._worker and self._worker.is_alive():
+            self._worker.join(timeout)
+        if not self._worker or not self._worker.is_alive():
+            self._drain()
+
+    async def stop(self, timeout: Optional[float] = None):
+        """在事件循环中停止推理服务（不阻塞事件循环）"""
+        await asyncio.get_running_loop().run_in_executor(None, self.close, timeout)
+
+    def _run(self):
+        """后台线程：按截止时间或批次大小合并请求"""
+        while not self._stop_event.is_set():
+            batch = self._collect_batch(block=True)
+            if batch:
+                self._run_batch(batch)
+        self._drain()
+
+    def _next_request(self, timeout: Optional[float]):
+        if self._carry is not None:
+            request, self._carry = self._carry, None
+            return request
+        if timeout is None:
+            return self._queue.get_nowait()
+        return self._queue.get(timeout=timeout)
+
+    def _collect_batch(self, block: bool) -> List[Tuple]:
+        """收集一个批次：同一输入形状的请求，总行数不超过 max_batch_size（单个超大请求单独成批）"""
+        try:
+            first = self._next_request(0.1 if block else None)
+        except queue.Empty:
+            return []
+        batch = [first]
+        rows = len(first[0])
+        deadline = first[3] + self.max_latency
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._next_request(remaining if block and remaining > 0 else None)
+            except queue.Empty:
+                break
+            if request[0].shape[1:] != first[0].shape[1:] or rows + len(request[0]) > self.max_batch_size:
+                # 留到下一批
+                self._carry = request
+                break
+            batch.append(request)
+            rows += len(request[0])
+        return batch
+
+    def _drain(self):
+        """计算队列中剩余的所有请求"""
+        while True:
+            batch = self._collect_batch(block=False)
+            if not batch:
+                return
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[Tuple]):
+        """一次前向计算并把结果分发给各请求"""
+        with self._model_lock:
+            model = self._model
+        start_time = time.perf_counter()
+        try:
+            if model is None:
+                raise RuntimeError("No model loaded")
+            X = batch[0][0] if len(batch) == 1 else np.concatenate([request[0] for request in batch])
+            predictions = np.asarray(model.predict(X))
+        except Exception as e:
+            self.logger.error(f"Batched inference failed for {len(batch)} requests: {str(e)}")
+            self.failed_requests += len(batch)
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        end_time = time.perf_counter()
+        self.batch_count += 1
+        self.batch_size_histogram.observe(len(X))
+        self.inference_histogram.observe(end_time - start_time)
+
+        offset = 0
+        for X_request, single, future, enqueued in batch:
+            result = predictions[offset:offset + len(X_request)]
+            offset += len(X_request)
+            self.latency_histogram.observe(end_time - enqueued)
+            self.requests_served += 1
+            if not future.done():
+                future.set_result(result[0] if single else result)
@@ -0,0 +1,188 @@
+import asyncio
+import queue
+import threading
+import time
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from backend.models.database import MarketData
+
+class KlinePersister:
+    """K线数据异步批量写入器
+
+    事件循环中只做入队操作，由后台工作线程按数量或时间批量写入数据库，
+    避免每根K线一次 commit 阻塞行情处理。
+    """
+
+    def __init__(self, engine, batch_size: int = 500, flush_interval: float = 1.0,
+                 latency_window: int = 1000):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger(__name__)
+
+        self._queue: queue.Queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+        # 不支持去重写入的数据库在构造时即报错，而不是在后台线程中逐批失败
+        self._upsert = self._upsert_statement()
+
+        # 性能监控
+        self.flush_latency: deque = deque(maxlen=latency_window)
+        self.flush_count: int = 0
+        self.rows_written: int = 0
+        self.failed_rows: int = 0
+
+    def start(self):
+        """启动后台写入线程"""
+        if self._worker and self._worker.is_alive():
+            return
+        self._stop_event.clear()
+        self._worker = threading.Thread(
+            target=self._run, name="kline-persister", daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, symbol: str, kline_data: Dict):
+        """提交一根K线（非阻塞，可在事件循环中直接调用）"""
+        self._queue.put(self._to_row(symbol, kline_data))
+
+        if not self._worker or not self._worker.is_alive():
+            self.start()
+
+    @staticmethod
+    def _to_row(symbol: str, kline_data: Dict) -> Dict:
+        """转换为 market_data 表的插入映射"""
+        timestamp = kline_data['timestamp']
+        if not isinstance(timestamp, datetime):
+            timestamp = datetime.fromtimestamp(timestamp)
+
+        return {
+            'symbol': symbol,
+            'interval': kline_data.get('interval', '1m'),
+            'timestamp': timestamp,
+            'open': kline_data['open'],
+            'high': kline_data['high'],
+            'low': kline_data['low'],
+            'close': kline_data['close'],
+            'volume': kline_data['volume']
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        """待写入的K线数量"""
+        return self._queue.qsize()
+
+    def get_metrics(self) -> Dict:
+        """获取写入性能指标"""
+        latencies = list(self.flush_latency)
+        return {
+            'queue_depth': self.queue_depth,
+            'flush_count': self.flush_count,
+            'rows_written': self.rows_written,
+            'failed_rows': self.failed_rows,
+            'last_flush_latency': latencies[-1] if latencies else 0.0,
+            'avg_flush_latency': sum(latencies) / len(latencies) if latencies else 0.0,
+            'max_flush_latency': max(latencies) if latencies else 0.0
+        }
+
+    def close(self, timeout: Optional[float] = None):
+        """停止写入线程并写入剩余数据"""
+        self._stop_event.set()
+        if self._worker and self._worker.is_alive():
+            self._worker.join(timeout)
+        # 线程未启动或已退出时，在当前线程写入残留数据
+        if not self._worker or not self._worker.is_alive():
+            self._drain()
+
+    async def stop(self, timeout: Optional[float] = None):
+        """在事件循环中停止写入器（写入在线程池中完成，不阻塞事件循环）"""
+        await asyncio.get_running_loop().run_in_executor(None, self.close, timeout)
+
+    def flush(self):
+        """立即写入当前队列中的全部数据"""
+        self._drain()
+
+    def write(self, rows: List[Dict]):
+        """在当前线程中按批次直接写入（用于历史数据回填）"""
+        for i in range(0, len(rows), self.batch_size):
+            self._write_batch(rows[i:i + self.batch_size])
+
+    def _run(self):
+        """后台线程：按数量或时间批量写入"""
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self._write_batch(batch)
+        self._drain()
+
+    def _collect_batch(self) -> List[Dict]:
+        """收集一个批次，达到 batch_size 或 flush_interval 超时即返回"""
+        batch: List[Dict] = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop_event.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        """写入队列中剩余的所有数据"""
+        while True:
+            batch: List[Dict] = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write_batch(batch)
+
+    def _upsert_statement(self):
+        """按 (symbol, interval, timestamp) 去重的插入语句：同一根K线重复推送时以最新数据为准"""
+        dialect = self.engine.dialect.name
+        columns = ('open', 'high', 'low', 'close', 'volume')
+        if dialect in ('mysql', 'mariadb'):
+            from sqlalchemy.dialects.mysql import insert
+
+            stmt = insert(MarketData.__table__)
+            return stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in columns})
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise ValueError(f"Unsupported database dialect for kline upsert: {dialect}")
+
+        stmt = insert(MarketData.__table__)
+        return stmt.on_conflict_do_update(
+            index_elements=['symbol', 'interval', 'timestamp'],
+            set_={column: stmt.excluded[column] for column in columns}
+        )
+
+    def _write_batch(self, rows: List[Dict]):
+        """批量插入一组K线"""
+        start_time = time.perf_counter()
+        # 同一批内重复的K线只保留最后一根（一条语句不能更新同一行两次）
+        rows = list({(row['symbol'], row['interval'], row['timestamp']): row for row in rows}.values())
+        session = Session(self.engine)
+        try:
+            session.execute(self._upsert, rows)
+            session.commit()
+            self.rows_written += len(rows)
+        except Exception as e:
+            self.logger.error(f"Error flushing {len(rows)} klines to database: {str(e)}")
+            session.rollback()
+            self.failed_rows += len(rows)
+        finally:
+            session.close()
+            self.flush_count += 1
+            self.flush_latency.append(time.perf_counter() - start_time)
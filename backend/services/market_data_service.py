@@ -12,6 +12,14 @@ from backend.models.database import MarketData, Base, engine, SQLALCHEMY_DATABAS
 from sqlalchemy.orm import Session
 from sqlalchemy import create_engine
 from config.config_manager import ConfigManager
+from backend.services.kline_persister import KlinePersister
+from backend.data.kline_buffer import KlineRingBuffer
+from backend.data.kline_rollup import KlineRollup, ROLLUP_INTERVALS, to_wall_clock
+from backend.data.bar_aggregator import BarAggregator
+from backend.data.indicators import IndicatorSet
+from backend.data.feature_store import DEFAULT_FEATURES, shared_feature_store
+from backend.services.stream_consumer import MarketDataStreamConsumer
+from backend.services.fanout import BroadcastFanout
 from fastapi import WebSocket
 import websocket
 import requests
@@ -28,6 +36,25 @@ class MarketDataService:
         self.engine = create_engine(self.database_url)
         self.db_session = Session(self.engine)
         
+        # K线批量写入器
+        self.kline_persister = KlinePersister(
+            self.engine,
+            batch_size=config.get('market_data.persist_batch_size', 500),
+            flush_interval=config.get('market_data.persist_flush_interval', 1.0)
+        )
+        
+        # 多周期K线增量汇总
+        self.kline_rollup = KlineRollup(
+            intervals=config.get('market_data.rollup_intervals', list(ROLLUP_INTERVALS)),
+            offset=config.get('market_data.rollup_offset', 0)
+        )
+        
+        # 逐笔成交聚合K线，例如 [{'type': 'time', 'threshold': 60, 'lateness': 2}]
+        self.tick_aggregators: List[BarAggregator] = [
+            BarAggregator(spec.get('type', 'time'), spec.get('threshold', 60), spec.get('lateness', 0.0))
+            for spec in config.get('market_data.tick_bars', [])
+        ]
+        
         # Redis连接
         self.redis_client = redis.Redis(
             host=config.get('redis.host'),
@@ -35,13 +62,51 @@ class MarketDataService:
             db=config.get('redis.db')
         )
         
+        # Redis Streams 消费组
+        self.stream_consumer = MarketDataStreamConsumer(
+            self.redis_client,
+            stream=config.get('redis.market_data_stream', 'market_data'),
+            group=config.get('redis.consumer_group', 'market_data'),
+            consumer=config.get('redis.consumer_name'),
+            batch_size=config.get('redis.stream_batch_size', 100),
+            block_ms=config.get('redis.stream_block_ms', 1000),
+            claim_idle_ms=config.get('redis.stream_claim_idle_ms', 60000)
+        )
+        
         # 内存缓存
         self.price_cache: Dict[str, float] = {}
-        self.kline_cache: Dict[str, List[Dict]] = defaultdict(list)
+        max_cache_size = config.get('market_data.max_kline_cache_size', 1000)
+        self.kline_cache: Dict[str, KlineRingBuffer] = defaultdict(
+            lambda: KlineRingBuffer(max_cache_size)
+        )
         self.orderbook_cache: Dict[str, Dict] = {}
         
+        # 增量技术指标，随每根K线更新
+        self.indicator_window = config.get('market_data.indicator_window', 20)
+        self.indicator_sets: Dict[str, IndicatorSet] = defaultdict(
+            lambda: IndicatorSet(IndicatorSet.default(self.indicator_window))
+        )
+        
+        # 已完成的1分钟K线追加到特征存储（market_data.append_features 开启时）
+        self.feature_store = (
+            shared_feature_store(config.get('data.feature_root', 'data/features'))
+            if config.get('market_data.append_features', False) else None
+        )
+        self.feature_spec = config.get('market_data.feature_spec', DEFAULT_FEATURES)
+        self._open_klines: Dict[str, Dict] = {}
+        self._closed_klines: Dict[str, datetime] = {}
+        
         # WebSocket连接管理
         self.ws_connections: Dict[str, Set[WebSocket]] = {}
+        self.conflate_types = set(config.get(
+            'websocket.conflate_types', ['price', 'tick', 'orderbook']
+        ))
+        self.fanout = BroadcastFanout(
+            max_queue_size=config.get('websocket.max_queue_size', 100),
+            send_timeout=config.get('websocket.send_timeout', 5.0),
+            laggard_policy=config.get('websocket.laggard_policy', 'drop'),
+            on_disconnect=self._remove_connection
+        )
         self.running = True
         
         # 行情更新回调函数
@@ -94,7 +159,11 @@ class MarketDataService:
             await self.ws.close()
         self.running = False
         
+        # 写入缓冲区中剩余的K线
+        await self.kline_persister.stop()
+        
         # 关闭所有WebSocket连接
+        await self.fanout.close()
         for connections in self.ws_connections.values():
             for ws in connections:
                 await ws.close()
@@ -122,15 +191,15 @@ class MarketDataService:
                 return
                 
             # 注册连接
-            self.ws_connections[symbol].add(websocket)
+            self.ws_connections.setdefault(symbol, set()).add(websocket)
             
             # 发送当前缓存数据
             if symbol in self.price_cache:
-                await websocket.send(json.dumps({
+                self.fanout.publish([websocket], {
                     'type': 'price',
                     'symbol': symbol,
                     'price': self.price_cache[symbol]
-                }))
+                })
             
             try:
                 async for message in websocket:
@@ -141,7 +210,8 @@ class MarketDataService:
             except websockets.ConnectionClosed:
                 pass
             finally:
-                self.ws_connections[symbol].remove(websocket)
+                self.fanout.remove(websocket)
+                self._remove_connection(websocket)
                 
         except Exception as e:
             self.logger.error(f"Error handling WebSocket connection: {str(e)}")
@@ -149,18 +219,23 @@ class MarketDataService:
 
     async def process_market_data(self):
         """处理市场数据"""
+        group_ready = False
         while self.running:
             try:
-                # 从Redis获取最新数据
-                latest_data = self.redis_client.xread(
-                    {self.config.get('redis.market_data_stream'): '0-0'},
-                    count=100,
-                    block=1000
-                )
+                if not group_ready:
+                    self.stream_consumer.ensure_group()
+                    group_ready = True
+                    
+                # 通过消费组读取新消息（阻塞读取放到线程中，避免阻塞事件循环）
+                messages = await asyncio.to_thread(self.stream_consumer.read_batch)
+                
+                processed = []
+                for message_id, data in messages:
+                    await self._process_market_data_message(data)
+                    processed.append(message_id)
                 
-                for stream, messages in latest_data:
-                    for message_id, data in messages:
-                        await self._process_market_data_message(data)
+                # 批量确认
+                self.stream_consumer.ack(processed)
                         
             except Exception as e:
                 self.logger.error(f"Error processing market data: {str(e)}")
@@ -192,20 +267,7 @@ class MarketDataService:
                     'close': float(data.get('close')),
                     'volume': float(data.get('volume'))
                 }
-                
-                self.kline_cache[symbol].append(kline_data)
-                
-                # 保持缓存大小
-                max_cache_size = self.config.get('market_data.max_kline_cache_size', 1000)
-                if len(self.kline_cache[symbol]) > max_cache_size:
-                    self.kline_cache[symbol].pop(0)
-                
-                # 触发回调
-                for callback in self.kline_callbacks:
-                    await callback(symbol, kline_data)
-                    
-                # 保存到数据库
-                self._save_kline_to_db(symbol, kline_data)
+                await self._handle_kline(symbol, kline_data)
                 
             elif message_type == 'orderbook':
                 self.orderbook_cache[symbol] = {
@@ -218,49 +280,90 @@ class MarketDataService:
                 for callback in self.orderbook_callbacks:
                     await callback(symbol, self.orderbook_cache[symbol])
                     
+                # 广播给订阅者
+                await self._broadcast_to_subscribers(symbol, {
+                    'type': 'orderbook',
+                    'symbol': symbol,
+                    **self.orderbook_cache[symbol]
+                })
+                    
         except Exception as e:
             self.logger.error(f"Error processing market data message: {str(e)}")
 
+    async def _handle_kline(self, symbol: str, kline_data: Dict):
+        """处理一根1分钟K线：缓存、回调、写库、追加特征并更新多周期K线"""
+        # 环形缓冲区容量固定，超出后自动覆盖最旧的K线
+        self.kline_cache[symbol].append(kline_data)
+        
+        # 先更新指标，回调中可直接读取最新值
+        self.indicator_sets[symbol].update(kline_data['close'], kline_data['timestamp'])
+        
+        # 触发回调
+        for callback in self.kline_callbacks:
+            await callback(symbol, kline_data)
+            
+        # 保存到数据库
+        self._save_kline_to_db(symbol, kline_data)
+        self._append_features(symbol, kline_data)
+        
+        # 各周期正在形成的K线随每根1分钟K线覆盖写入
+        try:
+            for bar in self.kline_rollup.update(symbol, kline_data):
+                self._save_kline_to_db(symbol, bar)
+        except Exception as e:
+            self.logger.error(f"Error rolling up kline for {symbol}: {str(e)}")
+
+    def _append_features(self, symbol: str, kline_data: Dict):
+        """下一根K线开始时上一根视为完成，追加到特征存储
+
+        只有存储末尾恰为本进程收到的前一根已完成K线（或尚无数据）时才追加；
+        重启后的缺口由回测/训练读取数据库时补齐，之后继续追加。
+        """
+        if self.feature_store is None:
+            return
+        previous = self._open_klines.get(symbol)
+        self._open_klines[symbol] = kline_data
+        if previous is None or to_wall_clock(kline_data['timestamp']) <= to_wall_clock(previous['timestamp']):
+            return
+        closed_at = to_wall_clock(previous['timestamp'])
+        after = self._closed_klines.get(symbol)
+        self._closed_klines[symbol] = closed_at
+        try:
+            self.feature_store.append(
+                symbol, [closed_at], [previous['close']], spec=self.feature_spec, after=after
+            )
+        except Exception as e:
+            self.logger.error(f"Error appending features for {symbol}: {str(e)}")
+
     async def _broadcast_to_subscribers(self, symbol: str, data: Dict):
         """广播数据给订阅者"""
         if symbol not in self.ws_connections:
             return
             
-        message = json.dumps(data)
-        disconnected = set()
-        
-        for websocket in self.ws_connections[symbol]:
-            try:
-                await websocket.send(message)
-            except websockets.ConnectionClosed:
-                disconnected.add(websocket)
-            except Exception as e:
-                self.logger.error(f"Error broadcasting message: {str(e)}")
-                disconnected.add(websocket)
-                
-        # 清理断开的连接
-        for websocket in disconnected:
-            self.ws_connections[symbol].remove(websocket)
+        # 只序列化一次，由各连接的发送协程并发发送；断开的连接通过回调清理
+        # 价格、订单簿等快照类消息在客户端落后时只保留每个合约的最新一条
+        message_type = data.get('type', 'tick')
+        key = (message_type, symbol) if message_type in self.conflate_types else None
+        self.fanout.publish(self.ws_connections[symbol], data, key=key)
+
+    def _remove_connection(self, websocket):
+        """从所有订阅列表中移除连接"""
+        for symbol in list(self.ws_connections):
+            connections = self.ws_connections[symbol]
+            connections.discard(websocket)
+            if not connections:
+                del self.ws_connections[symbol]
 
     def _save_kline_to_db(self, symbol: str, kline_data: Dict):
-        """保存K线数据到数据库"""
+        """保存K线数据到数据库（写入缓冲区，由后台线程批量提交）"""
         try:
-            market_data = MarketData(
-                symbol=symbol,
-                timestamp=datetime.fromtimestamp(kline_data['timestamp']),
-                open=kline_data['open'],
-                high=kline_data['high'],
-                low=kline_data['low'],
-                close=kline_data['close'],
-                volume=kline_data['volume']
-            )
-            
-            self.db_session.add(market_data)
-            self.db_session.commit()
-            
+            self.kline_persister.submit(symbol, kline_data)
         except Exception as e:
             self.logger.error(f"Error saving kline data to database: {str(e)}")
-            self.db_session.rollback()
+
+    def get_persister_metrics(self) -> Dict:
+        """获取K线写入指标（刷新延迟、队列深度等）"""
+        return self.kline_persister.get_metrics()
 
     async def clean_old_data(self):
         """清理旧数据"""
@@ -327,6 +430,14 @@ class MarketDataService:
         self.kline_callbacks.remove(callback)
         self.orderbook_callbacks.remove(callback)
 
+    def get_kline_array(self, symbol: str, n: Optional[int] = None) -> np.ndarray:
+        """获取最近 n 根缓存K线（结构化数组视图）"""
+        return self.kline_cache[symbol].last(n)
+
+    def get_kline_frame(self, symbol: str, n: Optional[int] = None) -> pd.DataFrame:
+        """获取最近 n 根缓存K线（DataFrame）"""
+        return self.kline_cache[symbol].to_frame(n)
+
     def get_latest_price(self, symbol: str) -> float:
         """获取最新价格"""
         if symbol in self.price_cache:
@@ -364,9 +475,42 @@ class MarketDataService:
             # 广播给订阅者
             await self._broadcast_to_subscribers(symbol, data)
             
+            # 逐笔成交聚合K线
+            if self.tick_aggregators and data.get('latest_price') is not None:
+                await self._aggregate_tick(symbol, data)
+            
         except Exception as e:
             self.logger.error(f"处理市场数据时出错: {str(e)}")
 
+    async def _aggregate_tick(self, symbol: str, data: Dict):
+        """将一笔成交送入各K线聚合器，完成的K线交给K线处理流程"""
+        timestamp = self._tick_time(data.get('update_time'))
+        price = float(data['latest_price'])
+        volume = float(data.get('last_volume') or 0.0)
+        for aggregator in self.tick_aggregators:
+            for bar in aggregator.on_tick(symbol, timestamp, price, volume):
+                await self._emit_bar(symbol, bar)
+
+    async def _emit_bar(self, symbol: str, bar: Dict):
+        """输出聚合得到的K线：1分钟K线走完整的K线处理流程，其他K线只触发回调"""
+        if bar['interval'] == '1m':
+            await self._handle_kline(symbol, bar)
+            return
+        for callback in self.kline_callbacks:
+            await callback(symbol, bar)
+
+    @staticmethod
+    def _tick_time(value) -> float:
+        """解析成交时间为 Unix 秒（支持秒、毫秒和 ISO 字符串），缺失时使用当前时间"""
+        if value is None or value == '':
+            return time.time()
+        if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace('.', '', 1).isdigit()):
+            value = float(value)
+            return value / 1000 if value > 1e11 else value
+        if isinstance(value, datetime):
+            return value.timestamp()
+        return datetime.fromisoformat(value).timestamp()
+
     def get_historical_data(self, symbol: str, start_time: datetime = None, end_time: datetime = None) -> pd.DataFrame:
         """获取历史数据"""
         df = self.historical_data[self.historical_data['symbol'] == symbol].copy()
@@ -376,35 +520,31 @@ class MarketDataService:
             df = df[df['timestamp'] <= pd.Timestamp(end_time)]
         return df
 
+    def get_indicators(self, symbol: str) -> Dict:
+        """获取合约的最新指标值（增量维护，不重新计算）"""
+        if symbol not in self.indicator_sets:
+            return {}
+        return self.indicator_sets[symbol].values()
+
     def calculate_indicators(self, symbol: str, window: int = 20) -> Dict:
         """计算基本技术指标"""
-        df = self.get_historical_data(symbol)
-        if len(df) < window:
+        if window == self.indicator_window:
+            values = self.get_indicators(symbol)
+        else:
+            # 非默认窗口：用缓存的K线临时计算一次
+            indicator_set = IndicatorSet(IndicatorSet.default(window))
+            for close in self.kline_cache[symbol].column('close'):
+                indicator_set.update(float(close))
+            values = indicator_set.values()
+        if not values or np.isnan(values['bbands_middle']) or np.isnan(values['rsi']):
             return {}
-            
-        # 计算简单指标
-        prices = df['price'].values
-        sma = np.mean(prices[-window:])
-        std = np.std(prices[-window:])
-        rsi = self._calculate_rsi(prices, window)
         
         return {
-            'sma': float(sma),
-            'upper_band': float(sma + (2 * std)),
-            'lower_band': float(sma - (2 * std)),
-            'rsi': float(rsi)
+            'sma': float(values['bbands_middle']),
+            'upper_band': float(values['bbands_upper']),
+            'lower_band': float(values['bbands_lower']),
+            'rsi': float(values['rsi'])
         }
-        
-    def _calculate_rsi(self, prices: np.array, window: int = 14) -> float:
-        """计算RSI指标"""
-        deltas = np.diff(prices)
-        seed = deltas[:window+1]
-        up = seed[seed >= 0].sum()/window
-        down = -seed[seed < 0].sum()/window
-        if down == 0:
-            return 100
-        rs = up/down
-        return 100 - (100/(1+rs))
 
     def on_message(self, ws, message):
         """处理接收到的消息"""
@@ -478,6 +618,7 @@ class MarketDataService:
         self.running = False
         if self.ws:
             self.ws.close()
+        self.kline_persister.close()
 
     def subscribe(self, symbols: list, market_type: str = 'cn_stocks'):
         """订阅市场数据"""
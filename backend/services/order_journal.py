@@ -0,0 +1,358 @@
+import asyncio
+import json
+import os
+import struct
+import time
+import zlib
+import logging
+from collections import deque
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+from backend.models.database import Order, Trade
+
+# 记录头：负载长度 + 负载 crc32（小端）
+RECORD_HEADER = struct.Struct('<II')
+
+# 订单事件类型
+SUBMITTED = 'submitted'
+CANCELLED = 'cancelled'
+FILLED = 'filled'
+REJECTED = 'rejected'
+
+# 压缩日志时写在开头的标记，记录压缩前的最大序号，保证重启后序号不回退
+SEQ_MARKER = 'seq_marker'
+
+ORDER_FIELDS = (
+    'order_id', 'client_order_id', 'user_id', 'symbol', 'side', 'order_type',
+    'quantity', 'price', 'stop_price', 'time_in_force', 'status', 'created_at'
+)
+DECIMAL_FIELDS = {'quantity', 'price', 'stop_price', 'executed_quantity', 'average_price', 'commission'}
+DATETIME_FIELDS = {'created_at', 'updated_at', 'executed_at'}
+
+def _encode_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _decode_value(name: str, value):
+    if value is None:
+        return None
+    if name in DECIMAL_FIELDS:
+        return Decimal(value)
+    if name in DATETIME_FIELDS:
+        return datetime.fromisoformat(value)
+    return value
+
+def order_to_event(order: Order) -> Dict:
+    """将订单转换为 submitted 事件数据"""
+    return {name: _encode_value(getattr(order, name)) for name in ORDER_FIELDS}
+
+def order_from_event(data: Dict) -> Order:
+    """由 submitted 事件数据重建订单"""
+    return Order(**{name: _decode_value(name, data.get(name)) for name in ORDER_FIELDS})
+
+def encode_record(event: Dict) -> bytes:
+    """编码单条记录：长度前缀 + crc32 + JSON 负载"""
+    payload = json.dumps(event, separators=(',', ':'), default=_encode_value).encode('utf-8')
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+def read_records(path: str) -> Tuple[List[Dict], int]:
+    """读取日志中的全部完整记录，返回 (事件列表, 有效字节数)
+
+    遇到不完整或校验失败的记录即停止（崩溃时写了一半的尾部记录）。
+    """
+    events: List[Dict] = []
+    if not os.path.exists(path):
+        return events, 0
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        length, checksum = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            break
+        events.append(json.loads(payload))
+        offset = start + length
+    return events, offset
+
+class OrderJournal:
+    """订单事件日志
+
+    追加写入长度前缀的二进制记录，采用组提交：写入协程每次取走所有待写事件，
+    一次 write + 一次 fsync 覆盖整批事件。append 返回的 Future 在事件落盘后完成，
+    落盘后的事件按顺序推送给监听者（如数据库投影）。
+    """
+
+    def __init__(self, path: str, fsync: bool = True, max_batch: int = 4096):
+        self.path = path
+        self.fsync = fsync
+        self.max_batch = max_batch
+        self.logger = logging.getLogger(__name__)
+
+        self.seq: int = 0
+        self.listeners: List[Callable[[List[Dict]], None]] = []
+        self._pending: List[Tuple[bytes, Dict, asyncio.Future]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._file = None
+
+        # 统计
+        self.events_written: int = 0
+        self.commit_count: int = 0
+        self.batch_sizes = deque(maxlen=1000)
+        self.commit_latency = deque(maxlen=1000)
+
+    def replay(self) -> List[Dict]:
+        """读取日志中的全部事件，并截断崩溃时残留的不完整尾部"""
+        records, valid_length = read_records(self.path)
+        if os.path.exists(self.path) and os.path.getsize(self.path) > valid_length:
+            self.logger.warning(f"Truncating torn order journal tail at offset {valid_length}")
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_length)
+        if records:
+            self.seq = max(self.seq, max(record['seq'] for record in records))
+        return [record for record in records if record['type'] != SEQ_MARKER]
+
+    def compact(self, events: List[Dict]):
+        """用给定事件重写日志（原子替换），用于启动时丢弃已投影且已结束的订单
+
+        开头写入当前最大序号的标记，被丢弃的事件的序号不会在重启后被重新分配。
+        """
+        if self._file is not None:
+            raise RuntimeError("Cannot compact an open journal")
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        marker = {'seq': self.seq, 'type': SEQ_MARKER, 'ts': time.time(), 'data': {}}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(b''.join(encode_record(event) for event in [marker, *events]))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    async def start(self):
+        """打开日志并启动写入协程"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._file = open(self.path, 'ab')
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._writer_task = asyncio.create_task(self._run())
+
+    def append(self, event_type: str, data: Dict) -> asyncio.Future:
+        """追加事件，返回落盘后完成的 Future（结果为事件序号）"""
+        if self._writer_task is None or self._closing:
+            raise RuntimeError("Order journal is not running")
+        self.seq += 1
+        event = {'seq': self.seq, 'type': event_type, 'ts': time.time(), 'data': data}
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((encode_record(event), event, future))
+        self._wakeup.set()
+        return future
+
+    async def stop(self):
+        """写完剩余事件后关闭日志"""
+        if self._writer_task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._writer_task
+        self._writer_task = None
+        self._file.close()
+        self._file = None
+
+    def get_metrics(self) -> Dict:
+        """获取组提交统计"""
+        batch_sizes = list(self.batch_sizes)
+        latencies = list(self.commit_latency)
+        return {
+            'events_written': self.events_written,
+            'commit_count': self.commit_count,
+            'pending': len(self._pending),
+            'avg_batch_size': sum(batch_sizes) / len(batch_sizes) if batch_sizes else 0.0,
+            'avg_commit_latency': sum(latencies) / len(latencies) if latencies else 0.0
+        }
+
+    async def _run(self):
+        """写入协程：fsync 期间到达的事件自动并入下一批"""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                await self._commit(batch)
+            if self._closing:
+                return
+
+    async def _commit(self, batch: List[Tuple[bytes, Dict, asyncio.Future]]):
+        """一次写入并 fsync 整批事件"""
+        start_time = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._write, b''.join(record for record, _, _ in batch))
+        except Exception as e:
+            self.logger.error(f"Error writing order journal: {str(e)}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.commit_count += 1
+        self.events_written += len(batch)
+        self.batch_sizes.append(len(batch))
+        self.commit_latency.append(time.perf_counter() - start_time)
+
+        events = [event for _, event, _ in batch]
+        for _, event, future in batch:
+            if not future.done():
+                future.set_result(event['seq'])
+        for listener in self.listeners:
+            try:
+                listener(events)
+            except Exception as e:
+                self.logger.error(f"Error notifying journal listener: {str(e)}")
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+class OrderProjector:
+    """将订单事件批量投影到 orders/trades 表
+
+    每批事件一个事务；已投影的最大序号记录在检查点文件中，重启时只补投之后的事件。
+    """
+
+    def __init__(self, session_factory, checkpoint_path: Optional[str] = None,
+                 batch_size: int = 500, interval: float = 0.5):
+        self.session_factory = session_factory
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.logger = logging.getLogger(__name__)
+
+        self.projected_seq: int = self._read_checkpoint()
+        self._buffer: List[Dict] = []
+        # 在 run() 中创建，绑定到运行中的事件循环
+        self._ready: Optional[asyncio.Event] = None
+
+        # 统计
+        self.projected_count: int = 0
+
+    def enqueue(self, events: List[Dict]):
+        """接收已落盘的事件（日志监听回调）"""
+        self._buffer.extend(events)
+        if self._ready is not None and len(self._buffer) >= self.batch_size:
+            self._ready.set()
+
+    @property
+    def lag(self) -> int:
+        """待投影事件数"""
+        return len(self._buffer)
+
+    async def run(self):
+        """定期或攒满一批时投影"""
+        self._ready = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._ready.clear()
+            await self.flush()
+
+    async def flush(self):
+        """投影缓冲区中的全部事件"""
+        while self._buffer:
+            events = self._buffer[:self.batch_size]
+            try:
+                await asyncio.to_thread(self.apply, events)
+            except Exception as e:
+                # 保留事件，下一轮重试
+                self.logger.error(f"Error projecting order events: {str(e)}")
+                return
+            del self._buffer[:len(events)]
+
+    def apply(self, events: List[Dict]) -> int:
+        """在一个事务中应用一批事件，返回应用的事件数"""
+        events = [event for event in events if event['seq'] > self.projected_seq]
+        if not events:
+            return 0
+
+        session = self.session_factory()
+        try:
+            order_ids = list({event['data']['order_id'] for event in events})
+            rows: Dict[str, Order] = {
+                row.order_id: row
+                for row in session.query(Order).filter(Order.order_id.in_(order_ids)).all()
+            }
+
+            for event in events:
+                data = event['data']
+                row = rows.get(data['order_id'])
+                if event['type'] == SUBMITTED:
+                    if row is None:
+                        row = order_from_event(data)
+                        session.add(row)
+                        rows[row.order_id] = row
+                    continue
+
+                if row is None:
+                    self.logger.warning(f"Order {data['order_id']} not found for {event['type']} event")
+                    continue
+                if row.status in ('FILLED', 'CANCELLED', 'REJECTED'):
+                    # 重复投影
+                    continue
+
+                row.status = data['status']
+                row.updated_at = _decode_value('updated_at', data.get('updated_at'))
+                if event['type'] == FILLED:
+                    row.executed_quantity = _decode_value('executed_quantity', data['executed_quantity'])
+                    row.average_price = _decode_value('average_price', data['average_price'])
+                    row.filled_price = row.average_price
+                    row.filled_time = _decode_value('executed_at', data['executed_at'])
+                    session.add(Trade(
+                        user_id=row.user_id,
+                        order=row,
+                        symbol=row.symbol,
+                        side=row.side,
+                        quantity=row.executed_quantity,
+                        price=row.average_price,
+                        commission=_decode_value('commission', data.get('commission')),
+                        timestamp=row.filled_time
+                    ))
+
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        self.projected_seq = events[-1]['seq']
+        self.projected_count += len(events)
+        self._write_checkpoint()
+        return len(events)
+
+    def _read_checkpoint(self) -> int:
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            return int(content) if content else 0
+        return 0
+
+    def _write_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        os.makedirs(os.path.dirname(self.checkpoint_path) or '.', exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(self.projected_seq))
+        os.replace(tmp_path, self.checkpoint_path)
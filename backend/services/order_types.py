@@ -0,0 +1,18 @@
+from enum import Enum
+
+class OrderStatus(Enum):
+    PENDING = "PENDING"
+    PARTIAL = "PARTIAL"
+    FILLED = "FILLED"
+    CANCELLED = "CANCELLED"
+    REJECTED = "REJECTED"
+
+class OrderType(Enum):
+    MARKET = "MARKET"
+    LIMIT = "LIMIT"
+    STOP = "STOP"
+    STOP_LIMIT = "STOP_LIMIT"
+
+class OrderSide(Enum):
+    BUY = "BUY"
+    SELL = "SELL"
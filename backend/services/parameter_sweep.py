@@ -0,0 +1,329 @@
+import importlib
+import itertools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from backend.services.backtest_service import BacktestService
+
+logger = logging.getLogger(__name__)
+
+# 参数空间：(下界, 上界) 表示连续/整数区间，列表表示离散取值
+ParameterSpace = Dict[str, Union[Tuple, Sequence]]
+
+def grid_samples(grid: Dict[str, Sequence]) -> List[Dict]:
+    """网格：所有取值的笛卡尔积"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+def random_samples(space: ParameterSpace, n: int, seed: Optional[int] = None) -> List[Dict]:
+    """随机采样"""
+    rng = np.random.default_rng(seed)
+    columns = {name: _scale(bounds, rng.random(n)) for name, bounds in space.items()}
+    return [{name: values[i] for name, values in columns.items()} for i in range(n)]
+
+def latin_hypercube_samples(space: ParameterSpace, n: int, seed: Optional[int] = None) -> List[Dict]:
+    """拉丁超立方采样：每个维度的 n 个等分区间各取一个点"""
+    rng = np.random.default_rng(seed)
+    columns = {
+        name: _scale(bounds, (rng.permutation(n) + rng.random(n)) / n)
+        for name, bounds in space.items()
+    }
+    return [{name: values[i] for name, values in columns.items()} for i in range(n)]
+
+def _scale(bounds: Union[Tuple, Sequence], u: np.ndarray) -> List:
+    """将 [0, 1) 上的样本映射到参数取值"""
+    if isinstance(bounds, tuple):
+        low, high = bounds
+        if isinstance(low, int) and isinstance(high, int):
+            # 整数区间包含上界
+            return np.minimum(low + np.floor(u * (high - low + 1)), high).astype(int).tolist()
+        return (low + u * (high - low)).tolist()
+    choices = list(bounds)
+    return [choices[i] for i in np.minimum((u * len(choices)).astype(int), len(choices) - 1)]
+
+@dataclass(frozen=True)
+class SharedFrameSpec:
+    """共享内存中 OHLCV 数据的描述（可跨进程传递）"""
+    name: str
+    length: int
+    columns: Tuple[str, ...]
+    datetime_index: bool
+
+def share_frame(data: pd.DataFrame) -> Tuple[shared_memory.SharedMemory, SharedFrameSpec]:
+    """将数据复制到共享内存：前 length 个 int64 为索引，其后为按行存放的 float64 数值"""
+    columns = tuple(data.columns)
+    length = len(data)
+    datetime_index = isinstance(data.index, pd.DatetimeIndex)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, length * 8 * (1 + len(columns))))
+
+    index, values = _frame_views(shm, length, len(columns))
+    if datetime_index:
+        index[:] = data.index.as_unit('ns').asi8
+    else:
+        index[:] = np.arange(length)
+    values[:] = data.to_numpy(dtype=float)
+    return shm, SharedFrameSpec(shm.name, length, columns, datetime_index)
+
+def attach_frame(spec: SharedFrameSpec) -> Tuple[shared_memory.SharedMemory, pd.DataFrame]:
+    """在工作进程中挂载共享内存数据（需保留返回的 shm 引用）"""
+    shm = shared_memory.SharedMemory(name=spec.name)
+    index, values = _frame_views(shm, spec.length, len(spec.columns))
+    if spec.datetime_index:
+        frame_index = pd.DatetimeIndex(index.view('datetime64[ns]'))
+    else:
+        frame_index = pd.RangeIndex(spec.length)
+    return shm, pd.DataFrame(values, index=frame_index, columns=list(spec.columns), copy=False)
+
+def _frame_views(shm: shared_memory.SharedMemory, length: int, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    index = np.ndarray((length,), dtype=np.int64, buffer=shm.buf)
+    values = np.ndarray((length, width), dtype=np.float64, buffer=shm.buf, offset=length * 8)
+    return index, values
+
+def evaluate(strategy_cls, strategy_kwargs: Dict, params: Dict, data: pd.DataFrame,
+             start: int = 0, end: Optional[int] = None, cache: Optional[Dict] = None,
+             initial_capital: float = 100000.0, commission_rate: float = 0.0) -> Dict:
+    """在 data[start:end] 上回测一组参数
+
+    仓位在完整数据上计算后再截取窗口，指标可通过 cache 在参数组合和窗口之间复用。
+    """
+    strategy = strategy_cls(**strategy_kwargs, **params)
+    positions = strategy.generate_positions(data, cache=cache)
+    return BacktestService().run_vectorized(
+        data.iloc[start:end],
+        positions[start:end],
+        initial_capital=initial_capital,
+        commission_rate=commission_rate
+    )
+
+# 工作进程状态：共享数据、指标缓存和回测配置
+_worker: Dict = {}
+
+def _init_worker(spec: SharedFrameSpec, strategy_cls, strategy_kwargs: Dict, backtest_kwargs: Dict):
+    shm, data = attach_frame(spec)
+    _worker.update(
+        shm=shm,
+        data=data,
+        cache={},
+        strategy_cls=strategy_cls,
+        strategy_kwargs=strategy_kwargs,
+        backtest_kwargs=backtest_kwargs
+    )
+
+def _run_tasks(tasks: List[Tuple], state: Optional[Dict] = None) -> List[Dict]:
+    """执行一批任务：(task_id, params, start, end, keep_equity)"""
+    state = state if state is not None else _worker
+    results = []
+    for task_id, params, start, end, keep_equity in tasks:
+        record = {'task_id': task_id, 'params': params, 'start': start, 'end': end}
+        try:
+            result = evaluate(
+                state['strategy_cls'], state['strategy_kwargs'], params, state['data'],
+                start, end, cache=state['cache'], **state['backtest_kwargs']
+            )
+            record['metrics'] = result['metrics']
+            if keep_equity:
+                record['equity_curve'] = result['equity_curve']
+                record['trades'] = result['trades']
+        except Exception as e:
+            record['error'] = str(e)
+        results.append(record)
+    return results
+
+class ParameterSweep:
+    """并行参数扫描
+
+    OHLCV 数据放入共享内存，工作进程启动时挂载一次，任务只传递参数和窗口下标；
+    每个工作进程缓存指标，同一周期的均线在不同参数组合间复用。
+    结果按完成顺序流式返回，run 汇总为按指标排序的结果表。
+    """
+
+    def __init__(self, strategy_cls, data: pd.DataFrame, strategy_kwargs: Optional[Dict] = None,
+                 initial_capital: float = 100000.0, commission_rate: float = 0.0,
+                 max_workers: Optional[int] = None, chunksize: Optional[int] = None):
+        self.strategy_cls = strategy_cls
+        self.data = data
+        self.strategy_kwargs = strategy_kwargs or {}
+        self.backtest_kwargs = {'initial_capital': initial_capital, 'commission_rate': commission_rate}
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._local_state: Optional[Dict] = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        """创建共享内存和进程池（单进程时在本进程内执行）"""
+        if self._executor is not None or self._local_state is not None:
+            return
+        if self.max_workers == 1:
+            self._local_state = {
+                'data': self.data,
+                'cache': {},
+                'strategy_cls': self.strategy_cls,
+                'strategy_kwargs': self.strategy_kwargs,
+                'backtest_kwargs': self.backtest_kwargs
+            }
+            return
+        self._shm, spec = share_frame(self.data)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(spec, self.strategy_cls, self.strategy_kwargs, self.backtest_kwargs)
+        )
+
+    def close(self):
+        """关闭进程池并释放共享内存"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+        self._local_state = None
+
+    def iter_tasks(self, tasks: List[Tuple]) -> Iterator[Dict]:
+        """按完成顺序返回任务结果，任务格式为 (task_id, params, start, end, keep_equity)"""
+        owns_pool = self._executor is None and self._local_state is None
+        if owns_pool:
+            self.start()
+        try:
+            if self._local_state is not None:
+                for task in tasks:
+                    yield from _run_tasks([task], self._local_state)
+                return
+
+            chunksize = self.chunksize or max(1, len(tasks) // (self.max_workers * 8))
+            futures = [
+                self._executor.submit(_run_tasks, tasks[i:i + chunksize])
+                for i in range(0, len(tasks), chunksize)
+            ]
+            for future in as_completed(futures):
+                yield from future.result()
+        finally:
+            if owns_pool:
+                self.close()
+
+    def iter_results(self, param_sets: List[Dict], start: int = 0,
+                     end: Optional[int] = None) -> Iterator[Dict]:
+        """在同一窗口上回测多组参数，按完成顺序返回"""
+        tasks = [(i, params, start, end, False) for i, params in enumerate(param_sets)]
+        return self.iter_tasks(tasks)
+
+    def run(self, param_sets: List[Dict], rank_by: str = 'sharpe_ratio', ascending: bool = False,
+            constraint: Optional[Callable[[Dict], bool]] = None,
+            on_result: Optional[Callable[[Dict], None]] = None) -> pd.DataFrame:
+        """运行扫描，返回按 rank_by 排序的参数与指标表"""
+        if constraint is not None:
+            param_sets = [params for params in param_sets if constraint(params)]
+
+        rows = []
+        for record in self.iter_results(param_sets):
+            if on_result is not None:
+                on_result(record)
+            if 'error' in record:
+                logger.warning(f"Sweep task {record['params']} failed: {record['error']}")
+                continue
+            rows.append({**record['params'], **record['metrics']})
+
+        table = pd.DataFrame(rows)
+        if table.empty or rank_by not in table.columns:
+            return table
+        return table.sort_values(rank_by, ascending=ascending, na_position='last').reset_index(drop=True)
+
+def _parse_number(text: str) -> Union[int, float]:
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+def parse_parameter(text: str, method: str) -> Tuple[str, Union[Tuple, List]]:
+    """解析命令行参数定义：name=a,b,c | name=low:high | name=start:stop:step（含终点）"""
+    name, _, spec = text.partition('=')
+    if ':' not in spec:
+        return name, [_parse_number(value) for value in spec.split(',')]
+
+    parts = [_parse_number(value) for value in spec.split(':')]
+    if len(parts) == 2 and method != 'grid':
+        return name, (parts[0], parts[1])
+    low, high = parts[0], parts[1]
+    step = parts[2] if len(parts) > 2 else 1
+    values = np.arange(low, high + step / 2, step)
+    return name, values.astype(int).tolist() if all(isinstance(p, int) for p in parts) else values.tolist()
+
+def load_strategy(path: str):
+    """按 module:Class 加载策略类"""
+    module_name, _, class_name = path.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="策略参数并行扫描")
+    parser.add_argument('--strategy', default='backend.strategy.ma_cross_strategy:MACrossStrategy',
+                        help='策略类，格式 module:Class')
+    parser.add_argument('--symbol', required=True, help='合约代码')
+    parser.add_argument('--timeframe', default='1m', help='K线周期')
+    parser.add_argument('--start', required=True, help='开始日期 YYYY-MM-DD')
+    parser.add_argument('--end', required=True, help='结束日期 YYYY-MM-DD')
+    parser.add_argument('--param', action='append', required=True,
+                        help='参数定义，如 fast_period=5:50:5、slow_period=20:200 或 period=10,20,30')
+    parser.add_argument('--method', choices=['grid', 'random', 'lhs'], default='grid', help='采样方式')
+    parser.add_argument('--samples', type=int, default=1000, help='随机/拉丁超立方采样数量')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    parser.add_argument('--less-than', action='append', default=[],
+                        help='参数约束 a:b，只保留 a < b 的组合')
+    parser.add_argument('--capital', type=float, default=100000.0, help='初始资金')
+    parser.add_argument('--commission', type=float, default=0.0, help='手续费率')
+    parser.add_argument('--workers', type=int, default=None, help='工作进程数')
+    parser.add_argument('--rank-by', default='sharpe_ratio', help='排序指标')
+    parser.add_argument('--ascending', action='store_true', help='升序排序')
+    parser.add_argument('--top', type=int, default=20, help='输出前 N 组参数')
+    parser.add_argument('--output', default=None, help='保存完整结果的 CSV 路径')
+    args = parser.parse_args()
+
+    space = dict(parse_parameter(text, args.method) for text in args.param)
+    if args.method == 'grid':
+        param_sets = grid_samples(space)
+    elif args.method == 'random':
+        param_sets = random_samples(space, args.samples, args.seed)
+    else:
+        param_sets = latin_hypercube_samples(space, args.samples, args.seed)
+
+    pairs = [tuple(text.split(':')) for text in args.less_than]
+    constraint = (lambda params: all(params[a] < params[b] for a, b in pairs)) if pairs else None
+
+    data = BacktestService()._get_historical_data(
+        args.symbol,
+        datetime.strptime(args.start, '%Y-%m-%d'),
+        datetime.strptime(args.end, '%Y-%m-%d')
+    )
+    sweep = ParameterSweep(
+        load_strategy(args.strategy),
+        data,
+        strategy_kwargs={'symbol': args.symbol, 'timeframe': args.timeframe},
+        initial_capital=args.capital,
+        commission_rate=args.commission,
+        max_workers=args.workers
+    )
+    table = sweep.run(param_sets, rank_by=args.rank_by, ascending=args.ascending, constraint=constraint)
+
+    print(table.head(args.top).to_string())
+    if args.output:
+        table.to_csv(args.output, index=False)
+
+if __name__ == "__main__":
+    main()
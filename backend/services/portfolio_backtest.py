@@ -0,0 +1,153 @@
+from datetime import datetime
+from typing import Dict, List, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from backend.models.database import MarketData, SessionLocal
+from backend.services.backtest_service import BacktestResult
+
+def align_panel(frames: Dict[str, pd.DataFrame], column: str = 'close') -> Tuple[pd.DatetimeIndex, List[str], np.ndarray]:
+    """将多个合约的数据按时间对齐为 T×N 矩阵
+
+    时间轴取所有合约时间戳的并集；上市后缺失的价格沿用上一价格，上市前为 NaN。
+    """
+    symbols = sorted(frames)
+    if not symbols:
+        return pd.DatetimeIndex([]), [], np.empty((0, 0))
+    panel = pd.concat({symbol: frames[symbol][column] for symbol in symbols}, axis=1, sort=True)
+    return panel.index, symbols, panel.ffill().to_numpy(dtype=float)
+
+def rebalance_points(index: pd.DatetimeIndex, rule: Union[int, str, np.ndarray]) -> np.ndarray:
+    """计算调仓位置：整数为每隔 k 根K线，字符串为每个周期（如 'W'、'M'）的第一根K线，也可直接传入布尔数组"""
+    length = len(index)
+    if isinstance(rule, (int, np.integer)):
+        return np.arange(0, length, int(rule))
+    if isinstance(rule, str):
+        periods = index.to_period(rule).asi8
+        return np.flatnonzero(np.diff(periods, prepend=periods[0] - 1) != 0)
+    return np.flatnonzero(np.asarray(rule, dtype=bool))
+
+def signal_to_weights(signal: np.ndarray, long_only: bool = True) -> np.ndarray:
+    """将 T×N 信号按行归一化为目标权重（总敞口为 1）"""
+    signal = np.nan_to_num(np.asarray(signal, dtype=float))
+    if long_only:
+        signal = np.clip(signal, 0.0, None)
+    gross = np.abs(signal).sum(axis=1, keepdims=True)
+    return np.divide(signal, gross, out=np.zeros_like(signal), where=gross > 0)
+
+class PortfolioBacktestService:
+    """多合约组合回测
+
+    价格对齐为 T×N 矩阵，持仓数量和共享资金保存在数组中；只在调仓点循环，
+    每次调仓对全部合约做一次向量运算，两次调仓之间的权益由矩阵乘法一次算出。
+    """
+
+    def run(self, index: pd.DatetimeIndex, symbols: List[str], prices: np.ndarray,
+            weights: np.ndarray, rebalance: Union[int, str, np.ndarray] = 1,
+            initial_capital: float = 1000000.0, commission_rate: float = 0.0,
+            record_trades: bool = True) -> Dict:
+        """按目标权重回测，weights[t] 为第 t 根K线收盘时的目标权重"""
+        prices = np.asarray(prices, dtype=float)
+        weights = np.asarray(weights, dtype=float)
+        length, width = prices.shape
+        if weights.shape != prices.shape:
+            raise ValueError(f"Weights shape {weights.shape} does not match prices {prices.shape}")
+
+        points = rebalance_points(index, rebalance)
+        tradable = ~np.isnan(prices)
+        valued = np.nan_to_num(prices)
+
+        cash = initial_capital
+        shares = np.zeros(width)
+        holdings = np.zeros((len(points), width))
+        equity = np.empty(length)
+        commissions = np.zeros(len(points))
+        turnover = np.zeros(len(points))
+        trades = []
+
+        # 第一个调仓点之前空仓
+        first = points[0] if len(points) else length
+        equity[:first] = initial_capital
+
+        bounds = np.append(points, length)
+        for k, t in enumerate(points):
+            price = valued[t]
+            portfolio_value = cash + shares @ price
+
+            # 未上市/无价格的合约不参与调仓
+            target_weight = np.where(tradable[t], np.nan_to_num(weights[t]), 0.0)
+            target = np.divide(
+                target_weight * portfolio_value, price,
+                out=np.where(tradable[t], 0.0, shares), where=tradable[t] & (price > 0)
+            )
+            delta = target - shares
+            traded_value = delta * price
+            commission = np.abs(traded_value).sum() * commission_rate
+
+            cash -= traded_value.sum() + commission
+            shares = target
+            holdings[k] = shares
+            commissions[k] = commission
+            turnover[k] = np.abs(traded_value).sum() / portfolio_value if portfolio_value else 0.0
+
+            for j in np.flatnonzero(np.abs(delta) > 1e-12) if record_trades else ():
+                trades.append({
+                    'timestamp': index[t],
+                    'symbol': symbols[j],
+                    'type': 'BUY' if delta[j] > 0 else 'SELL',
+                    'price': float(price[j]),
+                    'quantity': float(abs(delta[j])),
+                    'commission': float(abs(traded_value[j]) * commission_rate),
+                    'pnl': 0.0
+                })
+
+            # 持仓不变的区间一次算出权益
+            end = bounds[k + 1]
+            equity[t:end] = cash + valued[t:end] @ shares
+
+        result = BacktestResult()
+        result.equity_curve = equity.tolist()
+        result.returns = (equity[1:] / equity[:-1] - 1.0).tolist()
+        metrics = result.calculate_metrics()
+        metrics['total_commission'] = float(commissions.sum())
+        metrics['average_turnover'] = float(turnover.mean()) if len(turnover) else 0.0
+
+        return {
+            'metrics': metrics,
+            'equity_curve': result.equity_curve,
+            'trades': trades,
+            'holdings': pd.DataFrame(holdings, index=index[points], columns=symbols),
+            'final_positions': dict(zip(symbols, shares.tolist())),
+            'cash': cash
+        }
+
+    def run_strategy(self, strategy, frames: Dict[str, pd.DataFrame],
+                     rebalance: Union[int, str, np.ndarray] = 1, long_only: bool = True,
+                     initial_capital: float = 1000000.0, commission_rate: float = 0.0) -> Dict:
+        """用策略的 T×N 仓位信号（generate_positions）等权分配资金"""
+        index, symbols, prices = align_panel(frames)
+        signal = strategy.generate_positions(prices)
+        return self.run(
+            index, symbols, prices, signal_to_weights(signal, long_only),
+            rebalance=rebalance, initial_capital=initial_capital, commission_rate=commission_rate
+        )
+
+    def load_frames(self, symbols: Sequence[str], start_date: datetime, end_date: datetime) -> Dict[str, pd.DataFrame]:
+        """一次查询加载多个合约的历史数据"""
+        session = SessionLocal()
+        try:
+            rows = session.query(
+                MarketData.symbol, MarketData.timestamp, MarketData.close
+            ).filter(
+                MarketData.symbol.in_(list(symbols)),
+                MarketData.interval == '1m',
+                MarketData.timestamp.between(start_date, end_date)
+            ).order_by(MarketData.symbol, MarketData.timestamp).all()
+        finally:
+            session.close()
+
+        df = pd.DataFrame(rows, columns=['symbol', 'timestamp', 'close'])
+        df['close'] = df['close'].astype(float)
+        return {
+            symbol: group.set_index('timestamp')[['close']]
+            for symbol, group in df.groupby('symbol')
+        }
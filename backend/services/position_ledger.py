@@ -0,0 +1,322 @@
+import asyncio
+import glob
+import json
+import os
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from backend.models.database import Position
+
+@dataclass
+class LedgerPosition:
+    user_id: int
+    symbol: str
+    quantity: Decimal
+    average_price: Decimal
+    updated_at: datetime
+
+class PositionLedger:
+    """内存持仓账本
+
+    以 (user_id, symbol) 为键维护权威持仓，成交时 O(1) 更新，执行引擎与风控共用同一份数据。
+    每次成交追加写入成交日志（记录成交后的持仓状态，重放幂等），并定期将变更批量快照到 positions 表；
+    快照提交成功后删除已轮转的旧日志。启动时先加载数据库快照再重放日志即可恢复。
+
+    执行引擎先将 FILLED 事件写入订单日志（fsync）再更新账本，成交日志本身不必 fsync：
+    每条成交日志和每次快照都记录已应用的订单日志序号（applied_seq），
+    启动时由执行引擎按订单日志补记序号更大的成交。
+    """
+
+    def __init__(self, journal_path: Optional[str] = None, fsync: bool = False):
+        self.journal_path = journal_path
+        self.fsync = fsync
+        self.logger = logging.getLogger(__name__)
+
+        self.positions: Dict[Tuple[int, str], LedgerPosition] = {}
+        self._by_user: Dict[int, Dict[str, LedgerPosition]] = {}
+        self._dirty: Dict[Tuple[int, str], Optional[LedgerPosition]] = {}
+        self._journal = None
+        self._generation = 0
+
+        # 已应用的最大订单日志成交序号
+        self.applied_seq: int = 0
+
+        # 统计
+        self.fill_count: int = 0
+        self.snapshot_count: int = 0
+
+    def get(self, user_id: int, symbol: str) -> Optional[LedgerPosition]:
+        """获取单个持仓"""
+        return self.positions.get((user_id, symbol))
+
+    def positions_for(self, user_id: int) -> List[LedgerPosition]:
+        """获取用户的全部持仓"""
+        return list(self._by_user.get(user_id, {}).values())
+
+    def apply_fill(self, user_id: int, symbol: str, side: str,
+                   quantity: Decimal, price: Decimal, seq: Optional[int] = None) -> Optional[LedgerPosition]:
+        """根据成交更新持仓，返回更新后的持仓（平仓后返回 None）
+
+        seq 为该成交在订单日志中的序号，用于重启时判断哪些成交已经记入账本。
+        """
+        key = (user_id, symbol)
+        position = self.positions.get(key)
+        if position is None:
+            position = LedgerPosition(user_id, symbol, Decimal('0'), Decimal('0'), datetime.utcnow())
+
+        if side == 'BUY':
+            new_quantity = position.quantity + quantity
+            if new_quantity != 0:
+                position.average_price = (
+                    position.quantity * position.average_price + quantity * price
+                ) / new_quantity
+            position.quantity = new_quantity
+        else:
+            position.quantity -= quantity
+        position.updated_at = datetime.utcnow()
+
+        self._set(key, position if position.quantity != 0 else None)
+        if seq is not None:
+            self.applied_seq = max(self.applied_seq, seq)
+        self._write_journal(key, self.positions.get(key), seq)
+        self.fill_count += 1
+        return self.positions.get(key)
+
+    def load(self, session: Session):
+        """从 positions 表加载快照，并重放成交日志"""
+        self.positions.clear()
+        self._by_user.clear()
+        for row in session.query(Position).all():
+            self._set((row.user_id, row.symbol), LedgerPosition(
+                user_id=row.user_id,
+                symbol=row.symbol,
+                quantity=Decimal(str(row.quantity or 0)),
+                average_price=Decimal(str(row.avg_price or 0)),
+                updated_at=row.last_update or datetime.utcnow()
+            ))
+        self._dirty.clear()
+        self.applied_seq = self._read_checkpoint()
+        self._replay_journal()
+
+    def snapshot(self, session: Session) -> int:
+        """将变更的持仓写入 positions 表，返回写入条数"""
+        changes, generation, seq = self._begin_snapshot()
+        if not changes:
+            return 0
+        try:
+            self._write_snapshot(session, changes)
+        except Exception:
+            self._abort_snapshot(changes)
+            raise
+        self._finish_snapshot(generation, seq)
+        return len(changes)
+
+    async def snapshot_async(self, session_factory) -> int:
+        """在线程池中执行快照，不阻塞事件循环"""
+        changes, generation, seq = self._begin_snapshot()
+        if not changes:
+            return 0
+
+        def write():
+            session = session_factory()
+            try:
+                self._write_snapshot(session, changes)
+            finally:
+                session.close()
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, write)
+        except Exception:
+            self._abort_snapshot(changes)
+            raise
+        self._finish_snapshot(generation, seq)
+        return len(changes)
+
+    async def run_snapshots(self, session_factory, interval: float = 5.0):
+        """定期快照"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.snapshot_async(session_factory)
+            except Exception as e:
+                self.logger.error(f"Error snapshotting positions: {str(e)}")
+
+    def close(self):
+        """关闭成交日志"""
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+
+    def _set(self, key: Tuple[int, str], position: Optional[LedgerPosition]):
+        user_id, symbol = key
+        if position is None:
+            self.positions.pop(key, None)
+            user_positions = self._by_user.get(user_id)
+            if user_positions is not None:
+                user_positions.pop(symbol, None)
+                if not user_positions:
+                    del self._by_user[user_id]
+        else:
+            self.positions[key] = position
+            self._by_user.setdefault(user_id, {})[symbol] = position
+        self._dirty[key] = position
+
+    def _begin_snapshot(self):
+        """取出待写入的变更（及其覆盖的成交序号），并轮转成交日志"""
+        changes = {
+            key: None if position is None else LedgerPosition(**position.__dict__)
+            for key, position in self._dirty.items()
+        }
+        self._dirty.clear()
+        generation = self._rotate_journal() if changes else None
+        return changes, generation, self.applied_seq
+
+    def _abort_snapshot(self, changes: Dict):
+        """快照失败时恢复脏标记（期间的新变更优先）"""
+        for key in changes:
+            if key not in self._dirty:
+                self._dirty[key] = self.positions.get(key)
+
+    def _finish_snapshot(self, generation: Optional[int], seq: int):
+        """快照提交成功后记录快照覆盖的成交序号，再删除已轮转的日志"""
+        self.snapshot_count += 1
+        if self.journal_path is None:
+            return
+        self._write_checkpoint(seq)
+        if generation is None:
+            return
+        for path in self._rotated_journals():
+            if self._generation_of(path) <= generation:
+                os.remove(path)
+
+    @staticmethod
+    def _write_snapshot(session: Session, changes: Dict):
+        """批量写入持仓快照"""
+        try:
+            keys = list(changes)
+            rows = {}
+            for user_id in {user_id for user_id, _ in keys}:
+                symbols = [symbol for uid, symbol in keys if uid == user_id]
+                for row in session.query(Position).filter(
+                    Position.user_id == user_id,
+                    Position.symbol.in_(symbols)
+                ).all():
+                    rows[(row.user_id, row.symbol)] = row
+
+            for key, position in changes.items():
+                row = rows.get(key)
+                if position is None:
+                    if row is not None:
+                        session.delete(row)
+                    continue
+                if row is None:
+                    row = Position(user_id=position.user_id, symbol=position.symbol)
+                    session.add(row)
+                row.quantity = position.quantity
+                row.avg_price = position.average_price
+                row.last_update = position.updated_at
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+    def _read_checkpoint(self) -> int:
+        """读取最近一次快照覆盖的成交序号"""
+        if self.journal_path is None:
+            return 0
+        try:
+            with open(f"{self.journal_path}.seq", 'r', encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_checkpoint(self, seq: int):
+        """原子写入快照覆盖的成交序号"""
+        path = f"{self.journal_path}.seq"
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(seq))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _write_journal(self, key: Tuple[int, str], position: Optional[LedgerPosition],
+                       seq: Optional[int] = None):
+        """追加成交日志（记录成交后的持仓状态）"""
+        if self.journal_path is None:
+            return
+        if self._journal is None:
+            os.makedirs(os.path.dirname(self.journal_path) or '.', exist_ok=True)
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._journal.write(json.dumps({
+            'user_id': key[0],
+            'symbol': key[1],
+            'quantity': str(position.quantity) if position else '0',
+            'average_price': str(position.average_price) if position else '0',
+            'updated_at': (position.updated_at if position else datetime.utcnow()).isoformat(),
+            'seq': seq
+        }) + '\n')
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def _rotate_journal(self) -> Optional[int]:
+        """轮转成交日志，返回轮转出的日志代数"""
+        if self.journal_path is None:
+            return None
+        self.close()
+        if not os.path.exists(self.journal_path):
+            return None
+        generation = max(
+            [self._generation_of(path) for path in self._rotated_journals()] + [self._generation]
+        ) + 1
+        self._generation = generation
+        os.replace(self.journal_path, f"{self.journal_path}.{generation}")
+        return generation
+
+    def _rotated_journals(self) -> List[str]:
+        paths = glob.glob(f"{glob.escape(self.journal_path)}.*")
+        paths = [path for path in paths if path.rsplit('.', 1)[1].isdigit()]
+        return sorted(paths, key=self._generation_of)
+
+    @staticmethod
+    def _generation_of(path: str) -> int:
+        return int(path.rsplit('.', 1)[1])
+
+    def _replay_journal(self):
+        """按顺序重放成交日志"""
+        if self.journal_path is None:
+            return
+        paths = self._rotated_journals()
+        if os.path.exists(self.journal_path):
+            paths.append(self.journal_path)
+
+        replayed = 0
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 崩溃时写入不完整的最后一行
+                        continue
+                    quantity = Decimal(entry['quantity'])
+                    position = None
+                    if quantity != 0:
+                        position = LedgerPosition(
+                            user_id=entry['user_id'],
+                            symbol=entry['symbol'],
+                            quantity=quantity,
+                            average_price=Decimal(entry['average_price']),
+                            updated_at=datetime.fromisoformat(entry['updated_at'])
+                        )
+                    self._set((entry['user_id'], entry['symbol']), position)
+                    if entry.get('seq') is not None:
+                        self.applied_seq = max(self.applied_seq, entry['seq'])
+                    replayed += 1
+        if replayed:
+            self.logger.info(f"Replayed {replayed} position journal entries")
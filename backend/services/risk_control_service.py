@@ -43,6 +43,21 @@ class RiskControlService:
         self.risk_alerts: List[RiskAlert] = []
         self.position_cache: Dict[str, Position] = {}
         self.last_check_time: datetime = datetime.now()
+        
+        # 执行引擎共享的内存持仓账本
+        self.position_ledger = None
+
+    def attach_position_ledger(self, position_ledger):
+        """接入执行引擎的内存持仓账本"""
+        self.position_ledger = position_ledger
+
+    def _get_positions(self, user_id: int) -> List:
+        """获取用户持仓（优先使用内存账本）"""
+        if self.position_ledger is not None:
+            return self.position_ledger.positions_for(user_id)
+        return self.db.query(Position).filter(
+            Position.user_id == user_id
+        ).all()
 
     def _load_risk_limits(self):
         """加载风险限制配置"""
@@ -96,9 +111,7 @@ class RiskControlService:
         """计算风险指标"""
         try:
             # 获取用户持仓
-            positions = self.db.query(Position).filter(
-                Position.user_id == user_id
-            ).all()
+            positions = self._get_positions(user_id)
             
             # 计算持仓价值
             position_value = Decimal('0')
@@ -170,9 +183,7 @@ class RiskControlService:
             
             # 获取未实现盈亏
             unrealized_pnl = Decimal('0')
-            positions = self.db.query(Position).filter(
-                Position.user_id == user_id
-            ).all()
+            positions = self._get_positions(user_id)
             
             for position in positions:
                 current_price = Decimal(str(
@@ -2,13 +2,35 @@
 
 from typing import List, Dict
 from datetime import datetime
-from backend.models.database import Strategy, User
+from backend.models.database import Strategy, User, SessionLocal
+from backend.services.backtest_service import BacktestService
+from backend.services.backtest_cache import BacktestCache, make_cache_key
+from backend.strategy.ma_cross_strategy import MACrossStrategy
+import json
 import logging
 
+# 策略类型与策略类的对应关系
+STRATEGY_CLASSES = {
+    'ma_cross': MACrossStrategy,
+}
+
 class StrategyService:
-    def __init__(self):
+    def __init__(self, config=None, market_service=None, backtest_cache: BacktestCache = None):
         self.logger = logging.getLogger(__name__)
         self.strategies = []
+        self.config = config
+        self.market_service = market_service
+        self.backtest_service = BacktestService(config=config)
+        
+        # 回测结果缓存
+        if backtest_cache is None:
+            get = config.get if hasattr(config, 'get') else (lambda key, default=None: default)
+            backtest_cache = BacktestCache(
+                cache_dir=get('backtest.cache_dir', 'data/backtest_cache'),
+                max_entries=get('backtest.cache_max_entries', 1000),
+                max_bytes=get('backtest.cache_max_bytes', 512 * 1024 * 1024)
+            )
+        self.backtest_cache = backtest_cache
 
     def create_strategy(self, user_id, name, symbol, parameters):
         """
@@ -25,22 +47,71 @@ class StrategyService:
 
     def run_backtest(self, strategy_id, start_date, end_date, initial_capital):
         """
-        运行策略回测
+        运行策略回测（相同策略代码、参数、数据和日期范围直接返回缓存结果）
         """
         try:
-            # 示例：模拟回测结果
-            results = {
+            strategy_cls, symbol, timeframe, parameters = self._load_strategy(strategy_id)
+            start = self._parse_date(start_date)
+            end = self._parse_date(end_date)
+            
+            # 缓存键：策略和回测引擎代码版本 + 参数 + 实际读取数据的指纹 + 日期范围
+            strategy = strategy_cls(symbol, timeframe, **parameters)
+            data = self.backtest_service.load_backtest_data(strategy, start, end)
+            key = make_cache_key(
+                strategy_cls,
+                {**parameters, 'symbol': symbol, 'timeframe': timeframe, 'initial_capital': initial_capital},
+                self.backtest_service.data_fingerprint(data),
+                start,
+                end
+            )
+            
+            result = self.backtest_cache.get(key)
+            cached = result is not None
+            if not cached:
+                result = self.backtest_service.run_on_data(strategy, data, initial_capital)
+                self.backtest_cache.put(key, result)
+            
+            equity_curve = result['equity_curve']
+            return {
                 "strategy_id": strategy_id,
                 "start_date": start_date,
                 "end_date": end_date,
                 "initial_capital": initial_capital,
-                "final_capital": initial_capital * 1.2  # 假设回测增长 20%
+                "final_capital": equity_curve[-1] if equity_curve else initial_capital,
+                "metrics": result['metrics'],
+                "equity_curve": equity_curve,
+                "trades": result['trades'],
+                "cached": cached
             }
-            return results
         except Exception as e:
             self.logger.exception("运行回测时发生错误")
             raise
 
+    def _load_strategy(self, strategy_id):
+        """读取策略配置，返回 (策略类, 合约, 周期, 参数)"""
+        session = SessionLocal()
+        try:
+            strategy = session.get(Strategy, strategy_id)
+        finally:
+            session.close()
+        if strategy is None:
+            raise ValueError(f"Strategy {strategy_id} not found")
+        if strategy.type not in STRATEGY_CLASSES:
+            raise ValueError(f"Unsupported strategy type: {strategy.type}")
+        
+        parameters = json.loads(strategy.parameters or '{}')
+        symbol = parameters.pop('symbol', None)
+        if not symbol:
+            raise ValueError(f"Strategy {strategy_id} has no symbol parameter")
+        timeframe = parameters.pop('timeframe', '1m')
+        return STRATEGY_CLASSES[strategy.type], symbol, timeframe, parameters
+
+    @staticmethod
+    def _parse_date(value) -> datetime:
+        if isinstance(value, datetime):
+            return value
+        return datetime.fromisoformat(value)
+
     async def create_strategy(self, user: User, strategy_data: Dict):
         """创建新策略"""
         return {"message": "策略创建成功"}
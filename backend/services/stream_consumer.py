@@ -0,0 +1,145 @@
+import os
+import socket
+import logging
+from typing import Dict, List, Optional, Tuple
+import redis
+
+class MarketDataStreamConsumer:
+    """Redis Streams 消费组读取器
+
+    使用 XREADGROUP/XACK 消费行情流，消费进度（last-delivered-id）由 Redis 消费组持久化，
+    多个进程使用同一消费组即可分摊同一条流的消息。
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        stream: str,
+        group: str = 'market_data',
+        consumer: Optional[str] = None,
+        batch_size: int = 100,
+        block_ms: int = 1000,
+        claim_idle_ms: int = 60000
+    ):
+        self.redis_client = redis_client
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.logger = logging.getLogger(__name__)
+
+        # 启动时先处理本消费者未确认的消息，再读取新消息
+        self._pending_cursor: Optional[str] = '0'
+        self._claim_cursor: str = '0-0'
+        self.last_id: Optional[str] = None
+
+        # 统计
+        self.delivered_count: int = 0
+        self.acked_count: int = 0
+        self.claimed_count: int = 0
+
+    def ensure_group(self):
+        """创建消费组（已存在时忽略）"""
+        try:
+            self.redis_client.xgroup_create(self.stream, self.group, id='0', mkstream=True)
+            self.logger.info(f"Created consumer group {self.group} on {self.stream}")
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    def read_batch(self) -> List[Tuple[str, Dict]]:
+        """读取一批消息：先补处理未确认消息，再认领超时消息，最后读取新消息"""
+        if self._pending_cursor is not None:
+            messages = self._read(self._pending_cursor, block=None)
+            if messages:
+                self._pending_cursor = messages[-1][0]
+                return messages
+            self._pending_cursor = None
+
+        claimed = self._claim_idle()
+        if claimed:
+            return claimed
+
+        return self._read('>', block=self.block_ms)
+
+    def ack(self, message_ids: List[str]) -> int:
+        """批量确认消息"""
+        if not message_ids:
+            return 0
+        acked = self.redis_client.xack(self.stream, self.group, *message_ids)
+        self.acked_count += acked
+        return acked
+
+    def get_lag(self) -> Dict:
+        """获取消费组进度"""
+        for info in self.redis_client.xinfo_groups(self.stream):
+            info = self._decode(info)
+            if info.get('name') == self.group:
+                return {
+                    'last_delivered_id': info.get('last-delivered-id'),
+                    'pending': int(info.get('pending', 0)),
+                    'consumers': int(info.get('consumers', 0))
+                }
+        return {}
+
+    def _read(self, stream_id: str, block: Optional[int]) -> List[Tuple[str, Dict]]:
+        """执行 XREADGROUP"""
+        response = self.redis_client.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.stream: stream_id},
+            count=self.batch_size,
+            block=block
+        )
+        messages = []
+        for _, entries in response or []:
+            for message_id, fields in entries:
+                # 已被删除（XDEL/XTRIM）的未确认消息字段为空，直接确认
+                if not fields:
+                    self.ack([self._to_str(message_id)])
+                    continue
+                messages.append((self._to_str(message_id), self._decode(fields)))
+        if messages:
+            self.last_id = messages[-1][0]
+            self.delivered_count += len(messages)
+        return messages
+
+    def _claim_idle(self) -> List[Tuple[str, Dict]]:
+        """认领其他消费者长时间未确认的消息（需要 Redis >= 6.2）"""
+        if not self.claim_idle_ms:
+            return []
+        try:
+            response = self.redis_client.xautoclaim(
+                self.stream,
+                self.group,
+                self.consumer,
+                min_idle_time=self.claim_idle_ms,
+                start_id=self._claim_cursor,
+                count=self.batch_size
+            )
+        except (redis.ResponseError, AttributeError):
+            self.claim_idle_ms = 0
+            return []
+
+        self._claim_cursor = self._to_str(response[0])
+        messages = [
+            (self._to_str(message_id), self._decode(fields))
+            for message_id, fields in response[1]
+            if fields
+        ]
+        if messages:
+            self.claimed_count += len(messages)
+            self.delivered_count += len(messages)
+            self.last_id = messages[-1][0]
+        return messages
+
+    @staticmethod
+    def _to_str(value) -> str:
+        return value.decode() if isinstance(value, bytes) else value
+
+    @classmethod
+    def _decode(cls, fields: Dict) -> Dict:
+        """将 bytes 字段解码为字符串"""
+        return {cls._to_str(k): cls._to_str(v) for k, v in fields.items()}
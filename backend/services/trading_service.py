@@ -1,27 +1,114 @@
 # backend/services/trading_service.py
 
+import json
+import struct
 from datetime import datetime
-from typing import List, Dict
-from backend.models.database import Order, MarketData, User  # 修改导入路径
+from typing import Iterator, List, Dict, Optional
+import numpy as np
+import pandas as pd
+from dateutil.tz import tzlocal
+from backend.data.kline_query import KLINE_COLUMNS, iter_kline_pages, query_kline_page
+from backend.models.database import Order, MarketData, User, SessionLocal  # 修改导入路径
 import logging
 
+# 二进制K线帧头：本帧K线数量；随后依次为 timestamp(int64 毫秒) 和 open/high/low/close/volume(float64) 列
+KLINE_FRAME_HEADER = struct.Struct('<I')
+
+# market_data 中的时间戳是 datetime.fromtimestamp 写入的本地时间（无时区），
+# 与毫秒时间戳之间的转换都按本地时区进行
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    """解析 ISO 时间或毫秒时间戳为本地时间（无时区）"""
+    if value is None or value == '':
+        return None
+    if value.isdigit():
+        return datetime.fromtimestamp(int(value) / 1000)
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def _epoch_ms(timestamps: np.ndarray) -> np.ndarray:
+    """本地时间（无时区）的 datetime64[ns] 列转换为毫秒时间戳"""
+    index = pd.DatetimeIndex(timestamps).tz_localize(
+        tzlocal(), ambiguous=np.ones(len(timestamps), dtype=bool), nonexistent='shift_forward'
+    )
+    return index.as_unit('ns').asi8 // 1_000_000
+
+def _page_columns(page: Dict[str, np.ndarray]) -> Dict[str, list]:
+    """列数组转换为 JSON 列（时间戳为毫秒）"""
+    columns = {'timestamp': _epoch_ms(page['timestamp']).tolist()}
+    for column in KLINE_COLUMNS[1:]:
+        columns[column] = page[column].tolist()
+    return columns
+
 class TradingService:
-    def __init__(self):
+    def __init__(self, session_factory=None):
         self.logger = logging.getLogger(__name__)
         self.orders = []
+        self.session_factory = session_factory or SessionLocal
 
-    def get_klines(self, symbol: str, interval: str, start_time: str, end_time: str):
+    def get_klines(self, symbol: str, interval: str = '1m', start_time: Optional[str] = None,
+                   end_time: Optional[str] = None, cursor: Optional[str] = None,
+                   limit: int = 1000) -> Dict:
         """
-        获取 K 线数据，假设从数据库或外部 API 获取
+        获取一页 K 线数据（按列返回），next_cursor 用于请求下一页，没有更多数据时为 None
         """
         try:
-            # 示例：从数据库获取市场数据（这里你可以连接外部数据源或API）
-            market_data = MarketData.query.filter_by(symbol=symbol).all()  # 假设查询数据库
-            return market_data  # 返回查询的数据
+            session = self.session_factory()
+            try:
+                page, next_cursor = query_kline_page(
+                    session, symbol, _parse_time(start_time), _parse_time(end_time),
+                    interval, limit, _parse_time(cursor)
+                )
+            finally:
+                session.close()
+            return {
+                'symbol': symbol,
+                'interval': interval,
+                'klines': _page_columns(page),
+                'next_cursor': next_cursor.isoformat() if next_cursor else None
+            }
         except Exception as e:
             self.logger.exception("获取K线数据时发生错误")
             raise
 
+    def stream_klines(self, symbol: str, interval: str = '1m', start_time: Optional[str] = None,
+                      end_time: Optional[str] = None, cursor: Optional[str] = None,
+                      fmt: str = 'ndjson', page_size: int = 10000) -> Iterator[bytes]:
+        """
+        逐页流式输出时间范围内的全部 K 线，内存占用只与页大小有关
+
+        fmt 为 ndjson 时每行一根K线；为 binary 时每页一个帧（帧头 + 各列小端数组）
+        """
+        if fmt not in ('ndjson', 'binary'):
+            raise ValueError(f"Unsupported kline format: {fmt}")
+        start, end, after = _parse_time(start_time), _parse_time(end_time), _parse_time(cursor)
+
+        session = self.session_factory()
+        try:
+            for page in iter_kline_pages(session, symbol, start, end, interval, page_size, after):
+                if fmt == 'binary':
+                    yield self._encode_binary(page)
+                    continue
+                columns = _page_columns(page)
+                yield ''.join(
+                    json.dumps(dict(zip(KLINE_COLUMNS, row)), separators=(',', ':')) + '\n'
+                    for row in zip(*(columns[column] for column in KLINE_COLUMNS))
+                ).encode('utf-8')
+        finally:
+            session.close()
+
+    @staticmethod
+    def _encode_binary(page: Dict[str, np.ndarray]) -> bytes:
+        """编码一页K线为二进制帧"""
+        parts = [
+            KLINE_FRAME_HEADER.pack(len(page['timestamp'])),
+            _epoch_ms(page['timestamp']).astype('<i8').tobytes()
+        ]
+        parts.extend(page[column].astype('<f8').tobytes() for column in KLINE_COLUMNS[1:])
+        return b''.join(parts)
+
     def create_order(self, user_id, symbol, side, order_type, quantity, price):
         """
         创建一个订单
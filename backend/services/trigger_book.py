@@ -0,0 +1,114 @@
+import heapq
+import itertools
+from decimal import Decimal
+from typing import Dict, List, Tuple
+from backend.models.database import Order
+from backend.services.order_types import OrderSide, OrderType
+
+class SymbolTriggerBook:
+    """单个合约的触发价索引
+
+    四个堆分别按触发价排序，堆顶始终是最先被触发的订单：
+    - 买入限价：价格 <= 限价时触发（按限价从高到低）
+    - 卖出限价：价格 >= 限价时触发（按限价从低到高）
+    - 买入止损：价格 >= 止损价时触发（按止损价从低到高）
+    - 卖出止损：价格 <= 止损价时触发（按止损价从高到低）
+    """
+
+    def __init__(self):
+        self.buy_limits: List[Tuple] = []
+        self.sell_limits: List[Tuple] = []
+        self.buy_stops: List[Tuple] = []
+        self.sell_stops: List[Tuple] = []
+
+    def heaps(self) -> List[List[Tuple]]:
+        return [self.buy_limits, self.sell_limits, self.buy_stops, self.sell_stops]
+
+    def __len__(self) -> int:
+        return sum(len(heap) for heap in self.heaps())
+
+class TriggerBook:
+    """限价单/止损单触发索引
+
+    每次行情更新只弹出触发价被穿越的订单，复杂度为 O(log n + k)，
+    不再遍历全部活动订单。撤单采用惰性删除，失效条目在弹出或压缩时清理。
+    """
+
+    def __init__(self):
+        self.books: Dict[str, SymbolTriggerBook] = {}
+        self.orders: Dict[str, Order] = {}
+        self._seq = itertools.count()
+        self._stale: int = 0
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def __contains__(self, order_id: str) -> bool:
+        return order_id in self.orders
+
+    def add(self, order: Order) -> bool:
+        """加入订单，仅索引限价单和止损单"""
+        book = self.books.setdefault(order.symbol, SymbolTriggerBook())
+        seq = next(self._seq)
+        is_buy = order.side == OrderSide.BUY.value
+
+        if order.order_type == OrderType.LIMIT.value:
+            price = Decimal(str(order.price))
+            if is_buy:
+                heapq.heappush(book.buy_limits, (-price, seq, order.order_id))
+            else:
+                heapq.heappush(book.sell_limits, (price, seq, order.order_id))
+        elif order.order_type == OrderType.STOP.value:
+            price = Decimal(str(order.stop_price))
+            if is_buy:
+                heapq.heappush(book.buy_stops, (price, seq, order.order_id))
+            else:
+                heapq.heappush(book.sell_stops, (-price, seq, order.order_id))
+        else:
+            return False
+
+        self.orders[order.order_id] = order
+        return True
+
+    def discard(self, order_id: str):
+        """移除订单（撤单或已成交）"""
+        if self.orders.pop(order_id, None) is not None:
+            self._stale += 1
+            if self._stale > 1024 and self._stale > len(self.orders):
+                self._compact()
+
+    def pop_triggered(self, symbol: str, price: Decimal) -> List[Order]:
+        """弹出在当前价格下被触发的订单，按提交顺序返回"""
+        book = self.books.get(symbol)
+        if book is None:
+            return []
+
+        triggered: List[Tuple[int, str]] = []
+        # 买入限价、卖出止损：价格 <= 触发价
+        for heap in (book.buy_limits, book.sell_stops):
+            while heap and -heap[0][0] >= price:
+                _, seq, order_id = heapq.heappop(heap)
+                triggered.append((seq, order_id))
+        # 卖出限价、买入止损：价格 >= 触发价
+        for heap in (book.sell_limits, book.buy_stops):
+            while heap and heap[0][0] <= price:
+                _, seq, order_id = heapq.heappop(heap)
+                triggered.append((seq, order_id))
+
+        orders = []
+        for _, order_id in sorted(triggered):
+            order = self.orders.pop(order_id, None)
+            if order is not None:
+                orders.append(order)
+            else:
+                self._stale -= 1
+        return orders
+
+    def _compact(self):
+        """重建堆，清除已失效的条目"""
+        for book in self.books.values():
+            for heap in book.heaps():
+                heap[:] = [entry for entry in heap if entry[2] in self.orders]
+                heapq.heapify(heap)
+        self.books = {symbol: book for symbol, book in self.books.items() if len(book)}
+        self._stale = 0
@@ -0,0 +1,166 @@
+import logging
+import math
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from backend.services.backtest_service import BacktestResult
+from backend.services.parameter_sweep import ParameterSweep
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class WalkForwardFold:
+    index: int
+    train_start: int
+    train_end: int
+    test_start: int
+    test_end: int
+    best_params: Optional[Dict] = None
+    train_metrics: Dict = field(default_factory=dict)
+    test_metrics: Dict = field(default_factory=dict)
+
+def make_folds(length: int, train_size: int, test_size: int,
+               step: Optional[int] = None, anchored: bool = False) -> List[WalkForwardFold]:
+    """划分滚动窗口：在第 k 个窗口上优化，在紧随其后的窗口上检验
+
+    anchored=True 时训练窗口起点固定，只向后扩展。step 不能小于 test_size，
+    否则相邻窗口的样本外区间重叠，拼接后的权益曲线会重复计算同一段行情。
+    """
+    step = step or test_size
+    if step < test_size:
+        raise ValueError(f"Walk-forward step {step} must not be smaller than test_size {test_size}")
+    folds = []
+    train_start = 0
+    train_end = train_size
+    while train_end + test_size <= length:
+        folds.append(WalkForwardFold(
+            index=len(folds),
+            train_start=0 if anchored else train_start,
+            train_end=train_end,
+            test_start=train_end,
+            test_end=train_end + test_size
+        ))
+        train_start += step
+        train_end += step
+    return folds
+
+class WalkForwardOptimizer:
+    """滚动样本内/样本外优化
+
+    所有窗口的 (窗口, 参数) 训练任务一次性提交到参数扫描的进程池并行执行，
+    工作进程在完整数据上缓存指标，不同窗口、不同参数复用同一份均线；
+    各窗口的最优参数在样本外窗口上检验，样本外权益曲线按复利拼接。
+    """
+
+    def __init__(self, strategy_cls, data: pd.DataFrame, param_sets: List[Dict],
+                 train_size: int, test_size: int, step: Optional[int] = None,
+                 anchored: bool = False, strategy_kwargs: Optional[Dict] = None,
+                 rank_by: str = 'sharpe_ratio', ascending: bool = False,
+                 initial_capital: float = 100000.0, commission_rate: float = 0.0,
+                 max_workers: Optional[int] = None):
+        self.data = data
+        self.param_sets = param_sets
+        self.rank_by = rank_by
+        self.ascending = ascending
+        self.initial_capital = initial_capital
+        self.folds = make_folds(len(data), train_size, test_size, step, anchored)
+        self.sweep = ParameterSweep(
+            strategy_cls,
+            data,
+            strategy_kwargs=strategy_kwargs,
+            initial_capital=initial_capital,
+            commission_rate=commission_rate,
+            max_workers=max_workers
+        )
+
+    def run(self) -> Dict:
+        """运行滚动优化，返回各窗口结果、拼接的样本外权益曲线和整体指标"""
+        if not self.folds:
+            raise ValueError("Not enough data for a single walk-forward fold")
+
+        with self.sweep:
+            self._optimize()
+            tests = self._test()
+
+        equity_curve, trades = self._stitch(tests)
+        result = BacktestResult()
+        result.equity_curve = equity_curve
+        result.returns = (np.diff(equity_curve) / np.asarray(equity_curve[:-1])).tolist()
+        result.trades = trades
+
+        timestamps = np.concatenate([
+            self.data.index[fold.test_start:fold.test_end] for fold in self.folds
+        ])
+        return {
+            'folds': [asdict(fold) for fold in self.folds],
+            'equity_curve': equity_curve,
+            'timestamps': timestamps.tolist(),
+            'trades': trades,
+            'metrics': result.calculate_metrics()
+        }
+
+    def _optimize(self):
+        """并行运行全部窗口的样本内回测，为每个窗口选出最优参数"""
+        count = len(self.param_sets)
+        tasks = [
+            (fold.index * count + j, params, fold.train_start, fold.train_end, False)
+            for fold in self.folds
+            for j, params in enumerate(self.param_sets)
+        ]
+
+        best: Dict[int, Tuple[float, int, Dict]] = {}
+        for record in self.sweep.iter_tasks(tasks):
+            if 'error' in record:
+                logger.warning(f"Walk-forward task {record['params']} failed: {record['error']}")
+                continue
+            score = record['metrics'].get(self.rank_by)
+            if score is None or math.isnan(score):
+                continue
+            fold_index, j = divmod(record['task_id'], count)
+            key = score if self.ascending else -score
+            # 分数相同时取参数列表中靠前的组合，结果与完成顺序无关
+            if fold_index not in best or (key, j) < best[fold_index][:2]:
+                best[fold_index] = (key, j, record['metrics'])
+
+        for fold in self.folds:
+            if fold.index in best:
+                _, j, metrics = best[fold.index]
+                fold.best_params = self.param_sets[j]
+                fold.train_metrics = metrics
+
+    def _test(self) -> Dict[int, Dict]:
+        """在样本外窗口上检验各窗口的最优参数"""
+        tasks = [
+            (fold.index, fold.best_params, fold.test_start, fold.test_end, True)
+            for fold in self.folds if fold.best_params is not None
+        ]
+        tests = {}
+        for record in self.sweep.iter_tasks(tasks):
+            if 'error' in record:
+                logger.warning(f"Walk-forward test {record['params']} failed: {record['error']}")
+                continue
+            tests[record['task_id']] = record
+            self.folds[record['task_id']].test_metrics = record['metrics']
+        return tests
+
+    def _stitch(self, tests: Dict[int, Dict]) -> Tuple[List[float], List[Dict]]:
+        """按复利拼接样本外权益曲线：每个窗口从上一窗口的期末权益开始"""
+        equity_curve: List[float] = []
+        trades: List[Dict] = []
+        capital = self.initial_capital
+        for fold in self.folds:
+            test = tests.get(fold.index)
+            if test is None:
+                # 没有可用参数的窗口保持空仓
+                equity_curve.extend([capital] * (fold.test_end - fold.test_start))
+                continue
+            # 资金按比例放大，成交数量、手续费和盈亏随之放大
+            scale = capital / self.initial_capital
+            equity_curve.extend((np.asarray(test['equity_curve']) * scale).tolist())
+            trades.extend(
+                {**trade, **{column: trade[column] * scale for column in ('quantity', 'commission', 'pnl')}}
+                for trade in test['trades']
+            )
+            capital = equity_curve[-1]
+        return equity_curve, trades
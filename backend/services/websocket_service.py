@@ -4,16 +4,26 @@ import json
 import logging
 from typing import Dict, Set
 from datetime import datetime
-from models.database import MarketData
+from backend.models.database import MarketData
+from backend.services.fanout import BroadcastFanout
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
 class WebSocketService:
-    def __init__(self):
+    def __init__(self, max_queue_size: int = 100, send_timeout: float = 5.0,
+                 laggard_policy: str = 'drop',
+                 conflate_types: tuple = ('market_data', 'price', 'orderbook')):
         self.connections: Dict[str, Set[websockets.WebSocketServerProtocol]] = {}
         self.market_data_cache = {}
+        self.conflate_types = set(conflate_types)
         self.db_session = Session()
+        self.fanout = BroadcastFanout(
+            max_queue_size=max_queue_size,
+            send_timeout=send_timeout,
+            laggard_policy=laggard_policy,
+            on_disconnect=self._discard_connection
+        )
 
     async def register(self, websocket: websockets.WebSocketServerProtocol, symbol: str):
         """注册新的WebSocket连接"""
@@ -24,8 +34,12 @@ class WebSocketService:
 
     async def unregister(self, websocket: websockets.WebSocketServerProtocol, symbol: str):
         """注销WebSocket连接"""
-        self.connections[symbol].remove(websocket)
-        if not self.connections[symbol]:
+        self.fanout.remove(websocket)
+        connections = self.connections.get(symbol)
+        if connections is None or websocket not in connections:
+            return
+        connections.remove(websocket)
+        if not connections:
             del self.connections[symbol]
         logger.info(f"Connection unregistered for {symbol}")
 
@@ -34,19 +48,18 @@ class WebSocketService:
         if symbol not in self.connections:
             return
 
-        disconnected = set()
-        for websocket in self.connections[symbol]:
-            try:
-                await websocket.send(json.dumps(message))
-            except websockets.ConnectionClosed:
-                disconnected.add(websocket)
-            except Exception as e:
-                logger.error(f"Error broadcasting message: {str(e)}")
-                disconnected.add(websocket)
+        # 消息只序列化一次，各连接并发发送，慢连接由扇出引擎按策略处理
+        # 同一合约同类型的行情快照在客户端落后时合并为最新一条
+        key = (message.get('type'), symbol) if message.get('type') in self.conflate_types else None
+        self.fanout.publish(self.connections[symbol], json.dumps(message), key=key)
 
-        # 清理断开的连接
-        for websocket in disconnected:
-            await self.unregister(websocket, symbol)
+    def _discard_connection(self, websocket):
+        """扇出引擎断开连接后的清理回调"""
+        for symbol in list(self.connections):
+            connections = self.connections[symbol]
+            connections.discard(websocket)
+            if not connections:
+                del self.connections[symbol]
 
     async def handle_connection(self, websocket: websockets.WebSocketServerProtocol, path: str):
         """处理WebSocket连接"""
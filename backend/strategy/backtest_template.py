@@ -46,6 +46,8 @@ class BaseStrategy(ABC):
         self.positions: Dict[str, Position] = {}
         self.trades: List[Trade] = []
         self.equity_curve: List[float] = []
+        self.drawdown_curve: List[float] = []
+        self._equity_peak: float = initial_capital
         self.logger = logging.getLogger(self.__class__.__name__)
 
     @abstractmethod
@@ -54,36 +56,70 @@ class BaseStrategy(ABC):
         pass
 
     def run_backtest(self, data: pd.DataFrame) -> BacktestResult:
-        """运行回测"""
+        """运行回测
+
+        事件驱动：只在有信号的K线上撮合，资金和持仓数量在两次成交之间保持不变，
+        权益曲线、回撤（滚动峰值）和收益率由预分配数组一次性计算。
+        """
         try:
             # 生成交易信号
             signals = self.generate_signals(data)
             result = BacktestResult()
+            if signals.empty:
+                return result
             
-            # 遍历每个时间点
-            for timestamp, row in signals.iterrows():
-                # 更新持仓价格
-                self._update_positions(row)
-                
-                # 处理交易信号
-                if row.get('signal') == 'BUY':
-                    self._execute_buy(row, timestamp)
-                elif row.get('signal') == 'SELL':
-                    self._execute_sell(row, timestamp)
-                
-                # 记录权益
-                equity = self._calculate_equity()
-                self.equity_curve.append(equity)
-                
-                # 计算回撤
-                result.drawdown_curve.append(
-                    self._calculate_drawdown(self.equity_curve)
-                )
-                
-                # 计算收益率
-                if len(self.equity_curve) > 1:
-                    returns = (equity - self.equity_curve[-2]) / self.equity_curve[-2]
-                    result.returns.append(returns)
+            # 整个数据集只属于一个合约，只解析一次
+            symbol = signals.attrs.get('symbol', data.attrs.get('symbol', getattr(self, 'symbol', None)))
+            close = signals['close'].to_numpy(dtype=float)
+            timestamps = signals.index
+            codes = self._signal_codes(signals)
+            
+            # 其他合约的持仓市值在本次回测中不变
+            other_value = sum(
+                pos.quantity * pos.current_price
+                for key, pos in self.positions.items() if key != symbol
+            )
+            
+            # 逐个信号撮合，记录每次成交后的资金和持仓数量
+            events = np.flatnonzero(codes)
+            cash_after = np.empty(len(events) + 1)
+            quantity_after = np.empty(len(events) + 1)
+            cash_after[0] = self.current_capital
+            quantity_after[0] = self.positions[symbol].quantity if symbol in self.positions else 0.0
+            
+            for k, i in enumerate(events.tolist(), start=1):
+                price = close[i]
+                if symbol in self.positions:
+                    self._update_positions(symbol, price)
+                if codes[i] > 0:
+                    self._execute_buy(symbol, price, timestamps[i])
+                else:
+                    self._execute_sell(symbol, price, timestamps[i])
+                cash_after[k] = self.current_capital
+                quantity_after[k] = self.positions[symbol].quantity if symbol in self.positions else 0.0
+            
+            # 每根K线所处的成交区间
+            segment = np.searchsorted(events, np.arange(len(close)), side='right')
+            equity = cash_after[segment] + quantity_after[segment] * close + other_value
+            
+            # 滚动峰值计算回撤
+            peak = np.maximum.accumulate(equity)
+            if self.equity_curve:
+                peak = np.maximum(peak, self._equity_peak)
+            self._equity_peak = peak[-1]
+            drawdown = (peak - equity) / peak
+            returns = (equity[1:] - equity[:-1]) / equity[:-1]
+            
+            # 更新持仓的最新价格
+            if symbol in self.positions:
+                self._update_positions(symbol, close[-1])
+            
+            if self.equity_curve:
+                result.returns.append((equity[0] - self.equity_curve[-1]) / self.equity_curve[-1])
+            self.equity_curve.extend(equity.tolist())
+            result.drawdown_curve = drawdown.tolist()
+            result.returns.extend(returns.tolist())
+            self.drawdown_curve.extend(result.drawdown_curve)
 
             # 计算回测指标
             result.metrics = self._calculate_metrics()
@@ -96,11 +132,16 @@ class BaseStrategy(ABC):
             self.logger.error(f"Backtest error: {str(e)}")
             raise
 
-    def _execute_buy(self, data: pd.Series, timestamp: datetime):
+    @staticmethod
+    def _signal_codes(signals: pd.DataFrame) -> np.ndarray:
+        """将信号列转换为数组：1 买入，-1 卖出，0 无信号"""
+        if 'signal' not in signals.columns:
+            return np.zeros(len(signals), dtype=np.int8)
+        signal = signals['signal'].to_numpy()
+        return np.where(signal == 'BUY', 1, np.where(signal == 'SELL', -1, 0)).astype(np.int8)
+
+    def _execute_buy(self, symbol: str, price: float, timestamp: datetime):
         """执行买入操作"""
-        symbol = data.name
-        price = data['close']
-        
         # 计算可买数量
         available_capital = self.current_capital * 0.95  # 保留5%作为缓冲
         quantity = available_capital / price
@@ -143,14 +184,12 @@ class BaseStrategy(ABC):
                     timestamp=timestamp
                 )
 
-    def _execute_sell(self, data: pd.Series, timestamp: datetime):
+    def _execute_sell(self, symbol: str, price: float, timestamp: datetime):
         """执行卖出操作"""
-        symbol = data.name
         if symbol not in self.positions:
             return
             
         position = self.positions[symbol]
-        price = data['close']
         quantity = position.quantity
         
         # 计算手续费
@@ -178,12 +217,11 @@ class BaseStrategy(ABC):
         # 清除持仓
         del self.positions[symbol]
 
-    def _update_positions(self, data: pd.Series):
+    def _update_positions(self, symbol: str, price: float):
         """更新持仓状态"""
-        symbol = data.name
         if symbol in self.positions:
             position = self.positions[symbol]
-            position.current_price = data['close']
+            position.current_price = price
             position.unrealized_pnl = (
                 position.current_price - position.entry_price
             ) * position.quantity
@@ -196,11 +234,6 @@ class BaseStrategy(ABC):
         )
         return self.current_capital + position_value
 
-    def _calculate_drawdown(self, equity_curve: List[float]) -> float:
-        """计算回撤"""
-        peak = max(equity_curve)
-        return (peak - equity_curve[-1]) / peak
-
     def _calculate_metrics(self) -> Dict:
         """计算回测指标"""
         returns = pd.Series(self.equity_curve).pct_change().dropna()
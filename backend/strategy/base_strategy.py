@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from typing import Dict, List, Optional
 from datetime import datetime
+import numpy as np
+import pandas as pd
 
 class BaseStrategy(ABC):
     def __init__(self, parameters: Dict):
@@ -21,4 +23,20 @@ class BaseStrategy(ABC):
     @abstractmethod
     def calculate_signals(self) -> Dict:
         """计算交易信号"""
-        pass 
\ No newline at end of file
+        pass
+
+    def feature_spec(self) -> Dict[str, Dict]:
+        """策略使用的指标 {列名: 指标参数}，回测时由特征存储按列加入数据，默认不使用"""
+        return {}
+
+    def generate_positions(self, data: pd.DataFrame, cache: Optional[Dict] = None) -> np.ndarray:
+        """向量化回测：在完整数据上一次性计算每根K线的目标仓位
+
+        默认实现只调用一次 generate_signals，再把信号前向填充为仓位，
+        要求信号只依赖当前及之前的K线。子类可覆盖为纯数组实现，
+        并可用 cache 在同一份数据上复用指标。
+        """
+        positions = np.full(len(data), np.nan)
+        for signal in self.generate_signals(data):
+            positions[data.index.get_loc(signal['timestamp'])] = self.calculate_position_size(signal)
+        return pd.Series(positions).ffill().fillna(0.0).to_numpy()
@@ -1,19 +1,52 @@
 from .base_strategy import BaseStrategy
+from typing import Dict, List, Optional, Union
 import pandas as pd
 import numpy as np
 
 class MACrossStrategy(BaseStrategy):
     def __init__(self, symbol: str, timeframe: str, fast_period: int = 10, slow_period: int = 20):
-        super().__init__(symbol, timeframe)
+        super().__init__({'fast_period': fast_period, 'slow_period': slow_period})
+        self.symbol = symbol
+        self.timeframe = timeframe
         self.fast_period = fast_period
         self.slow_period = slow_period
+        self.bars: List[Dict] = []
+
+    async def on_tick(self, tick_data: Dict):
+        """均线策略只在K线上计算"""
+        pass
+
+    async def on_bar(self, bar_data: Dict):
+        """缓存K线，只保留计算均线所需的长度"""
+        self.bars.append(bar_data)
+        del self.bars[:-(self.slow_period + 1)]
+
+    def feature_spec(self) -> Dict[str, Dict]:
+        """均线列按周期命名，同一份数据换参数复用时不会误用其他周期的均线"""
+        return {
+            self.ma_column(self.fast_period): {'type': 'sma', 'period': self.fast_period},
+            self.ma_column(self.slow_period): {'type': 'sma', 'period': self.slow_period}
+        }
+
+    @staticmethod
+    def ma_column(period: int) -> str:
+        """周期为 period 的均线列名"""
+        return f'sma_{period}'
+
+    def calculate_signals(self) -> Dict:
+        """根据缓存的K线计算最新信号"""
+        if not self.bars:
+            return {}
+        signals = self.generate_signals(pd.DataFrame(self.bars))
+        return signals[-1] if signals else {}
 
     def generate_signals(self, data: pd.DataFrame) -> List[Dict]:
         df = data.copy()
         
-        # 计算快速和慢速移动平均线
-        df['fast_ma'] = df['close'].rolling(window=self.fast_period).mean()
-        df['slow_ma'] = df['close'].rolling(window=self.slow_period).mean()
+        # 计算快速和慢速移动平均线（数据中已有特征存储提供的同周期均线时直接使用）
+        fast_column, slow_column = self.ma_column(self.fast_period), self.ma_column(self.slow_period)
+        df['fast_ma'] = df[fast_column] if fast_column in df.columns else df['close'].rolling(window=self.fast_period).mean()
+        df['slow_ma'] = df[slow_column] if slow_column in df.columns else df['close'].rolling(window=self.slow_period).mean()
         
         # 生成交叉信号
         df['cross_over'] = (df['fast_ma'] > df['slow_ma']) & (df['fast_ma'].shift(1) <= df['slow_ma'].shift(1))
@@ -38,6 +71,46 @@ class MACrossStrategy(BaseStrategy):
                 
         return signals
 
+    def generate_positions(self, data: Union[pd.DataFrame, np.ndarray],
+                           cache: Optional[Dict] = None) -> np.ndarray:
+        """向量化计算每根K线的目标仓位，支持 T×N 收盘价矩阵（每列一个合约）
+
+        cache 用于在同一份数据上复用均线（参数扫描时不同参数组合共享同一周期的均线）。
+        """
+        if isinstance(data, pd.DataFrame):
+            close = data['close'].to_numpy(dtype=float)
+        else:
+            close = np.asarray(data, dtype=float)
+        frame = pd.DataFrame(close.reshape(len(close), -1))
+        
+        fast = self._moving_average(data, frame, self.fast_period, cache)
+        slow = self._moving_average(data, frame, self.slow_period, cache)
+        prev_fast = np.vstack([np.full((1, fast.shape[1]), np.nan), fast[:-1]])
+        prev_slow = np.vstack([np.full((1, slow.shape[1]), np.nan), slow[:-1]])
+        
+        # 与 generate_signals 相同的交叉条件，交叉点之间保持仓位
+        cross_over = (fast > slow) & (prev_fast <= prev_slow)
+        cross_under = (fast < slow) & (prev_fast >= prev_slow)
+        signal = np.where(
+            cross_over, self.calculate_position_size({'type': 'BUY'}),
+            np.where(cross_under, self.calculate_position_size({'type': 'SELL'}), np.nan)
+        )
+        positions = pd.DataFrame(signal).ffill().fillna(0.0).to_numpy()
+        return positions.reshape(close.shape)
+
+    def _moving_average(self, data: Union[pd.DataFrame, np.ndarray], frame: pd.DataFrame,
+                        period: int, cache: Optional[Dict]) -> np.ndarray:
+        """计算简单移动平均：数据中已有同周期均线列时直接使用，命中缓存时直接返回"""
+        column = self.ma_column(period)
+        if isinstance(data, pd.DataFrame) and column in data.columns:
+            return data[[column]].to_numpy(dtype=float)
+        if cache is None:
+            return frame.rolling(window=period).mean().to_numpy()
+        key = ('sma', period)
+        if key not in cache:
+            cache[key] = frame.rolling(window=period).mean().to_numpy()
+        return cache[key]
+
     def calculate_position_size(self, signal: Dict) -> float:
         # 简单的固定仓位大小策略
         return 1.0 if signal['type'] == 'BUY' else -1.0 
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""Add order journal columns
+
+Revision ID: 5b2e8c41d7a3
+Revises: ad39a447c5bb
+Create Date: 2026-10-17 10:12:41.218305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e8c41d7a3'
+down_revision: Union[str, None] = 'ad39a447c5bb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 订单日志投影使用执行引擎生成的订单ID定位订单
+    op.add_column('orders', sa.Column('order_id', sa.String(length=36), nullable=True))
+    op.add_column('orders', sa.Column('client_order_id', sa.String(), nullable=True))
+    op.add_column('orders', sa.Column('stop_price', sa.Numeric(precision=18, scale=8), nullable=True))
+    op.add_column('orders', sa.Column('time_in_force', sa.String(length=8), nullable=True))
+    op.add_column('orders', sa.Column('executed_quantity', sa.Numeric(precision=18, scale=8), nullable=True))
+    op.create_index('ix_orders_order_id', 'orders', ['order_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_order_id', table_name='orders')
+    op.drop_column('orders', 'executed_quantity')
+    op.drop_column('orders', 'time_in_force')
+    op.drop_column('orders', 'stop_price')
+    op.drop_column('orders', 'client_order_id')
+    op.drop_column('orders', 'order_id')
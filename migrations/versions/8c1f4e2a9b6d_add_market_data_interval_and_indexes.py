@@ -0,0 +1,51 @@
+"""Add market data interval and range-scan indexes
+
+Revision ID: 8c1f4e2a9b6d
+Revises: 5b2e8c41d7a3
+Create Date: 2026-10-17 14:03:27.516842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1f4e2a9b6d'
+down_revision: Union[str, None] = '5b2e8c41d7a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 已有数据均为1分钟K线
+    with op.batch_alter_table('market_data') as batch_op:
+        batch_op.add_column(sa.Column('interval', sa.String(length=8), nullable=False, server_default='1m'))
+
+    # 建唯一约束前去重，保留最后写入的一行
+    # （用 Core 生成语句：interval 在 MySQL 中是保留字需按方言加引号；
+    # 保留的 id 放在派生表中，MySQL 不允许 DELETE 的子查询直接读取被删除的表）
+    market_data = sa.table(
+        'market_data', sa.column('id'), sa.column('symbol'), sa.column('interval'), sa.column('timestamp')
+    )
+    keep = sa.select(sa.func.max(market_data.c.id).label('id')).group_by(
+        market_data.c.symbol, market_data.c.interval, market_data.c.timestamp
+    ).subquery('keep')
+    op.execute(market_data.delete().where(market_data.c.id.not_in(sa.select(keep.c.id))))
+
+    # (symbol, interval, timestamp) 唯一索引覆盖原 (symbol, timestamp) 索引的区间查询
+    with op.batch_alter_table('market_data') as batch_op:
+        batch_op.drop_index('idx_symbol_timestamp')
+        batch_op.create_unique_constraint(
+            'uq_market_data_symbol_interval_timestamp', ['symbol', 'interval', 'timestamp']
+        )
+        batch_op.create_index('ix_market_data_timestamp', ['timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('market_data') as batch_op:
+        batch_op.drop_index('ix_market_data_timestamp')
+        batch_op.drop_constraint('uq_market_data_symbol_interval_timestamp', type_='unique')
+        batch_op.create_index('idx_symbol_timestamp', ['symbol', 'timestamp'], unique=False)
+        batch_op.drop_column('interval')
@@ -0,0 +1,140 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.models.database import Base, MarketData, Strategy
+from backend.services.backtest_cache import BacktestCache, make_cache_key
+from backend.services.strategy_service import StrategyService
+from backend.strategy.ma_cross_strategy import MACrossStrategy
+
+def make_result(n: int = 100) -> dict:
+    index = pd.date_range('2024-01-01', periods=n, freq='min')
+    return {
+        'metrics': {'total_return': 0.1, 'sharpe_ratio': 1.5},
+        'equity_curve': np.linspace(100000, 110000, n).tolist(),
+        'trades': [
+            {'timestamp': index[i], 'type': 'BUY' if i % 2 else 'SELL', 'price': 4500.0 + i,
+             'quantity': 1.0, 'commission': 0.5, 'pnl': float(i)}
+            for i in range(0, n, 10)
+        ]
+    }
+
+class TestBacktestCache:
+    def test_roundtrip(self, tmp_path):
+        """测试写入后读取结果一致"""
+        cache = BacktestCache(str(tmp_path))
+        result = make_result()
+        cache.put('k1', result)
+
+        cached = BacktestCache(str(tmp_path)).get('k1')
+        assert cached['metrics'] == result['metrics']
+        assert cached['equity_curve'] == result['equity_curve']
+        assert cached['trades'] == result['trades']
+
+    def test_lru_eviction(self, tmp_path):
+        """测试超过条目数时淘汰最久未访问的结果"""
+        cache = BacktestCache(str(tmp_path), max_entries=2)
+        cache.put('a', make_result())
+        cache.put('b', make_result())
+        assert cache.get('a') is not None
+        cache.put('c', make_result())
+
+        assert 'a' in cache and 'c' in cache
+        assert 'b' not in cache
+        assert not (tmp_path / 'b.npz').exists()
+
+    def test_size_limit(self, tmp_path):
+        """测试超过总大小时淘汰"""
+        cache = BacktestCache(str(tmp_path), max_bytes=1)
+        cache.put('a', make_result())
+        assert len(cache) == 0
+
+    def test_directory_created_on_first_put(self, tmp_path):
+        """测试构造缓存不创建目录，第一次写入时才创建"""
+        cache = BacktestCache(str(tmp_path / 'cache'))
+        assert not (tmp_path / 'cache').exists()
+        assert cache.get('a') is None
+
+        cache.put('a', make_result())
+        assert (tmp_path / 'cache' / 'a.npz').exists()
+
+    def test_key_depends_on_inputs(self):
+        """测试缓存键随参数和数据变化"""
+        start, end = datetime(2024, 1, 1), datetime(2024, 2, 1)
+        key = make_cache_key(MACrossStrategy, {'fast_period': 5}, 'rb:100', start, end)
+        assert key == make_cache_key(MACrossStrategy, {'fast_period': 5}, 'rb:100', start, end)
+        assert key != make_cache_key(MACrossStrategy, {'fast_period': 6}, 'rb:100', start, end)
+        assert key != make_cache_key(MACrossStrategy, {'fast_period': 5}, 'rb:101', start, end)
+        assert key != make_cache_key(MACrossStrategy, {'fast_period': 5}, 'rb:100', start, datetime(2024, 3, 1))
+
+class TestStrategyServiceBacktest:
+    @pytest.fixture
+    def session_factory(self, tmp_path, monkeypatch):
+        engine = create_engine(f"sqlite:///{tmp_path / 'quant.db'}")
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(bind=engine)
+        monkeypatch.setattr('backend.services.strategy_service.SessionLocal', factory)
+        monkeypatch.setattr('backend.services.backtest_service.SessionLocal', factory)
+
+        session = factory()
+        session.add(Strategy(id=1, type='ma_cross', parameters=json.dumps({
+            'symbol': 'rb9999', 'fast_period': 5, 'slow_period': 20
+        })))
+        rng = np.random.default_rng(0)
+        close = 4500 + np.cumsum(rng.normal(0, 5, 500))
+        start = datetime(2024, 1, 2, 9, 0)
+        session.add_all([
+            MarketData(symbol='rb9999', timestamp=start + timedelta(minutes=i),
+                       open=c, high=c, low=c, close=c, volume=1)
+            for i, c in enumerate(close)
+        ])
+        session.commit()
+        session.close()
+        return factory
+
+    def test_second_run_is_cached(self, tmp_path, session_factory, mocker):
+        """测试相同输入第二次直接返回缓存"""
+        service = StrategyService(
+            config={'data.columnar_root': str(tmp_path / 'columnar'), 'data.feature_root': str(tmp_path / 'features')},
+            backtest_cache=BacktestCache(str(tmp_path / 'cache'))
+        )
+        first = service.run_backtest(1, '2024-01-01', '2024-01-03', 100000.0)
+        assert first['cached'] is False
+        assert len(first['equity_curve']) == 500
+
+        run = mocker.spy(service.backtest_service, 'run_on_data')
+        second = service.run_backtest(1, '2024-01-01', '2024-01-03', 100000.0)
+        assert second['cached'] is True
+        assert run.call_count == 0
+        assert second['equity_curve'] == first['equity_curve']
+        assert second['final_capital'] == first['final_capital']
+
+        # 数据变化后重新计算
+        session = session_factory()
+        session.add(MarketData(symbol='rb9999', timestamp=datetime(2024, 1, 2, 17, 40),
+                               open=4500, high=4500, low=4500, close=4500, volume=1))
+        session.commit()
+        session.close()
+        assert service.run_backtest(1, '2024-01-01', '2024-01-03', 100000.0)['cached'] is False
+
+    def test_in_place_update_invalidates(self, tmp_path, session_factory):
+        """测试K线被覆盖写入（行数和时间范围不变）后重新计算"""
+        service = StrategyService(
+            config={'data.columnar_root': str(tmp_path / 'columnar'), 'data.feature_root': str(tmp_path / 'features')},
+            backtest_cache=BacktestCache(str(tmp_path / 'cache'))
+        )
+        first = service.run_backtest(1, '2024-01-01', '2024-01-03', 100000.0)
+        assert service.run_backtest(1, '2024-01-01', '2024-01-03', 100000.0)['cached'] is True
+
+        session = session_factory()
+        row = session.query(MarketData).filter(MarketData.timestamp == datetime(2024, 1, 2, 10, 0)).one()
+        row.close = row.close + 50
+        session.commit()
+        session.close()
+
+        second = service.run_backtest(1, '2024-01-01', '2024-01-03', 100000.0)
+        assert second['cached'] is False
+        assert second['equity_curve'] != first['equity_curve']
@@ -0,0 +1,81 @@
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from backend.services.backtest_service import BacktestService
+from backend.strategy.ma_cross_strategy import MACrossStrategy
+
+def make_data(n: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 4500 + np.cumsum(rng.normal(0, 5, n))
+    index = pd.date_range('2024-01-01', periods=n, freq='min')
+    return pd.DataFrame({'close': close}, index=index)
+
+def reference_backtest(data: pd.DataFrame, positions: np.ndarray,
+                       initial_capital: float, commission_rate: float):
+    """逐根K线计算的参考实现"""
+    capital = initial_capital
+    position = 0.0
+    equity_curve = []
+    for price, target in zip(data['close'], positions):
+        if target != position:
+            value = (target - position) * price
+            capital -= value + abs(value) * commission_rate
+            position = target
+        equity_curve.append(capital + position * price)
+    return equity_curve
+
+class TestMACrossPositions:
+    def test_matches_signal_loop(self):
+        """测试向量化仓位与逐根K线信号一致"""
+        data = make_data(250)
+        strategy = MACrossStrategy('rb9999', '1m', fast_period=5, slow_period=20)
+        positions = strategy.generate_positions(data)
+
+        expected = []
+        position = 0.0
+        for i in range(len(data)):
+            signals = strategy.generate_signals(data.iloc[:i + 1])
+            if signals:
+                position = strategy.calculate_position_size(signals[-1])
+            expected.append(position)
+        np.testing.assert_array_equal(positions, expected)
+
+    def test_matrix_input(self):
+        """测试按列计算多合约仓位"""
+        data = make_data(300)
+        other = make_data(300, seed=11)
+        strategy = MACrossStrategy('rb9999', '1m', fast_period=5, slow_period=20)
+        matrix = strategy.generate_positions(np.column_stack([data['close'], other['close']]))
+
+        np.testing.assert_array_equal(matrix[:, 0], strategy.generate_positions(data))
+        np.testing.assert_array_equal(matrix[:, 1], strategy.generate_positions(other))
+
+class TestVectorizedBacktest:
+    def test_matches_reference(self):
+        """测试权益曲线与逐根K线实现一致"""
+        data = make_data(2000)
+        positions = MACrossStrategy('rb9999', '1m', 5, 20).generate_positions(data)
+        result = BacktestService().run_vectorized(
+            data, positions, initial_capital=100000.0, commission_rate=0.001
+        )
+
+        expected = reference_backtest(data, positions, 100000.0, 0.001)
+        np.testing.assert_allclose(result['equity_curve'], expected)
+        assert len(result['trades']) == np.count_nonzero(np.diff(positions, prepend=0.0))
+        first_trade = data.index.get_loc(result['trades'][0]['timestamp'])
+        assert sum(trade['pnl'] for trade in result['trades']) == pytest.approx(
+            expected[-1] - expected[first_trade]
+        )
+
+    def test_million_bars(self):
+        """测试百万根K线回测在数秒内完成"""
+        data = make_data(1_000_000)
+        strategy = MACrossStrategy('rb9999', '1m', 10, 50)
+
+        start = time.perf_counter()
+        result = BacktestService().run_vectorized(data, strategy.generate_positions(data))
+        elapsed = time.perf_counter() - start
+
+        assert len(result['equity_curve']) == 1_000_000
+        assert elapsed < 10
@@ -0,0 +1,86 @@
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from backend.strategy.backtest_template import BaseStrategy
+
+class RandomSignalStrategy(BaseStrategy):
+    """按给定概率随机产生买卖信号"""
+
+    symbol = 'rb9999'
+
+    def __init__(self, signal_prob: float = 0.05, seed: int = 3, **kwargs):
+        super().__init__(**kwargs)
+        self.signal_prob = signal_prob
+        self.seed = seed
+
+    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
+        rng = np.random.default_rng(self.seed)
+        draw = rng.random(len(data))
+        signals = data.copy()
+        signals['signal'] = np.where(
+            draw < self.signal_prob / 2, 'BUY',
+            np.where(draw < self.signal_prob, 'SELL', '')
+        )
+        return signals
+
+def make_data(n: int) -> pd.DataFrame:
+    rng = np.random.default_rng(5)
+    close = 4500 + np.cumsum(rng.normal(0, 5, n))
+    index = pd.date_range('2024-01-01', periods=n, freq='min')
+    return pd.DataFrame({'close': close}, index=index)
+
+def reference_run(strategy: BaseStrategy, data: pd.DataFrame):
+    """逐根K线更新持仓并重算权益和回撤的参考实现"""
+    signals = strategy.generate_signals(data)
+    equity_curve, drawdowns = [], []
+    for timestamp, row in zip(signals.index, signals.itertuples()):
+        strategy._update_positions('rb9999', row.close)
+        if row.signal == 'BUY':
+            strategy._execute_buy('rb9999', row.close, timestamp)
+        elif row.signal == 'SELL':
+            strategy._execute_sell('rb9999', row.close, timestamp)
+        equity_curve.append(strategy._calculate_equity())
+        drawdowns.append((max(equity_curve) - equity_curve[-1]) / max(equity_curve))
+    return strategy.trades, equity_curve, drawdowns
+
+class TestBacktestTemplate:
+    def test_matches_per_bar_reference(self):
+        """测试结果与逐根K线实现一致"""
+        data = make_data(3000)
+        result = RandomSignalStrategy().run_backtest(data)
+        trades, equity_curve, drawdowns = reference_run(RandomSignalStrategy(), data)
+
+        assert [(t.side, t.timestamp, t.symbol) for t in result.trades] == \
+            [(t.side, t.timestamp, t.symbol) for t in trades]
+        np.testing.assert_allclose([t.quantity for t in result.trades], [t.quantity for t in trades])
+        np.testing.assert_allclose(result.equity_curve, equity_curve)
+        np.testing.assert_allclose(result.drawdown_curve, drawdowns, atol=1e-12)
+        assert len(result.returns) == len(data) - 1
+        assert result.metrics['total_trades'] == len(trades)
+        assert result.metrics['max_drawdown'] == pytest.approx(max(drawdowns))
+
+    def test_open_position_marked_to_market(self):
+        """测试期末持仓按最新价格计价"""
+        data = make_data(100)
+        strategy = RandomSignalStrategy(signal_prob=0.0)
+        signals = strategy.generate_signals(data)
+        signals.iloc[10, signals.columns.get_loc('signal')] = 'BUY'
+        strategy.generate_signals = lambda _: signals
+
+        result = strategy.run_backtest(data)
+        position = strategy.positions['rb9999']
+        assert position.current_price == data['close'].iloc[-1]
+        assert result.equity_curve[-1] == pytest.approx(
+            strategy.current_capital + position.quantity * data['close'].iloc[-1]
+        )
+
+    def test_large_backtest(self):
+        """测试50万根K线回测在一秒级完成"""
+        data = make_data(500_000)
+        start = time.perf_counter()
+        result = RandomSignalStrategy().run_backtest(data)
+        elapsed = time.perf_counter() - start
+
+        assert len(result.equity_curve) == 500_000
+        assert elapsed < 5
@@ -0,0 +1,88 @@
+from unittest.mock import AsyncMock
+from backend.data.bar_aggregator import BarAggregator, bar_label
+from backend.services.market_data_service import MarketDataService
+
+T0 = 1704186000.0  # 整分钟
+
+class TestBarAggregator:
+    def test_time_bars(self):
+        """测试时间K线在下一周期的成交到达时输出"""
+        aggregator = BarAggregator('time', 60)
+        assert aggregator.on_tick('rb9999', T0 + 1, 100.0, 1) == []
+        assert aggregator.on_tick('rb9999', T0 + 30, 103.0, 2) == []
+        assert aggregator.on_tick('rb9999', T0 + 59, 99.0, 3) == []
+
+        bars = aggregator.on_tick('rb9999', T0 + 61, 101.0, 1)
+        assert len(bars) == 1
+        bar = bars[0]
+        assert bar['interval'] == '1m' and bar['timestamp'] == T0
+        assert (bar['open'], bar['high'], bar['low'], bar['close'], bar['volume']) == (100.0, 103.0, 99.0, 99.0, 6.0)
+        assert bar['tick_count'] == 3
+
+    def test_out_of_order_with_watermark(self):
+        """测试水位线内的乱序成交计入对应周期，超出水位线的丢弃"""
+        aggregator = BarAggregator('time', 60, lateness=10)
+        aggregator.on_tick('rb9999', T0 + 30, 100.0, 1)
+        aggregator.on_tick('rb9999', T0 + 35, 101.0, 1)
+        # 迟到但不早于水位线：计入对应周期，并按成交时间成为开盘价
+        aggregator.on_tick('rb9999', T0 + 25, 97.0, 1)
+        assert aggregator.on_tick('rb9999', T0 + 62, 105.0, 1) == []
+        aggregator.on_tick('rb9999', T0 + 58, 98.0, 1)
+
+        # 水位线之前的成交被丢弃
+        assert aggregator.on_tick('rb9999', T0 + 5, 1.0, 1) == []
+        assert aggregator.late_ticks == 1
+
+        bars = aggregator.on_tick('rb9999', T0 + 71, 106.0, 1)
+        assert len(bars) == 1
+        assert (bars[0]['open'], bars[0]['low'], bars[0]['close'], bars[0]['volume']) == (97.0, 97.0, 98.0, 4.0)
+
+    def test_volume_bars(self):
+        """测试成交量K线按累计成交量切分"""
+        aggregator = BarAggregator('volume', 10)
+        emitted = []
+        for i, volume in enumerate([4, 4, 4, 10, 1]):
+            emitted += aggregator.on_tick('rb9999', T0 + i, 100.0 + i, volume)
+        assert [bar['volume'] for bar in emitted] == [12.0, 10.0]
+        assert emitted[0]['close'] == 102.0 and emitted[1]['open'] == 103.0
+        assert [bar for _, bar in aggregator.flush()][0]['volume'] == 1.0
+
+    def test_dollar_bars_reorder(self):
+        """测试成交额K线在水位线内按成交时间排序后累计"""
+        aggregator = BarAggregator('dollar', 1000, lateness=2)
+        emitted = []
+        for timestamp, price in [(T0, 100.0), (T0 + 2, 300.0), (T0 + 1, 200.0), (T0 + 10, 100.0)]:
+            emitted += aggregator.on_tick('rb9999', timestamp, price, 2)
+        assert len(emitted) == 1
+        assert (emitted[0]['open'], emitted[0]['close'], emitted[0]['amount']) == (100.0, 300.0, 1200.0)
+
+    def test_labels(self):
+        """测试K线周期标识"""
+        assert bar_label('time', 300) == '5m'
+        assert bar_label('time', 3600) == '1h'
+        assert bar_label('time', 15) == '15s'
+        assert bar_label('volume', 500) == 'vol500'
+
+class TestMarketDataServiceTickBars:
+    async def test_ticks_emit_klines(self, tmp_path, mocker):
+        """测试逐笔行情聚合出的1分钟K线进入K线处理流程"""
+        service = MarketDataService({
+            'database.url': f"sqlite:///{tmp_path / 'quant.db'}",
+            'market_data.tick_bars': [{'type': 'time', 'threshold': 60}, {'type': 'volume', 'threshold': 5}]
+        })
+        mocker.patch.object(service.kline_persister, 'submit')
+        callback = AsyncMock()
+        service.kline_callbacks.append(callback)
+
+        for offset, volume in [(0, 2), (20, 3), (61, 1)]:
+            await service._process_market_data({
+                'symbol': 'rb9999', 'latest_price': 4500 + offset, 'last_volume': volume,
+                'update_time': int((T0 + offset) * 1000)
+            })
+
+        intervals = [call.args[1]['interval'] for call in callback.await_args_list]
+        assert intervals == ['vol5', '1m']
+        assert service.kline_cache['rb9999'].latest()['close'] == 4520.0
+        # 1分钟K线与各周期汇总K线都已提交写入
+        submitted = [call.args[1].get('interval', '1m') for call in service.kline_persister.submit.call_args_list]
+        assert submitted[0] == '1m' and '5m' in submitted
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.data.columnar_store import ColumnarStore
+from backend.models.database import Base, MarketData
+from backend.services.backtest_service import BacktestService
+
+def make_frame(start: str = '2024-01-30', periods: int = 5000) -> pd.DataFrame:
+    index = pd.date_range(start, periods=periods, freq='min').as_unit('ns')
+    close = 4500 + np.arange(periods, dtype=float)
+    return pd.DataFrame({
+        'open': close - 1, 'high': close + 2, 'low': close - 2, 'close': close,
+        'volume': np.ones(periods)
+    }, index=index)
+
+class TestColumnarStore:
+    def test_write_and_read_range(self, tmp_path):
+        """测试跨月分区写入与区间读取"""
+        store = ColumnarStore(str(tmp_path))
+        frame = make_frame()
+        store.write_frame('rb9999', frame)
+
+        assert sorted(p.name for p in (tmp_path / 'rb9999').iterdir()) == ['2024-01', '2024-02']
+        start, end = frame.index[100], frame.index[4000]
+        result = store.read_frame('rb9999', start, end)
+        pd.testing.assert_frame_equal(result, frame.loc[start:end], check_freq=False, check_names=False)
+
+    def test_single_partition_is_mmap_view(self, tmp_path):
+        """测试单个分区内的读取不复制数据"""
+        store = ColumnarStore(str(tmp_path))
+        store.write_frame('rb9999', make_frame('2024-03-01', 1000))
+        columns = store.read('rb9999', datetime(2024, 3, 1, 1), datetime(2024, 3, 1, 2))
+
+        assert len(columns['close']) == 61
+        assert isinstance(columns['close'].base, np.memmap) or isinstance(columns['close'], np.memmap)
+        assert not columns['close'].flags.writeable
+
+    def test_merge_overwrites_duplicates(self, tmp_path):
+        """测试重复写入按时间戳去重，后写入的覆盖"""
+        store = ColumnarStore(str(tmp_path))
+        frame = make_frame('2024-03-01', 100)
+        store.write_frame('IF/2403', frame)
+        update = frame.iloc[50:].copy()
+        update['close'] += 1000
+        store.write_frame('IF/2403', update)
+
+        result = store.read_frame('IF/2403')
+        assert len(result) == 100
+        assert result['close'].iloc[49] == frame['close'].iloc[49]
+        assert result['close'].iloc[50] == frame['close'].iloc[50] + 1000
+        assert store.symbols() == ['IF/2403']
+        assert store.last_timestamp('IF/2403') == frame.index[-1]
+
+    def test_missing_symbol(self, tmp_path):
+        """测试未导出的合约返回空结果"""
+        store = ColumnarStore(str(tmp_path))
+        assert store.last_timestamp('rb9999') is None
+        assert store.read_frame('rb9999').empty
+
+class TestExport:
+    @pytest.fixture
+    def session_factory(self, tmp_path, monkeypatch):
+        engine = create_engine(f"sqlite:///{tmp_path / 'quant.db'}")
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(bind=engine)
+        monkeypatch.setattr('backend.services.backtest_service.SessionLocal', factory)
+
+        session = factory()
+        start = datetime(2024, 1, 31, 23, 0)
+        session.add_all([
+            MarketData(symbol=symbol, timestamp=start + timedelta(minutes=i),
+                       open=100 + i, high=101 + i, low=99 + i, close=100.5 + i, volume=i)
+            for symbol in ('rb9999', 'hc9999') for i in range(120)
+        ])
+        session.commit()
+        session.close()
+        return factory
+
+    def test_export_and_backtest_reads_store(self, tmp_path, session_factory):
+        """测试从数据库导出，回测优先读取列式存储并用数据库补齐新数据"""
+        store = ColumnarStore(str(tmp_path / 'columnar'))
+        session = session_factory()
+        try:
+            counts = store.export_from_database(session, batch_size=50)
+        finally:
+            session.close()
+        assert counts == {'rb9999': 120, 'hc9999': 120}
+
+        # 导出之后新增的数据
+        session = session_factory()
+        session.add(MarketData(symbol='rb9999', timestamp=datetime(2024, 2, 1, 1, 0),
+                               open=1, high=1, low=1, close=1, volume=1))
+        session.commit()
+        session.close()
+
+        start, end = datetime(2024, 1, 31), datetime(2024, 2, 2)
+        from_store = BacktestService(store)._get_historical_data('rb9999', start, end)
+        from_db = BacktestService(ColumnarStore(str(tmp_path / 'empty')))._get_historical_data('rb9999', start, end)
+        assert len(from_store) == 121
+        pd.testing.assert_frame_equal(from_store, from_db, check_names=False)
+
+    def test_uncovered_head_and_gaps_read_from_database(self, tmp_path, session_factory):
+        """测试导出区间之前的数据和存储中的缺口从数据库读取"""
+        export_start = datetime(2024, 2, 1, 0, 0)
+        start, end = datetime(2024, 1, 31), datetime(2024, 2, 2)
+        from_db = BacktestService(ColumnarStore(str(tmp_path / 'empty')))._get_historical_data('rb9999', start, end)
+
+        # 只导出了 export_start 之后的部分
+        store = ColumnarStore(str(tmp_path / 'columnar'))
+        session = session_factory()
+        try:
+            store.export_from_database(session, symbols=['rb9999'], start=export_start)
+        finally:
+            session.close()
+        assert store.first_timestamp('rb9999') == export_start
+        from_store = BacktestService(store)._get_historical_data('rb9999', start, end)
+        assert len(from_store) == 120
+        pd.testing.assert_frame_equal(from_store, from_db, check_names=False)
+
+        # 存储中缺少一根K线
+        gapped = ColumnarStore(str(tmp_path / 'gapped'))
+        gapped.write_frame('rb9999', from_db.drop(from_db.index[90]))
+        pd.testing.assert_frame_equal(
+            BacktestService(gapped)._get_historical_data('rb9999', start, end), from_db, check_names=False
+        )
@@ -0,0 +1,149 @@
+import asyncio
+from decimal import Decimal
+from unittest.mock import AsyncMock, Mock
+from backend.services.execution_engine import (
+    ExecutionEngine, OrderRequest, OrderSide, OrderType, shard_for
+)
+
+SYMBOLS = ['rb9999', 'hc9999', 'i9999', 'j9999', 'ru9999', 'cu9999', 'al9999', 'au9999']
+
+def make_engine(tmp_path, **config) -> ExecutionEngine:
+    """创建使用临时日志路径的执行引擎"""
+    market_data_service = Mock()
+    market_data_service.price_cache = {symbol: 4500.0 for symbol in SYMBOLS}
+    engine = ExecutionEngine(market_data_service, Mock(), {
+        'trading.position_journal': str(tmp_path / 'positions.log'),
+        'trading.order_journal': str(tmp_path / 'orders.journal'),
+        'trading.order_journal_fsync': False,
+        **config
+    })
+    engine._validate_order = Mock(return_value=True)
+    engine._check_risk_limits = AsyncMock(return_value=True)
+    return engine
+
+def make_request(symbol: str) -> OrderRequest:
+    return OrderRequest(symbol=symbol, side=OrderSide.BUY, order_type=OrderType.MARKET,
+                        quantity=Decimal('1'), user_id=1)
+
+class TestShardRouting:
+    def test_shard_for_is_deterministic(self):
+        """测试分片编号只由合约决定（crc32 跨进程稳定）"""
+        assert shard_for('rb9999', 4) == 2
+        assert shard_for('au9999', 4) == 1
+        assert {shard_for(symbol, 4) for symbol in SYMBOLS} == {0, 1, 2, 3}
+        assert all(shard_for(symbol, 1) == 0 for symbol in SYMBOLS)
+
+    def test_owns_symbol(self, tmp_path):
+        """测试多进程部署时每个合约恰好属于一个进程"""
+        engines = [
+            make_engine(tmp_path, **{'trading.process_count': 3, 'trading.process_index': index})
+            for index in range(3)
+        ]
+        for symbol in SYMBOLS:
+            owners = [index for index, engine in enumerate(engines) if engine.owns_symbol(symbol)]
+            assert owners == [shard_for(symbol, 3)]
+
+    async def test_foreign_symbol_is_rejected(self, tmp_path):
+        """测试不属于本进程的合约被拒绝，且不写入日志和活动订单"""
+        engine = make_engine(tmp_path, **{'trading.process_count': 2, 'trading.process_index': 0})
+        foreign = next(symbol for symbol in SYMBOLS if shard_for(symbol, 2) == 1)
+        await engine.order_journal.start()
+        try:
+            ok, message, order_id = await engine.submit_order(make_request(foreign))
+        finally:
+            await engine.order_journal.stop()
+
+        assert (ok, order_id) == (False, None)
+        assert 'another engine process' in message
+        assert engine.active_orders == {}
+        assert engine.order_journal.events_written == 0
+        engine._validate_order.assert_not_called()
+
+class TestShardedProcessing:
+    async def test_per_symbol_fifo(self, tmp_path):
+        """测试订单按合约进入固定分片，同一合约的订单按提交顺序执行"""
+        engine = make_engine(tmp_path, **{'trading.order_workers': 4})
+        executed = []
+
+        async def execute(order, current_price):
+            executed.append((order.symbol, order.order_id))
+            # 让出事件循环，使各分片交错执行
+            await asyncio.sleep(0)
+            engine.active_orders.pop(order.order_id, None)
+
+        engine._execute_market_order = execute
+        await engine.order_journal.start()
+        submitted = {symbol: [] for symbol in SYMBOLS}
+        for _ in range(5):
+            for symbol in SYMBOLS:
+                ok, _, order_id = await engine.submit_order(make_request(symbol))
+                assert ok
+                submitted[symbol].append(order_id)
+
+        engine.worker_tasks = [
+            asyncio.create_task(engine._process_order_queue(shard))
+            for shard in range(engine.worker_count)
+        ]
+        try:
+            total = sum(len(order_ids) for order_ids in submitted.values())
+            while sum(stats.processed for stats in engine.shard_stats) < total:
+                await asyncio.sleep(0.01)
+        finally:
+            for task in engine.worker_tasks:
+                task.cancel()
+            await engine.order_journal.stop()
+
+        for symbol, order_ids in submitted.items():
+            assert [order_id for s, order_id in executed if s == symbol] == order_ids
+        expected = [0] * engine.worker_count
+        for symbol, order_ids in submitted.items():
+            expected[shard_for(symbol, engine.worker_count)] += len(order_ids)
+        assert [stats.processed for stats in engine.shard_stats] == expected
+
+    async def test_shard_metrics_shape(self, tmp_path):
+        """测试分片指标：每个分片一项，包含队列深度、处理数和延迟"""
+        engine = make_engine(tmp_path, **{'trading.order_workers': 3})
+        await engine.order_journal.start()
+        try:
+            await engine.submit_order(make_request('rb9999'))
+        finally:
+            await engine.order_journal.stop()
+
+        metrics = engine.get_shard_metrics()
+        assert [item['shard'] for item in metrics] == [0, 1, 2]
+        for item in metrics:
+            assert set(item) == {'shard', 'queue_depth', 'processed', 'avg_latency', 'max_latency'}
+            assert item['processed'] == 0
+            assert item['avg_latency'] == item['max_latency'] == 0.0
+        assert metrics[shard_for('rb9999', 3)]['queue_depth'] == 1
+        assert sum(item['queue_depth'] for item in metrics) == 1
+
+    async def test_triggered_orders_use_shard_queue(self, tmp_path):
+        """测试行情触发的限价单进入合约所在分片的队列，而不是在行情回调中直接执行"""
+        engine = make_engine(tmp_path, **{'trading.order_workers': 4})
+        engine._execute_market_order = AsyncMock()
+        await engine.order_journal.start()
+        try:
+            request = OrderRequest(symbol='rb9999', side=OrderSide.BUY, order_type=OrderType.LIMIT,
+                                   quantity=Decimal('1'), price=Decimal('4400'), user_id=1)
+            _, _, order_id = await engine.submit_order(request)
+            queue = engine.order_queues[shard_for('rb9999', engine.worker_count)]
+            queue.get_nowait()
+
+            await engine._handle_price_update('rb9999', 4390.0)
+        finally:
+            await engine.order_journal.stop()
+
+        engine._execute_market_order.assert_not_called()
+        order, _ = queue.get_nowait()
+        assert order.order_id == order_id
+        assert order_id not in engine.trigger_book
+
+        # 分片处理时价格已回到限价之上：不成交并重新加入触发索引
+        queue.put_nowait((order, 0.0))
+        task = asyncio.create_task(engine._process_order_queue(shard_for('rb9999', engine.worker_count)))
+        while engine.shard_stats[shard_for('rb9999', engine.worker_count)].processed < 1:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        engine._execute_market_order.assert_not_called()
+        assert order_id in engine.trigger_book
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import patch
+from backend.services.fanout import BroadcastFanout, ConflatingOutbox
+
+class FakeWebSocket:
+    """可控制发送速度的模拟连接"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.messages = []
+        self.closed_with = None
+
+    async def send(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.messages.append(message)
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = code
+
+class TestBroadcastFanout:
+    async def test_serializes_once(self):
+        """测试每条消息只序列化一次"""
+        fanout = BroadcastFanout()
+        clients = [FakeWebSocket() for _ in range(50)]
+
+        with patch('backend.services.fanout.json.dumps', wraps=json.dumps) as dumps:
+            fanout.publish(clients, {'type': 'price', 'symbol': 'rb9999', 'price': 4500})
+            assert dumps.call_count == 1
+
+        await asyncio.sleep(0.01)
+        assert all(len(client.messages) == 1 for client in clients)
+        await fanout.close()
+
+    async def test_slow_client_does_not_block_others(self):
+        """测试慢客户端不影响其他订阅者"""
+        fanout = BroadcastFanout(max_queue_size=2, send_timeout=5)
+        slow = FakeWebSocket(delay=1.0)
+        fast = [FakeWebSocket() for _ in range(10)]
+
+        for i in range(5):
+            fanout.publish([slow] + fast, {'price': i})
+            await asyncio.sleep(0.001)
+
+        await asyncio.sleep(0.01)
+        assert all(len(client.messages) == 5 for client in fast)
+        assert fanout.dropped_count > 0
+        await fanout.close()
+
+    async def test_disconnect_policy(self):
+        """测试断开慢客户端"""
+        removed = []
+        fanout = BroadcastFanout(
+            max_queue_size=1, laggard_policy='disconnect', on_disconnect=removed.append
+        )
+        slow = FakeWebSocket(delay=1.0)
+
+        for i in range(4):
+            fanout.publish([slow], {'price': i})
+        await asyncio.sleep(0.01)
+
+        assert removed == [slow]
+        assert slow.closed_with == 1013
+        assert slow not in fanout.senders
+
+    async def test_send_timeout_disconnects(self):
+        """测试发送超时后断开连接"""
+        removed = []
+        fanout = BroadcastFanout(send_timeout=0.01, on_disconnect=removed.append)
+        stuck = FakeWebSocket(delay=1.0)
+
+        fanout.publish([stuck], {'price': 1})
+        await asyncio.sleep(0.05)
+
+        assert removed == [stuck]
+        assert fanout.timeout_count == 1
+
+    async def test_conflates_latest_price_per_symbol(self):
+        """测试慢客户端只收到每个合约的最新价格"""
+        fanout = BroadcastFanout(max_queue_size=10)
+        slow = FakeWebSocket(delay=0.05)
+
+        fanout.publish([slow], {'type': 'price', 'symbol': 'rb9999', 'price': 0}, key=('price', 'rb9999'))
+        await asyncio.sleep(0.01)  # 第一条正在发送中
+        for i in range(1, 100):
+            fanout.publish([slow], {'type': 'price', 'symbol': 'rb9999', 'price': i}, key=('price', 'rb9999'))
+            fanout.publish([slow], {'type': 'price', 'symbol': 'hc9999', 'price': i}, key=('price', 'hc9999'))
+        await asyncio.sleep(0.2)
+
+        prices = [json.loads(message)['price'] for message in slow.messages]
+        assert prices == [0, 99, 99]
+        assert fanout.conflated_count == 98 * 2
+        assert fanout.dropped_count == 0
+        await fanout.close()
+
+    def test_invalid_policy(self):
+        """测试非法的慢客户端策略"""
+        with pytest.raises(ValueError):
+            BroadcastFanout(laggard_policy='block')
+
+class TestConflatingOutbox:
+    async def test_keeps_position_and_bounds_size(self):
+        """测试合并保持原有顺序且队列有界"""
+        outbox = ConflatingOutbox(max_size=3)
+        assert outbox.put('trade-1')
+        assert outbox.put('price-1', key='rb9999')
+        assert outbox.put('trade-2')
+        assert outbox.put('price-2', key='rb9999')
+        assert not outbox.put('trade-3')
+
+        assert [await outbox.get() for _ in range(3)] == ['trade-1', 'price-2', 'trade-2']
+        assert outbox.conflated_count == 1
+        assert outbox.dropped_count == 1
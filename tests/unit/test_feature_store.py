@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backend.data import indicators
+from backend.data.columnar_store import ColumnarStore
+from backend.data.data_processor import DataProcessor
+from backend.data.feature_store import DEFAULT_FEATURES, FeatureStore, indicator_key, shared_feature_store
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(11)
+    close = 4500 + np.cumsum(rng.normal(0, 5, 300))
+    index = pd.date_range('2024-01-02 09:00', periods=len(close), freq='min', name='timestamp').as_unit('ns')
+    return pd.DataFrame({'open': close, 'high': close + 1, 'low': close - 1,
+                         'close': close, 'volume': np.ones(len(close))}, index=index)
+
+class TestFeatureStore:
+    def test_incremental_append_matches_batch(self, tmp_path, frame):
+        """测试分批追加与整段计算结果一致，重复追加的K线被忽略"""
+        store = FeatureStore(str(tmp_path))
+        assert store.append_frame('rb9999', frame.iloc[:120]) == 120
+        assert store.append_frame('rb9999', frame.iloc[100:200]) == 80
+        assert store.append_frame('rb9999', frame.iloc[200:]) == 100
+
+        features = store.features('rb9999', frame)
+        close = frame['close'].to_numpy()
+        np.testing.assert_array_equal(features['MA20'], indicators.sma(close, 20))
+        line, signal, hist = indicators.macd(close)
+        np.testing.assert_array_equal(features['MACD_signal'], signal)
+        upper, middle, lower = indicators.bbands(close, 20, 2.0, 2.0)
+        np.testing.assert_array_equal(features['BB_lower'], lower)
+        assert store.last_timestamp('rb9999', DEFAULT_FEATURES['RSI']) == frame.index[-1]
+
+    def test_shared_indicators_and_alignment(self, tmp_path, frame):
+        """测试参数相同的指标共用存储，特征按传入的行对齐"""
+        store = FeatureStore(str(tmp_path))
+        store.append_frame('rb9999', frame)
+        subset = frame.iloc[[250, 10, 120]]
+
+        features = store.features('rb9999', subset, {'fast': {'type': 'sma', 'period': 10}})
+        np.testing.assert_array_equal(features['fast'], indicators.sma(frame['close'].to_numpy(), 10)[[250, 10, 120]])
+        assert len(store.read('rb9999', {'type': 'sma', 'period': 10})['timestamp']) == len(frame)
+        assert indicator_key({'type': 'sma', 'period': 10}) == indicator_key(DEFAULT_FEATURES['MA10'])
+
+        # 早于存储起点的K线无法对齐
+        earlier = pd.DataFrame({'close': [1.0]}, index=[frame.index[0] - pd.Timedelta(minutes=1)])
+        assert store.features('rb9999', earlier) is None
+
+        # 收盘价被修正的K线不使用已存储的指标
+        restated = frame.copy()
+        restated.iloc[100, restated.columns.get_loc('close')] += 1
+        assert store.features('rb9999', restated) is None
+
+    def test_non_contiguous_frame_is_not_appended(self, tmp_path, frame):
+        """测试与存储末尾不相接的数据不追加，指标不会跨过缺口继续计算"""
+        store = FeatureStore(str(tmp_path))
+        spec = {'MA5': DEFAULT_FEATURES['MA5']}
+        assert store.features('rb9999', frame.iloc[:100], spec) is not None
+
+        assert store.features('rb9999', frame.iloc[200:210], spec) is None
+        assert store.last_timestamp('rb9999', spec['MA5']) == frame.index[99]
+
+        # 与存储末尾相接的数据继续追加，结果与整段计算一致
+        features = store.features('rb9999', frame.iloc[99:210], spec)
+        np.testing.assert_array_equal(features['MA5'], indicators.sma(frame['close'].to_numpy(), 5)[99:210])
+
+    def test_forming_bar_is_not_persisted(self, tmp_path, frame):
+        """测试未完成的K线只在内存中计算，收盘价变化后仍可读取"""
+        store = FeatureStore(str(tmp_path))
+        spec = {'MA5': DEFAULT_FEATURES['MA5']}
+        now = frame.index[-1].to_pydatetime() + pd.Timedelta(seconds=30)
+        features = store.features('rb9999', frame, spec, now=now)
+        np.testing.assert_array_equal(features['MA5'], indicators.sma(frame['close'].to_numpy(), 5))
+        assert store.last_timestamp('rb9999', spec['MA5']) == frame.index[-2]
+
+        updated = frame.copy()
+        updated.iloc[-1, updated.columns.get_loc('close')] += 10
+        features = store.features('rb9999', updated, spec, now=now)
+        assert features['MA5'].iloc[-1] == pytest.approx(updated['close'].iloc[-5:].mean())
+
+    def test_uncommitted_tail_is_discarded(self, tmp_path, frame):
+        """测试未提交的尾部数据在下次追加时被截掉"""
+        store = FeatureStore(str(tmp_path))
+        spec = {'MA5': DEFAULT_FEATURES['MA5']}
+        store.append_frame('rb9999', frame.iloc[:50], spec=spec)
+        path = store._path('rb9999', '1m', DEFAULT_FEATURES['MA5'])
+        with open(f"{path}/value.bin", 'ab') as f:
+            f.write(np.zeros(7).tobytes())
+
+        store.append_frame('rb9999', frame.iloc[50:], spec=spec)
+        np.testing.assert_array_equal(
+            store.read('rb9999', DEFAULT_FEATURES['MA5'])['value'], indicators.sma(frame['close'].to_numpy(), 5)
+        )
+
+    def test_sync_from_columnar(self, tmp_path, frame):
+        """测试从列式K线存储补齐指标"""
+        columnar = ColumnarStore(str(tmp_path / 'columnar'))
+        columnar.write_frame('rb9999', frame.iloc[:200])
+        store = FeatureStore(str(tmp_path / 'features'))
+        assert store.sync_from_columnar('rb9999', columnar) == 200
+
+        columnar.write_frame('rb9999', frame.iloc[200:])
+        assert store.sync_from_columnar('rb9999', columnar) == 100
+        assert store.last_timestamp('rb9999', DEFAULT_FEATURES['MA5']) == frame.index[-1]
+
+class TestFeatureConsumers:
+    def test_data_processor_reads_store(self, tmp_path, frame):
+        """测试 DataProcessor 按合约读取的特征与直接计算一致"""
+        processor = DataProcessor.__new__(DataProcessor)
+        processor.feature_store = FeatureStore(str(tmp_path))
+        direct = processor.calculate_technical_indicators(frame.copy())
+        stored = processor.calculate_technical_indicators(frame.copy(), 'rb9999')
+
+        pd.testing.assert_frame_equal(stored, direct)
+        assert processor.feature_store.last_timestamp('rb9999', DEFAULT_FEATURES['BB']) == frame.index[-1]
+
+    def test_services_share_one_store_per_root(self, tmp_path):
+        """测试同一目录的各服务共用一个 FeatureStore（同一把锁）"""
+        from backend.services.backtest_service import BacktestService
+
+        config = {'data.feature_root': str(tmp_path / 'features'), 'data.columnar_root': str(tmp_path / 'columnar')}
+        store = BacktestService(config=config).feature_store
+        assert store is shared_feature_store(str(tmp_path / 'features'))
+        assert store is shared_feature_store(str(tmp_path / 'other' / '..' / 'features'))
+        assert store is not shared_feature_store(str(tmp_path / 'elsewhere'))
+
+    async def test_kline_stream_appends_closed_bars(self, tmp_path, mocker, frame):
+        """测试K线流只把已完成的K线追加到特征存储"""
+        from backend.services.market_data_service import MarketDataService
+
+        service = MarketDataService({
+            'database.url': f"sqlite:///{tmp_path / 'quant.db'}",
+            'market_data.append_features': True,
+            'data.feature_root': str(tmp_path / 'features')
+        })
+        mocker.patch.object(service.kline_persister, 'submit')
+        for timestamp, close in zip(frame.index[:30], frame['close'][:30]):
+            kline = {'timestamp': timestamp.to_pydatetime(), 'open': close, 'high': close,
+                     'low': close, 'close': close, 'volume': 1.0}
+            await service._handle_kline('rb9999', {**kline, 'close': close + 3})
+            await service._handle_kline('rb9999', kline)
+
+        values = service.feature_store.read('rb9999', DEFAULT_FEATURES['MA5'])
+        assert len(values['timestamp']) == 29
+        np.testing.assert_allclose(values['value'], indicators.sma(frame['close'].to_numpy()[:29], 5))
+
+    def test_backtest_uses_strategy_features(self, tmp_path, mocker, frame):
+        """测试回测时策略均线来自特征存储，结果与策略自行计算一致"""
+        from backend.services.backtest_service import BacktestService
+        from backend.strategy.ma_cross_strategy import MACrossStrategy
+
+        strategy = MACrossStrategy('rb9999', '1m', fast_period=5, slow_period=20)
+        service = BacktestService(ColumnarStore(str(tmp_path / 'columnar')), FeatureStore(str(tmp_path / 'features')))
+        mocker.patch.object(service, '_get_historical_data', return_value=frame)
+        generate = mocker.spy(strategy, 'generate_positions')
+        result = service.run_backtest(strategy, frame.index[0], frame.index[-1])
+
+        data = generate.call_args.args[0]
+        assert {'sma_5', 'sma_20'} <= set(data.columns)
+        expected = BacktestService(
+            ColumnarStore(str(tmp_path / 'columnar')), FeatureStore(str(tmp_path / 'unused'))
+        ).run_vectorized(
+            frame, strategy.generate_positions(frame)
+        )
+        assert result['equity_curve'] == pytest.approx(expected['equity_curve'])
+
+    def test_reused_frame_with_other_periods(self, tmp_path, frame):
+        """测试加入一组参数的均线列后，同一份数据换另一组参数时仍按自身周期计算"""
+        from backend.services.backtest_service import BacktestService
+        from backend.strategy.ma_cross_strategy import MACrossStrategy
+
+        service = BacktestService(ColumnarStore(str(tmp_path / 'columnar')), FeatureStore(str(tmp_path / 'features')))
+        first = MACrossStrategy('rb9999', '1m', fast_period=5, slow_period=20)
+        data = service._add_features(first, frame)
+        data = service._add_features(first, data)
+        assert list(data.columns).count('sma_5') == 1
+
+        second = MACrossStrategy('rb9999', '1m', fast_period=3, slow_period=10)
+        np.testing.assert_array_equal(second.generate_positions(data), second.generate_positions(frame))
+        assert second.generate_signals(data) == second.generate_signals(frame)
@@ -0,0 +1,147 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from backend.data.indicators import (
+    BBANDS, EMA, MACD, RSI, SMA, Indicator, IndicatorSet, bbands, ema, macd, restore_indicator, rsi, sma
+)
+
+@pytest.fixture
+def close():
+    rng = np.random.default_rng(5)
+    return 4500 + np.cumsum(rng.normal(0, 5, 400))
+
+def reference_ema(values: np.ndarray, period: int, seed_start: int = 0) -> np.ndarray:
+    """TA-Lib 默认方式：以 seed_start 起 period 个值的平均作为初值"""
+    out = np.full(len(values), np.nan)
+    first = seed_start + period - 1
+    out[first] = values[seed_start:first + 1].mean()
+    k = 2.0 / (period + 1)
+    for i in range(first + 1, len(values)):
+        out[i] = out[i - 1] + (values[i] - out[i - 1]) * k
+    return out
+
+class TestIndicators:
+    def test_sma_and_bbands(self, close):
+        """测试 SMA 与布林带（总体标准差）"""
+        series = pd.Series(close)
+        np.testing.assert_allclose(sma(close, 20), series.rolling(20).mean(), rtol=1e-12)
+
+        upper, middle, lower = bbands(close, 20, 2.0, 2.0)
+        std = series.rolling(20).std(ddof=0)
+        np.testing.assert_allclose(middle, series.rolling(20).mean(), rtol=1e-12)
+        np.testing.assert_allclose(upper, series.rolling(20).mean() + 2 * std, rtol=1e-9)
+        np.testing.assert_allclose(lower, series.rolling(20).mean() - 2 * std, rtol=1e-9)
+
+    def test_ema(self, close):
+        """测试 EMA 以简单平均作为初值"""
+        result = ema(close, 10)
+        assert np.isnan(result[:9]).all()
+        np.testing.assert_allclose(result, reference_ema(close, 10), rtol=1e-12)
+
+    def test_rsi(self, close):
+        """测试 RSI（Wilder 平滑）"""
+        period = 14
+        deltas = np.diff(close)
+        gains, losses = np.clip(deltas, 0, None), np.clip(-deltas, 0, None)
+        expected = np.full(len(close), np.nan)
+        avg_gain, avg_loss = gains[:period].mean(), losses[:period].mean()
+        expected[period] = 100 * avg_gain / (avg_gain + avg_loss)
+        for i in range(period + 1, len(close)):
+            avg_gain = (avg_gain * (period - 1) + gains[i - 1]) / period
+            avg_loss = (avg_loss * (period - 1) + losses[i - 1]) / period
+            expected[i] = 100 * avg_gain / (avg_gain + avg_loss)
+
+        np.testing.assert_allclose(rsi(close, period), expected, rtol=1e-10)
+
+    def test_macd_alignment(self, close):
+        """测试 MACD 与 TA-Lib 相同的初值与输出起点"""
+        line, signal, hist = macd(close, 12, 26, 9)
+        fast = reference_ema(close, 12, seed_start=26 - 12)
+        slow = reference_ema(close, 26)
+        expected_line = fast - slow
+        expected_signal = np.full(len(close), np.nan)
+        expected_signal[25:] = reference_ema(expected_line[25:], 9)
+
+        assert np.isnan(line[:33]).all() and not np.isnan(line[33])
+        np.testing.assert_allclose(line[33:], expected_line[33:], rtol=1e-10)
+        np.testing.assert_allclose(signal[33:], expected_signal[33:], rtol=1e-10)
+        np.testing.assert_allclose(hist[33:], line[33:] - signal[33:], rtol=1e-10)
+
+    @pytest.mark.parametrize('factory', [
+        lambda: SMA(10), lambda: EMA(10), lambda: RSI(14), lambda: MACD(12, 26, 9), lambda: BBANDS(20)
+    ])
+    def test_snapshot_restore(self, close, factory):
+        """测试保存状态后恢复，继续计算的结果不变"""
+        indicator = factory()
+        for value in close[:100]:
+            indicator.update(value)
+        state = json.loads(json.dumps(indicator.snapshot()))
+        restored = restore_indicator(state)
+
+        for value in close[100:]:
+            np.testing.assert_array_equal(np.asarray(restored.update(value)), np.asarray(indicator.update(value)))
+
+    @pytest.mark.parametrize('factory', [
+        lambda: SMA(10), lambda: EMA(10), lambda: RSI(14), lambda: MACD(12, 26, 9), lambda: BBANDS(20)
+    ])
+    def test_rollback_each_update(self, close, factory):
+        """测试每次更新后撤销再重算，结果与只更新一次相同（覆盖预热边界）"""
+        revised, clean = factory(), factory()
+        for value in close[:100]:
+            state = json.loads(json.dumps(revised.checkpoint()))
+            revised.update(value + 50)
+            revised.rollback(state)
+            np.testing.assert_array_equal(np.asarray(revised.update(value)), np.asarray(clean.update(value)))
+        assert revised.snapshot() == clean.snapshot()
+
+    def test_checkpoint_does_not_copy_window(self):
+        """测试 checkpoint 只保存标量和窗口的最早值"""
+        indicator = BBANDS(500)
+        for value in range(600):
+            indicator.update(float(value))
+        assert indicator.checkpoint()['window'] == 100.0
+
+    def test_indicator_is_abstract(self):
+        """测试未实现 update/value 的指标不能实例化"""
+        with pytest.raises(TypeError):
+            Indicator()
+
+class TestIndicatorSet:
+    def test_repeated_bar_replaces_previous(self, close):
+        """测试同一时间的K线重复推送时不会重复计入"""
+        replaced, clean = IndicatorSet(), IndicatorSet()
+        for i, value in enumerate(close[:100]):
+            replaced.update(value + 50, timestamp=i)
+            replaced.update(value, timestamp=i)
+            clean.update(value, timestamp=i)
+        assert replaced.values() == clean.values()
+        assert clean.values()['ma20'] == pytest.approx(close[80:100].mean())
+
+        restored = IndicatorSet.from_snapshot(json.loads(json.dumps(clean.snapshot())))
+        assert restored.update(close[100], timestamp=100) == clean.update(close[100], timestamp=100)
+
+class TestMarketDataServiceIndicators:
+    async def test_indicators_follow_kline_stream(self, tmp_path, mocker, close):
+        """测试K线流驱动指标更新，回调中读取到的是最新值"""
+        from backend.services.market_data_service import MarketDataService
+
+        service = MarketDataService({'database.url': f"sqlite:///{tmp_path / 'quant.db'}"})
+        mocker.patch.object(service.kline_persister, 'submit')
+        seen = []
+
+        async def on_kline(symbol, kline):
+            seen.append(service.get_indicators(symbol)['ma5'])
+        service.kline_callbacks.append(on_kline)
+
+        for i, value in enumerate(close[:60]):
+            await service._handle_kline('rb9999', {
+                'timestamp': 1704186000 + 60 * i, 'open': value, 'high': value,
+                'low': value, 'close': value, 'volume': 1.0
+            })
+
+        assert seen[-1] == pytest.approx(close[55:60].mean())
+        result = service.calculate_indicators('rb9999')
+        assert result['sma'] == pytest.approx(close[40:60].mean())
+        assert result['rsi'] == pytest.approx(rsi(close[:60])[-1])
+        assert service.calculate_indicators('rb9999', window=10)['sma'] == pytest.approx(close[50:60].mean())
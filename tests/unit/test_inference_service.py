@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import numpy as np
+import pytest
+from backend.services.inference_service import Histogram, InferenceService
+
+class SumModel:
+    """按窗口求和的假模型，记录每次前向计算的批次大小"""
+
+    def __init__(self, offset: float = 0.0, gate: threading.Event = None):
+        self.offset = offset
+        self.gate = gate
+        self.batch_sizes = []
+        self.entered = threading.Event()
+
+    def predict(self, X):
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.batch_sizes.append(len(X))
+        return X.sum(axis=(1, 2))[:, None] + self.offset
+
+def windows(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, 20, 7)).astype(np.float32)
+
+class TestInferenceService:
+    def test_requests_are_micro_batched(self):
+        """测试截止时间内到达的请求合并为一次前向计算，结果按请求拆分"""
+        model = SumModel()
+        service = InferenceService(model, max_batch_size=64, max_latency=0.2)
+        X = windows(10)
+        futures = [service.submit(X[i]) for i in range(6)] + [service.submit(X[6:])]
+
+        for i in range(6):
+            assert futures[i].result(5) == pytest.approx(X[i].sum(), rel=1e-5)
+        np.testing.assert_allclose(futures[6].result(5)[:, 0], X[6:].sum(axis=(1, 2)), rtol=1e-5)
+        service.close()
+
+        assert model.batch_sizes == [10]
+        metrics = service.get_metrics()
+        assert metrics['requests_served'] == 7
+        assert metrics['batch_size']['buckets']['16'] == 1
+        assert metrics['request_latency']['count'] == 7
+
+    def test_concurrent_submit_starts_one_worker(self, mocker):
+        """测试多个线程同时提交第一个请求时只启动一个推理线程"""
+        service = InferenceService(SumModel(), max_latency=0.01)
+        thread_cls = mocker.spy(threading, 'Thread')
+        barrier = threading.Barrier(8)
+        futures = []
+
+        def submit(i):
+            barrier.wait()
+            futures.append(service.submit(windows(1, seed=i)[0]))
+
+        submitters = [threading.Thread(target=submit, args=(i,)) for i in range(8)]
+        for thread in submitters:
+            thread.start()
+        for thread in submitters:
+            thread.join()
+        assert all(future.result(5) is not None for future in futures)
+        service.close()
+
+        workers = [call for call in thread_cls.call_args_list if call.kwargs.get('name') == 'inference-service']
+        assert len(workers) == 1
+
+    def test_batch_size_limit_and_shapes(self):
+        """测试批次不超过最大行数，不同输入形状分开计算"""
+        model = SumModel()
+        service = InferenceService(model, max_batch_size=4, max_latency=0.05)
+        futures = [service.submit(windows(3, seed=i)) for i in range(3)]
+        other = service.submit(np.ones((10, 5), dtype=np.float32))
+        for future in futures:
+            assert future.result(5).shape == (3, 1)
+        assert other.result(5) == pytest.approx(50.0)
+        service.close()
+        assert max(model.batch_sizes) <= 4 and sum(model.batch_sizes) == 10
+
+    def test_hot_swap_keeps_pending_requests(self):
+        """测试替换模型时正在计算的批次用旧模型完成，排队的请求由新模型计算"""
+        gate = threading.Event()
+        old, new = SumModel(gate=gate), SumModel(offset=1000.0)
+        service = InferenceService(old, max_batch_size=1, max_latency=0.0)
+        X = windows(3)
+
+        first = service.submit(X[0])
+        assert old.entered.wait(5)
+        pending = [service.submit(X[1]), service.submit(X[2])]
+        assert service.swap_model(new) is old
+        gate.set()
+
+        assert first.result(5) == pytest.approx(X[0].sum(), rel=1e-5)
+        assert [f.result(5) for f in pending] == pytest.approx([X[1].sum() + 1000, X[2].sum() + 1000], rel=1e-5)
+        assert service.get_metrics()['model_version'] == 2
+        service.close()
+
+    def test_failed_batch_sets_exception(self):
+        """测试前向计算失败时异常传递给批次内的所有请求"""
+        service = InferenceService(max_latency=0.0)
+        future = service.submit(windows(1)[0])
+        with pytest.raises(RuntimeError):
+            future.result(5)
+        service.close()
+        assert service.failed_requests == 1
+
+    async def test_async_predict(self):
+        """测试在事件循环中并发预测"""
+        model = SumModel()
+        service = InferenceService(model, max_batch_size=32, max_latency=0.05)
+        X = windows(8)
+        results = await asyncio.gather(*(service.predict(X[i]) for i in range(8)))
+        await service.stop()
+
+        assert [float(r[0]) for r in results] == pytest.approx(list(X.sum(axis=(1, 2))), rel=1e-5)
+        assert len(model.batch_sizes) < 8
+
+class TestHistogram:
+    def test_bucket_boundaries(self):
+        """测试上界包含在桶内，超出最大上界的计入 +Inf"""
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 10, 11):
+            histogram.observe(value)
+        assert histogram.snapshot()['buckets'] == {'1': 2, '10': 2, '+Inf': 1}
+        assert histogram.snapshot()['sum'] == pytest.approx(27.5)
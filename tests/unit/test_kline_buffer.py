@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from backend.data.kline_buffer import KlineRingBuffer
+
+def make_kline(i: int) -> dict:
+    return {
+        'timestamp': 1700000000 + i * 60,
+        'open': float(i),
+        'high': float(i) + 1,
+        'low': float(i) - 1,
+        'close': float(i) + 0.5,
+        'volume': 10.0 * i
+    }
+
+class TestKlineRingBuffer:
+    def test_append_within_capacity(self):
+        """测试未满时按顺序返回"""
+        buffer = KlineRingBuffer(capacity=5)
+        for i in range(3):
+            buffer.append(make_kline(i))
+
+        assert len(buffer) == 3
+        np.testing.assert_array_equal(buffer.column('open'), [0.0, 1.0, 2.0])
+        assert buffer.latest()['close'] == 2.5
+
+    def test_wraps_and_keeps_latest(self):
+        """测试超出容量后只保留最新K线且保持时间顺序"""
+        buffer = KlineRingBuffer(capacity=4)
+        for i in range(11):
+            buffer.append(make_kline(i))
+
+        assert len(buffer) == 4
+        np.testing.assert_array_equal(buffer.column('open'), [7.0, 8.0, 9.0, 10.0])
+        np.testing.assert_array_equal(buffer.column('open', 2), [9.0, 10.0])
+
+    def test_last_is_zero_copy_view(self):
+        """测试最近N根K线为底层数组的视图"""
+        buffer = KlineRingBuffer(capacity=3)
+        for i in range(7):
+            buffer.append(make_kline(i))
+
+        view = buffer.last(3)
+        assert np.shares_memory(view, buffer._data)
+        assert view['timestamp'][0] < view['timestamp'][-1]
+
+    def test_to_frame(self):
+        """测试转换为DataFrame"""
+        buffer = KlineRingBuffer(capacity=10)
+        for i in range(12):
+            buffer.append(make_kline(i))
+
+        df = buffer.to_frame(5)
+        assert list(df.columns) == ['open', 'high', 'low', 'close', 'volume']
+        assert len(df) == 5
+        assert df['close'].iloc[-1] == 11.5
+        assert df.index.is_monotonic_increasing
+
+    def test_invalid_capacity(self):
+        """测试非法容量"""
+        with pytest.raises(ValueError):
+            KlineRingBuffer(capacity=0)
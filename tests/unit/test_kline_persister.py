@@ -0,0 +1,92 @@
+import pytest
+from types import SimpleNamespace
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import mysql, oracle
+from sqlalchemy.orm import Session
+from backend.models.database import Base, MarketData
+from backend.services.kline_persister import KlinePersister
+
+@pytest.fixture
+def engine(tmp_path):
+    """创建临时SQLite数据库"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'klines.db'}")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+def make_kline(i: int) -> dict:
+    return {
+        'timestamp': 1700000000 + i * 60,
+        'open': 4500.0 + i,
+        'high': 4510.0 + i,
+        'low': 4490.0 + i,
+        'close': 4505.0 + i,
+        'volume': 100.0
+    }
+
+class TestKlinePersister:
+    def test_close_flushes_pending_rows(self, engine):
+        """测试停止时写入缓冲区中的全部K线"""
+        persister = KlinePersister(engine, batch_size=50, flush_interval=60)
+        for i in range(120):
+            persister.submit('rb9999', make_kline(i))
+        persister.close()
+
+        with Session(engine) as session:
+            assert session.query(MarketData).count() == 120
+        assert persister.queue_depth == 0
+        assert persister.rows_written == 120
+
+    def test_flushes_by_batch_size(self, engine):
+        """测试按批次大小分批写入"""
+        persister = KlinePersister(engine, batch_size=10, flush_interval=60)
+        for i in range(25):
+            persister._queue.put(persister._to_row('rb9999', make_kline(i)))
+        persister.flush()
+
+        metrics = persister.get_metrics()
+        assert metrics['flush_count'] == 3
+        assert metrics['rows_written'] == 25
+        assert metrics['queue_depth'] == 0
+        assert metrics['max_flush_latency'] > 0
+
+    async def test_async_stop(self, engine):
+        """测试在事件循环中停止写入器"""
+        persister = KlinePersister(engine, batch_size=500, flush_interval=0.05)
+        for i in range(10):
+            persister.submit('rb9999', make_kline(i))
+        await persister.stop()
+
+        with Session(engine) as session:
+            rows = session.query(MarketData).order_by(MarketData.timestamp).all()
+        assert len(rows) == 10
+        assert float(rows[0].close) == 4505.0
+
+    def test_duplicate_klines_are_upserted(self, engine):
+        """测试重复推送的K线按 (合约, 周期, 时间) 去重并以最新数据为准"""
+        persister = KlinePersister(engine, batch_size=500, flush_interval=60)
+        for i in range(5):
+            persister.submit('rb9999', make_kline(i))
+        persister.flush()
+        updated = dict(make_kline(4), close=4600.0)
+        persister.submit('rb9999', updated)
+        persister.submit('rb9999', updated)
+        persister.submit('rb9999', dict(make_kline(4), interval='5m'))
+        persister.close()
+
+        with Session(engine) as session:
+            assert session.query(MarketData).filter_by(interval='1m').count() == 5
+            assert session.query(MarketData).filter_by(interval='5m').count() == 1
+            latest = session.query(MarketData).filter_by(interval='1m').order_by(MarketData.timestamp.desc()).first()
+        assert float(latest.close) == 4600.0
+
+    def test_mysql_upsert_statement(self):
+        """测试 MySQL 使用 ON DUPLICATE KEY UPDATE 去重"""
+        persister = KlinePersister(SimpleNamespace(dialect=mysql.dialect()))
+        sql = str(persister._upsert.compile(dialect=mysql.dialect()))
+        assert 'ON DUPLICATE KEY UPDATE' in sql
+        assert 'close = VALUES(close)' in sql
+
+    def test_unsupported_dialect_raises(self):
+        """测试不支持去重写入的数据库在构造时报错"""
+        with pytest.raises(ValueError):
+            KlinePersister(SimpleNamespace(dialect=oracle.dialect()))
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from backend.data.kline_query import iter_kline_pages, load_kline_frame, query_kline_page
+from backend.models.database import Base, MarketData
+
+START = datetime(2024, 1, 2, 9, 0)
+
+@pytest.fixture
+def session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'klines.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = Session(engine)
+    session.add_all([
+        MarketData(symbol=symbol, interval='1m', timestamp=START + timedelta(minutes=i),
+                   open=i, high=i + 1, low=i - 1, close=i + 0.5, volume=10)
+        for symbol in ('rb9999', 'hc9999') for i in range(250)
+    ])
+    session.add(MarketData(symbol='rb9999', interval='5m', timestamp=START,
+                           open=0, high=5, low=-1, close=4.5, volume=50))
+    session.commit()
+    yield session
+    session.close()
+
+class TestKlineQuery:
+    def test_keyset_pagination(self, session):
+        """测试游标分页按时间连续且不重复"""
+        page, cursor = query_kline_page(session, 'rb9999', limit=100)
+        assert len(page['timestamp']) == 100
+        assert cursor == START + timedelta(minutes=99)
+
+        page, cursor = query_kline_page(session, 'rb9999', limit=100, after=cursor)
+        assert page['open'][0] == 100
+
+        pages = list(iter_kline_pages(session, 'rb9999', page_size=100))
+        assert [len(p['close']) for p in pages] == [100, 100, 50]
+        timestamps = np.concatenate([p['timestamp'] for p in pages])
+        assert np.all(np.diff(timestamps) == 60 * 10**9)
+
+    def test_range_and_interval(self, session):
+        """测试时间范围与周期过滤"""
+        frame = load_kline_frame(session, 'rb9999', START + timedelta(minutes=10),
+                                 START + timedelta(minutes=19), page_size=3)
+        assert len(frame) == 10
+        assert frame['close'].tolist() == [i + 0.5 for i in range(10, 20)]
+
+        frame = load_kline_frame(session, 'rb9999', interval='5m')
+        assert frame['volume'].tolist() == [50.0]
+        assert load_kline_frame(session, 'ag9999').empty
+
+    def test_data_processor_reads_interval(self, session, tmp_path):
+        """测试 DataProcessor 按周期读取数据库中的K线（时间戳为列）"""
+        from backend.data.columnar_store import ColumnarStore
+        from backend.data.data_processor import DataProcessor
+
+        processor = DataProcessor.__new__(DataProcessor)
+        processor.engine = session.get_bind()
+        processor.store = ColumnarStore(str(tmp_path / 'columnar'))
+
+        bars = processor.fetch_market_data('rb9999', START, START + timedelta(hours=1), interval='5m')
+        assert list(bars.columns) == ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+        assert len(bars) == 1 and bars['volume'][0] == 50
+
+        minutes = processor.fetch_market_data('rb9999', START, START + timedelta(minutes=9))
+        assert minutes['open'].tolist() == [float(i) for i in range(10)]
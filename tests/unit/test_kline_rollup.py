@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from backend.data.kline_query import load_kline_frame
+from backend.data.kline_rollup import KlineRollup, backfill_rollups, rollup_frame
+from backend.models.database import Base, MarketData
+
+START = datetime(2024, 1, 2, 9, 0)
+
+def make_klines(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 4500 + np.cumsum(rng.normal(0, 2, n))
+    index = pd.date_range(START, periods=n, freq='min').as_unit('ns')
+    return pd.DataFrame({
+        'open': close + rng.normal(0, 1, n),
+        'high': close + 3,
+        'low': close - 3,
+        'close': close,
+        'volume': rng.integers(1, 100, n).astype(float)
+    }, index=index)
+
+def kline(timestamp, row) -> dict:
+    return {'timestamp': timestamp.to_pydatetime(), **{k: float(v) for k, v in row.items()}}
+
+class TestKlineRollup:
+    def test_incremental_matches_batch(self):
+        """测试逐根增量汇总与批量汇总一致（含同一分钟重复推送）"""
+        frame = make_klines(200)
+        rollup = KlineRollup(intervals=['5m', '15m', '1h'])
+        latest = {}
+        for timestamp, row in frame.iterrows():
+            # 先推送未完成的K线，再推送最终值
+            partial = dict(kline(timestamp, row), close=float(row['open']), volume=1.0)
+            rollup.update('rb9999', partial)
+            for bar in rollup.update('rb9999', kline(timestamp, row)):
+                latest[(bar['interval'], bar['timestamp'])] = bar
+
+        for interval in ('5m', '15m', '1h'):
+            expected = rollup_frame(frame, interval)
+            bars = sorted((ts, bar) for (name, ts), bar in latest.items() if name == interval)
+            assert [ts for ts, _ in bars] == list(expected.index.to_pydatetime())
+            for column in ('open', 'high', 'low', 'close', 'volume'):
+                np.testing.assert_allclose([bar[column] for _, bar in bars], expected[column])
+
+    def test_rollup_frame_matches_resample(self):
+        """测试批量汇总与 pandas 重采样一致"""
+        frame = make_klines(500, seed=3)
+        expected = frame.resample('15min').agg({
+            'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'
+        })
+        pd.testing.assert_frame_equal(rollup_frame(frame, '15m'), expected,
+                                      check_freq=False, check_names=False)
+
+    def test_out_of_order_within_bucket(self):
+        """测试周期内乱序到达的K线，以及早于当前周期的K线"""
+        rollup = KlineRollup(intervals=['5m'])
+        bars = {
+            1: {'open': 2.0, 'high': 3.0, 'low': 1.0, 'close': 2.5, 'volume': 5.0},
+            0: {'open': 1.0, 'high': 9.0, 'low': 0.5, 'close': 2.0, 'volume': 7.0},
+        }
+        for minute, bar in bars.items():
+            rollup.update('rb9999', {'timestamp': START + timedelta(minutes=minute), **bar})
+        bar = rollup.current('rb9999', '5m')
+        assert (bar['open'], bar['high'], bar['low'], bar['close'], bar['volume']) == (1.0, 9.0, 0.5, 2.5, 12.0)
+
+        rollup.update('rb9999', {'timestamp': START + timedelta(minutes=5), **bars[1]})
+        assert rollup.update('rb9999', {'timestamp': START + timedelta(minutes=2), **bars[1]}) == []
+        assert rollup.late_klines == 1
+
+    def test_repush_of_earlier_minute(self):
+        """测试周期内更早的某一分钟被重新推送时替换而不是重复累计"""
+        frame = make_klines(4)
+        rollup = KlineRollup(intervals=['5m'])
+        for timestamp, row in frame.iterrows():
+            rollup.update('rb9999', kline(timestamp, row))
+
+        # 第一分钟和第二分钟的修正值
+        frame.iloc[0] = [4400.0, 4600.0, 4300.0, 4450.0, 500.0]
+        frame.iloc[1, frame.columns.get_loc('volume')] = 1.0
+        for i in (0, 1, 0):
+            rollup.update('rb9999', kline(frame.index[i], frame.iloc[i]))
+
+        bar = rollup.current('rb9999', '5m')
+        expected = rollup_frame(frame, '5m').iloc[0]
+        assert [bar[column] for column in ('open', 'high', 'low', 'close', 'volume')] == pytest.approx(
+            expected[['open', 'high', 'low', 'close', 'volume']].tolist()
+        )
+
+    def test_backfill(self, tmp_path):
+        """测试由数据库中的1分钟K线回填各周期K线"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'klines.db'}")
+        Base.metadata.create_all(bind=engine)
+        frame = make_klines(180)
+        with Session(engine) as session:
+            session.add_all([
+                MarketData(symbol='rb9999', interval='1m', timestamp=ts.to_pydatetime(), **row.to_dict())
+                for ts, row in frame.iterrows()
+            ])
+            session.commit()
+
+        counts = backfill_rollups(engine, 'rb9999', START + timedelta(minutes=7), START + timedelta(hours=2),
+                                  intervals=['5m', '1h'])
+        assert counts == {'5m': 36, '1h': 3}
+        with Session(engine) as session:
+            hourly = load_kline_frame(session, 'rb9999', interval='1h')
+        pd.testing.assert_frame_equal(hourly, rollup_frame(frame, '1h'), check_freq=False, check_names=False)
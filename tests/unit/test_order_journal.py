@@ -0,0 +1,255 @@
+import asyncio
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.models.database import Base, Order, Trade
+from backend.services.order_journal import (
+    OrderJournal, OrderProjector, order_to_event, order_from_event,
+    SUBMITTED, CANCELLED, FILLED
+)
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """创建临时数据库会话工厂"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'orders.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+def make_order(order_id: str) -> Order:
+    return Order(
+        order_id=order_id,
+        user_id=1,
+        symbol='rb9999',
+        side='BUY',
+        order_type='LIMIT',
+        quantity=Decimal('2'),
+        price=Decimal('4500'),
+        time_in_force='GTC',
+        status='PENDING',
+        created_at=datetime(2024, 1, 2, 9, 0)
+    )
+
+def fill_event(order_id: str) -> dict:
+    return {
+        'order_id': order_id,
+        'status': 'FILLED',
+        'executed_quantity': '2',
+        'average_price': '4504.5',
+        'commission': '9.009',
+        'executed_at': datetime(2024, 1, 2, 9, 1).isoformat(),
+        'updated_at': datetime(2024, 1, 2, 9, 1).isoformat()
+    }
+
+class TestOrderJournal:
+    async def test_group_commit(self, tmp_path):
+        """测试并发事件共享一次落盘"""
+        journal = OrderJournal(str(tmp_path / 'orders.journal'))
+        await journal.start()
+        futures = [
+            journal.append(SUBMITTED, order_to_event(make_order(f"o{i}"))) for i in range(200)
+        ]
+        seqs = await asyncio.gather(*futures)
+        await journal.stop()
+
+        assert seqs == list(range(1, 201))
+        assert journal.events_written == 200
+        assert journal.commit_count < 200
+
+    async def test_replay_roundtrip(self, tmp_path):
+        """测试重放还原订单"""
+        path = str(tmp_path / 'orders.journal')
+        journal = OrderJournal(path, fsync=False)
+        await journal.start()
+        await journal.append(SUBMITTED, order_to_event(make_order('o1')))
+        await journal.append(CANCELLED, {'order_id': 'o1', 'status': 'CANCELLED'})
+        await journal.stop()
+
+        replayed = OrderJournal(path).replay()
+        assert [event['type'] for event in replayed] == [SUBMITTED, CANCELLED]
+        order = order_from_event(replayed[0]['data'])
+        assert order.price == Decimal('4500')
+        assert order.created_at == datetime(2024, 1, 2, 9, 0)
+
+    async def test_truncates_torn_tail(self, tmp_path):
+        """测试截断崩溃时写了一半的记录"""
+        path = tmp_path / 'orders.journal'
+        journal = OrderJournal(str(path), fsync=False)
+        await journal.start()
+        await journal.append(SUBMITTED, order_to_event(make_order('o1')))
+        await journal.stop()
+        valid_size = path.stat().st_size
+        with open(path, 'ab') as f:
+            f.write(b'\x40\x00\x00\x00garbage')
+
+        recovered = OrderJournal(str(path))
+        assert len(recovered.replay()) == 1
+        assert path.stat().st_size == valid_size
+        assert recovered.seq == 1
+
+class TestOrderProjector:
+    def test_projects_and_is_idempotent(self, tmp_path, session_factory):
+        """测试事件投影到数据库且重复投影无副作用"""
+        events = [
+            {'seq': 1, 'type': SUBMITTED, 'data': order_to_event(make_order('o1'))},
+            {'seq': 2, 'type': SUBMITTED, 'data': order_to_event(make_order('o2'))},
+            {'seq': 3, 'type': FILLED, 'data': fill_event('o1')},
+            {'seq': 4, 'type': CANCELLED, 'data': {'order_id': 'o2', 'status': 'CANCELLED'}},
+        ]
+        checkpoint = str(tmp_path / 'orders.journal.projected')
+        projector = OrderProjector(session_factory, checkpoint_path=checkpoint)
+        assert projector.apply(events) == 4
+
+        session = session_factory()
+        orders = {row.order_id: row for row in session.query(Order).all()}
+        assert orders['o1'].status == 'FILLED'
+        assert orders['o1'].average_price == Decimal('4504.5')
+        assert orders['o2'].status == 'CANCELLED'
+        trades = session.query(Trade).all()
+        assert len(trades) == 1
+        assert trades[0].order_id == orders['o1'].id
+
+        # 重启后从检查点继续，已投影事件被跳过
+        restarted = OrderProjector(session_factory, checkpoint_path=checkpoint)
+        assert restarted.projected_seq == 4
+        assert restarted.apply(events) == 0
+
+        # 无检查点时重复投影也不会产生重复成交
+        assert OrderProjector(session_factory).apply(events) == 4
+        assert session_factory().query(Trade).count() == 1
+
+class TestJournalRecovery:
+    @staticmethod
+    async def restart(path, checkpoint, session_factory):
+        """模拟执行引擎启动：重放、补投并压缩日志"""
+        import logging
+        import os
+        from backend.services.execution_engine import ExecutionEngine
+        from backend.services.position_ledger import PositionLedger
+        from backend.services.trigger_book import TriggerBook
+
+        engine = ExecutionEngine.__new__(ExecutionEngine)
+        engine.logger = logging.getLogger(__name__)
+        engine.order_journal = OrderJournal(path, fsync=False)
+        engine.order_projector = OrderProjector(session_factory, checkpoint_path=checkpoint)
+        engine.order_journal.listeners.append(engine.order_projector.enqueue)
+        engine.active_orders = {}
+        engine.trigger_book = TriggerBook()
+        engine.position_ledger = PositionLedger(journal_path=os.path.join(os.path.dirname(path), 'positions.log'))
+        engine.position_ledger.load(session_factory())
+        await engine._recover_orders()
+        await engine.order_journal.start()
+        return engine
+
+    async def test_seq_survives_two_restarts(self, tmp_path, session_factory):
+        """测试压缩后连续重启两次，新事件的序号仍高于投影检查点"""
+        path = str(tmp_path / 'orders.journal')
+        checkpoint = f"{path}.projected"
+
+        engine = await self.restart(path, checkpoint, session_factory)
+        for i in range(5):
+            await engine.order_journal.append(SUBMITTED, order_to_event(make_order(f"o{i}")))
+            await engine.order_journal.append(CANCELLED, {'order_id': f"o{i}", 'status': 'CANCELLED'})
+        await engine.order_journal.stop()
+        await engine.order_projector.flush()
+        assert engine.order_projector.projected_seq == 10
+
+        # 第一次重启压缩掉全部已结束订单，第二次重启时日志中没有任何订单事件
+        await (await self.restart(path, checkpoint, session_factory)).order_journal.stop()
+        engine = await self.restart(path, checkpoint, session_factory)
+        seq = await engine.order_journal.append(SUBMITTED, order_to_event(make_order('o99')))
+        await engine.order_journal.stop()
+        await engine.order_projector.flush()
+
+        assert seq == 11
+        assert session_factory().query(Order).filter(Order.order_id == 'o99').count() == 1
+
+    async def test_fill_missing_from_ledger_is_reconciled(self, tmp_path, session_factory):
+        """测试 FILLED 落盘后、更新持仓前崩溃，重启补记持仓且再次重启不重复记入"""
+        path = str(tmp_path / 'orders.journal')
+        checkpoint = f"{path}.projected"
+
+        engine = await self.restart(path, checkpoint, session_factory)
+        await engine.order_journal.append(SUBMITTED, order_to_event(make_order('o1')))
+        await engine.order_journal.append(FILLED, fill_event('o1'))
+        seq = await engine.order_journal.append(SUBMITTED, order_to_event(make_order('o2')))
+        await engine.order_journal.append(FILLED, fill_event('o2'))
+        engine.position_ledger.apply_fill(1, 'rb9999', 'BUY', Decimal('2'), Decimal('4504.5'), seq=seq - 1)
+        await engine.order_journal.stop()
+        engine.position_ledger.close()
+
+        for _ in range(2):
+            engine = await self.restart(path, checkpoint, session_factory)
+            position = engine.position_ledger.get(1, 'rb9999')
+            assert position.quantity == Decimal('4')
+            assert engine.position_ledger.applied_seq == seq + 1
+            await engine.order_journal.stop()
+            engine.position_ledger.close()
+
+    def test_compact_keeps_high_water_mark(self, tmp_path):
+        """测试压缩后的日志重放时序号不回退，且标记不作为事件返回"""
+        path = str(tmp_path / 'orders.journal')
+        journal = OrderJournal(path, fsync=False)
+        journal.seq = 42
+        journal.compact([])
+
+        recovered = OrderJournal(path)
+        assert recovered.replay() == []
+        assert recovered.seq == 42
+
+class TestJournalBeforeState:
+    @staticmethod
+    def make_engine(tmp_path):
+        """创建使用临时日志路径的执行引擎（订单日志未启动，写日志会失败）"""
+        from unittest.mock import Mock
+        from backend.services.execution_engine import ExecutionEngine
+
+        return ExecutionEngine(Mock(), Mock(), {
+            'trading.position_journal': str(tmp_path / 'positions.log'),
+            'trading.order_journal': str(tmp_path / 'orders.journal'),
+            'trading.order_journal_fsync': False
+        })
+
+    async def test_failed_fill_keeps_order_active(self, tmp_path):
+        """测试 FILLED 写日志失败时订单仍为活动订单，持仓不变"""
+        engine = self.make_engine(tmp_path)
+        order = make_order('o1')
+        engine.active_orders['o1'] = order
+        await engine._execute_market_order(order, Decimal('4500'))
+
+        assert order.status == 'PENDING'
+        assert 'o1' in engine.active_orders and 'o1' in engine.trigger_book
+        assert engine.position_ledger.get(1, 'rb9999') is None
+
+        await engine.order_journal.start()
+        await engine._execute_market_order(order, Decimal('4500'))
+        await engine.order_journal.stop()
+        assert order.status == 'FILLED'
+        assert 'o1' not in engine.active_orders and 'o1' not in engine.trigger_book
+        assert engine.position_ledger.get(1, 'rb9999').quantity == Decimal('2')
+
+    async def test_failed_cancel_keeps_order_active(self, tmp_path):
+        """测试 CANCELLED 写日志失败时内存中的订单不被撤销"""
+        engine = self.make_engine(tmp_path)
+        order = make_order('o1')
+        engine.active_orders['o1'] = order
+        engine.trigger_book.add(order)
+
+        ok, _ = await engine.cancel_order('o1')
+        assert not ok
+        assert order.status == 'PENDING'
+        assert 'o1' in engine.active_orders and 'o1' in engine.trigger_book
+
+        await engine.order_journal.start()
+        assert (await engine.cancel_order('o1'))[0]
+        await engine.order_journal.stop()
+        assert order.status == 'CANCELLED'
+        assert 'o1' not in engine.active_orders and 'o1' not in engine.trigger_book
+
+    def test_projector_event_created_in_run(self, tmp_path, session_factory):
+        """测试投影器在构造时不创建事件循环对象"""
+        projector = OrderProjector(session_factory, checkpoint_path=str(tmp_path / 'projected'))
+        assert projector._ready is None
+        projector.enqueue([{'seq': 1, 'type': SUBMITTED, 'data': order_to_event(make_order('o1'))}] * 600)
+        assert projector.lag == 600
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backend.services.backtest_service import BacktestService
+from backend.services.parameter_sweep import (
+    ParameterSweep, grid_samples, random_samples, latin_hypercube_samples,
+    share_frame, attach_frame, parse_parameter
+)
+from backend.strategy.ma_cross_strategy import MACrossStrategy
+
+STRATEGY_KWARGS = {'symbol': 'rb9999', 'timeframe': '1m'}
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(9)
+    close = 4500 + np.cumsum(rng.normal(0, 5, 5000))
+    index = pd.date_range('2024-01-01', periods=len(close), freq='min')
+    return pd.DataFrame({
+        'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 1.0
+    }, index=index)
+
+class TestSampling:
+    def test_grid(self):
+        """测试网格采样"""
+        samples = grid_samples({'fast_period': [5, 10], 'slow_period': [20, 30, 40]})
+        assert len(samples) == 6
+        assert samples[0] == {'fast_period': 5, 'slow_period': 20}
+
+    def test_latin_hypercube_covers_strata(self):
+        """测试拉丁超立方每个区间恰好一个样本"""
+        samples = latin_hypercube_samples({'x': (0.0, 1.0), 'n': (1, 10)}, 10, seed=1)
+        strata = sorted(int(sample['x'] * 10) for sample in samples)
+        assert strata == list(range(10))
+        assert sorted(sample['n'] for sample in samples) == list(range(1, 11))
+
+    def test_random_bounds_and_choices(self):
+        """测试随机采样的取值范围"""
+        samples = random_samples({'fast_period': (2, 8), 'mode': ['a', 'b']}, 200, seed=2)
+        assert all(2 <= sample['fast_period'] <= 8 for sample in samples)
+        assert {sample['mode'] for sample in samples} == {'a', 'b'}
+
+    def test_parse_parameter(self):
+        """测试命令行参数解析"""
+        assert parse_parameter('fast_period=5:15:5', 'grid') == ('fast_period', [5, 10, 15])
+        assert parse_parameter('fast_period=5:15', 'lhs') == ('fast_period', (5, 15))
+        assert parse_parameter('period=10,20', 'random') == ('period', [10, 20])
+
+class TestParameterSweep:
+    def test_shared_frame_roundtrip(self, data):
+        """测试共享内存数据与原数据一致"""
+        shm, spec = share_frame(data)
+        try:
+            attached_shm, frame = attach_frame(spec)
+            np.testing.assert_array_equal(frame.to_numpy(), data.to_numpy())
+            assert (frame.index == data.index).all()
+            attached_shm.close()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def test_parallel_matches_serial(self, data):
+        """测试多进程扫描结果与逐个回测一致并按指标排序"""
+        param_sets = grid_samples({'fast_period': [5, 10, 15], 'slow_period': [20, 40]})
+        sweep = ParameterSweep(MACrossStrategy, data, STRATEGY_KWARGS, max_workers=2, chunksize=2)
+        table = sweep.run(param_sets, rank_by='total_return')
+
+        assert len(table) == 6
+        assert table['total_return'].is_monotonic_decreasing
+        for row in table.itertuples():
+            strategy = MACrossStrategy('rb9999', '1m', row.fast_period, row.slow_period)
+            expected = BacktestService().run_vectorized(data, strategy.generate_positions(data))
+            assert row.total_return == pytest.approx(expected['metrics']['total_return'])
+
+    def test_constraint_and_streaming(self, data):
+        """测试参数约束和结果回调"""
+        seen = []
+        sweep = ParameterSweep(MACrossStrategy, data, STRATEGY_KWARGS, max_workers=1)
+        table = sweep.run(
+            grid_samples({'fast_period': [5, 30], 'slow_period': [20, 40]}),
+            constraint=lambda params: params['fast_period'] < params['slow_period'],
+            on_result=seen.append
+        )
+        assert len(seen) == len(table) == 3
@@ -0,0 +1,83 @@
+import time
+import numpy as np
+import pandas as pd
+from backend.services.portfolio_backtest import (
+    PortfolioBacktestService, align_panel, rebalance_points, signal_to_weights
+)
+from backend.strategy.ma_cross_strategy import MACrossStrategy
+
+def make_frames(n_symbols: int, length: int, seed: int = 4):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-01-01', periods=length, freq='D')
+    return {
+        f"S{i:03d}": pd.DataFrame(
+            {'close': 100 * np.exp(np.cumsum(rng.normal(0, 0.01, length)))}, index=index
+        )
+        for i in range(n_symbols)
+    }
+
+def reference_run(prices, weights, points, initial_capital, commission_rate):
+    """逐合约循环的参考实现"""
+    cash = initial_capital
+    shares = [0.0] * prices.shape[1]
+    equity = []
+    for t in range(len(prices)):
+        if t in points:
+            value = cash + sum(s * p for s, p in zip(shares, prices[t]))
+            for j in range(prices.shape[1]):
+                target = weights[t, j] * value / prices[t, j]
+                traded = (target - shares[j]) * prices[t, j]
+                cash -= traded + abs(traded) * commission_rate
+                shares[j] = target
+        equity.append(cash + sum(s * p for s, p in zip(shares, prices[t])))
+    return equity
+
+class TestPortfolioBacktest:
+    def test_align_panel(self):
+        """测试时间对齐与缺失价格处理"""
+        frames = {
+            'A': pd.DataFrame({'close': [1.0, 2.0, 3.0]}, index=pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-04'])),
+            'B': pd.DataFrame({'close': [10.0, 11.0]}, index=pd.to_datetime(['2024-01-02', '2024-01-03']))
+        }
+        index, symbols, prices = align_panel(frames)
+        assert symbols == ['A', 'B']
+        assert len(index) == 4
+        np.testing.assert_array_equal(prices[:, 0], [1.0, 2.0, 2.0, 3.0])
+        assert np.isnan(prices[0, 1])
+        np.testing.assert_array_equal(prices[1:, 1], [10.0, 11.0, 11.0])
+
+    def test_rebalance_points(self):
+        """测试调仓点计算"""
+        index = pd.date_range('2024-01-01', periods=60, freq='D')
+        np.testing.assert_array_equal(rebalance_points(index, 20), [0, 20, 40])
+        np.testing.assert_array_equal(rebalance_points(index, 'M'), [0, 31])
+
+    def test_matches_reference(self):
+        """测试矩阵运算结果与逐合约循环一致"""
+        frames = make_frames(5, 300)
+        index, symbols, prices = align_panel(frames)
+        rng = np.random.default_rng(1)
+        weights = signal_to_weights(rng.random(prices.shape))
+        result = PortfolioBacktestService().run(
+            index, symbols, prices, weights, rebalance=10, commission_rate=0.001
+        )
+
+        expected = reference_run(prices, weights, set(range(0, 300, 10)), 1000000.0, 0.001)
+        np.testing.assert_allclose(result['equity_curve'], expected)
+        assert result['holdings'].shape == (30, 5)
+        assert result['metrics']['total_commission'] > 0
+
+    def test_strategy_universe(self):
+        """测试500个合约的策略组合回测"""
+        frames = make_frames(500, 1000)
+        strategy = MACrossStrategy('universe', '1d', fast_period=5, slow_period=20)
+
+        start = time.perf_counter()
+        result = PortfolioBacktestService().run_strategy(
+            strategy, frames, rebalance=5, commission_rate=0.0005
+        )
+        elapsed = time.perf_counter() - start
+
+        assert len(result['equity_curve']) == 1000
+        assert len(result['final_positions']) == 500
+        assert elapsed < 10
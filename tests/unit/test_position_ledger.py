@@ -0,0 +1,87 @@
+import pytest
+from decimal import Decimal
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.models.database import Base, Position
+from backend.services.position_ledger import PositionLedger
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """创建临时数据库会话工厂"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'positions.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+class TestPositionLedger:
+    def test_apply_fill(self):
+        """测试成交更新持仓"""
+        ledger = PositionLedger()
+        ledger.apply_fill(1, 'rb9999', 'BUY', Decimal('2'), Decimal('4500'))
+        ledger.apply_fill(1, 'rb9999', 'BUY', Decimal('2'), Decimal('4600'))
+        position = ledger.get(1, 'rb9999')
+        assert position.quantity == Decimal('4')
+        assert position.average_price == Decimal('4550')
+
+        ledger.apply_fill(1, 'rb9999', 'SELL', Decimal('4'), Decimal('4700'))
+        assert ledger.get(1, 'rb9999') is None
+        assert ledger.positions_for(1) == []
+
+    def test_snapshot_and_reload(self, tmp_path, session_factory):
+        """测试快照写入数据库并重新加载"""
+        journal = str(tmp_path / 'positions.log')
+        ledger = PositionLedger(journal_path=journal)
+        ledger.apply_fill(1, 'rb9999', 'BUY', Decimal('3'), Decimal('4500'))
+        ledger.apply_fill(2, 'hc9999', 'BUY', Decimal('1'), Decimal('3800'))
+
+        session = session_factory()
+        assert ledger.snapshot(session) == 2
+        assert session.query(Position).count() == 2
+        ledger.close()
+
+        reloaded = PositionLedger(journal_path=journal)
+        reloaded.load(session_factory())
+        assert reloaded.get(1, 'rb9999').quantity == Decimal('3')
+        assert len(reloaded.positions) == 2
+
+    def test_journal_replay_after_crash(self, tmp_path, session_factory):
+        """测试快照之后的成交通过日志恢复"""
+        journal = str(tmp_path / 'positions.log')
+        ledger = PositionLedger(journal_path=journal)
+        ledger.apply_fill(1, 'rb9999', 'BUY', Decimal('3'), Decimal('4500'))
+        ledger.snapshot(session_factory())
+        ledger.apply_fill(1, 'rb9999', 'SELL', Decimal('1'), Decimal('4600'))
+        ledger.apply_fill(1, 'hc9999', 'BUY', Decimal('5'), Decimal('3800'))
+        ledger.close()  # 模拟未完成快照即退出
+
+        recovered = PositionLedger(journal_path=journal)
+        recovered.load(session_factory())
+        assert recovered.get(1, 'rb9999').quantity == Decimal('2')
+        assert recovered.get(1, 'hc9999').quantity == Decimal('5')
+
+    def test_applied_seq_survives_snapshot(self, tmp_path, session_factory):
+        """测试快照删除成交日志后，已应用的成交序号仍可恢复"""
+        journal = str(tmp_path / 'positions.log')
+        ledger = PositionLedger(journal_path=journal)
+        ledger.apply_fill(1, 'rb9999', 'BUY', Decimal('3'), Decimal('4500'), seq=7)
+        ledger.snapshot(session_factory())
+        ledger.apply_fill(1, 'rb9999', 'BUY', Decimal('1'), Decimal('4500'), seq=9)
+        ledger.close()
+
+        recovered = PositionLedger(journal_path=journal)
+        recovered.load(session_factory())
+        assert recovered.applied_seq == 9
+        recovered.snapshot(session_factory())
+        recovered.close()
+
+        reloaded = PositionLedger(journal_path=journal)
+        reloaded.load(session_factory())
+        assert reloaded.applied_seq == 9
+        assert reloaded.get(1, 'rb9999').quantity == Decimal('4')
+
+    async def test_snapshot_async(self, tmp_path, session_factory):
+        """测试异步快照"""
+        ledger = PositionLedger(journal_path=str(tmp_path / 'positions.log'))
+        ledger.apply_fill(1, 'rb9999', 'BUY', Decimal('1'), Decimal('4500'))
+        assert await ledger.snapshot_async(session_factory) == 1
+        assert await ledger.snapshot_async(session_factory) == 0
+        assert [path.name for path in tmp_path.glob('positions.log.*')] == ['positions.log.seq']
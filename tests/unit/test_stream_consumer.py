@@ -0,0 +1,62 @@
+import pytest
+from backend.services.stream_consumer import MarketDataStreamConsumer
+
+fakeredis = pytest.importorskip('fakeredis')
+
+STREAM = 'market_data'
+
+@pytest.fixture
+def redis_client():
+    """创建内存Redis"""
+    return fakeredis.FakeRedis()
+
+def publish(redis_client, count: int, start: int = 0):
+    for i in range(start, start + count):
+        redis_client.xadd(STREAM, {'type': 'price', 'symbol': 'rb9999', 'price': str(4500 + i)})
+
+def make_consumer(redis_client, name: str) -> MarketDataStreamConsumer:
+    consumer = MarketDataStreamConsumer(
+        redis_client, STREAM, group='md', consumer=name, batch_size=10, block_ms=None
+    )
+    consumer.ensure_group()
+    return consumer
+
+class TestMarketDataStreamConsumer:
+    def test_messages_are_not_redelivered(self, redis_client):
+        """测试确认后的消息不会被重复读取"""
+        consumer = make_consumer(redis_client, 'c1')
+        publish(redis_client, 5)
+
+        first = consumer.read_batch()
+        assert [data['price'] for _, data in first] == ['4500', '4501', '4502', '4503', '4504']
+        consumer.ack([message_id for message_id, _ in first])
+
+        assert consumer.read_batch() == []
+        publish(redis_client, 2, start=5)
+        assert [data['price'] for _, data in consumer.read_batch()] == ['4505', '4506']
+
+    def test_consumers_share_stream(self, redis_client):
+        """测试同一消费组内的多个消费者分摊消息"""
+        c1 = make_consumer(redis_client, 'c1')
+        c2 = make_consumer(redis_client, 'c2')
+        publish(redis_client, 15)
+
+        batch1 = c1.read_batch()
+        batch2 = c2.read_batch()
+        ids1 = {message_id for message_id, _ in batch1}
+        ids2 = {message_id for message_id, _ in batch2}
+        assert len(ids1) == 10
+        assert len(ids2) == 5
+        assert not ids1 & ids2
+
+    def test_restart_resumes_pending(self, redis_client):
+        """测试重启后先处理未确认的消息"""
+        consumer = make_consumer(redis_client, 'c1')
+        publish(redis_client, 3)
+        consumer.read_batch()  # 读取但未确认
+
+        restarted = make_consumer(redis_client, 'c1')
+        pending = restarted.read_batch()
+        assert len(pending) == 3
+        restarted.ack([message_id for message_id, _ in pending])
+        assert restarted.get_lag()['pending'] == 0
@@ -0,0 +1,85 @@
+import json
+import time
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.models.database import Base, MarketData
+from backend.services.trading_service import KLINE_FRAME_HEADER, TradingService
+
+START = datetime(2024, 1, 2, 9, 0)
+
+@pytest.fixture
+def service(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'klines.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    session = factory()
+    session.add_all([
+        MarketData(symbol='rb9999', interval='1m', timestamp=START + timedelta(minutes=i),
+                   open=i, high=i + 1, low=i - 1, close=i + 0.5, volume=10)
+        for i in range(30)
+    ])
+    session.commit()
+    session.close()
+    return TradingService(session_factory=factory)
+
+class TestGetKlines:
+    def test_cursor_pagination(self, service):
+        """测试按游标逐页获取K线"""
+        first = service.get_klines('rb9999', start_time=START.isoformat(), limit=20)
+        assert len(first['klines']['close']) == 20
+        assert first['klines']['timestamp'][0] == int(START.timestamp() * 1000)
+
+        second = service.get_klines('rb9999', start_time=START.isoformat(), limit=20,
+                                    cursor=first['next_cursor'])
+        assert second['klines']['open'] == [float(i) for i in range(20, 30)]
+        assert second['next_cursor'] is None
+
+    def test_time_range(self, service):
+        """测试按时间范围过滤"""
+        page = service.get_klines('rb9999', start_time=(START + timedelta(minutes=5)).isoformat(),
+                                  end_time=(START + timedelta(minutes=9)).isoformat())
+        assert page['klines']['open'] == [5.0, 6.0, 7.0, 8.0, 9.0]
+
+    def test_stream_ndjson(self, service):
+        """测试 NDJSON 流式输出全部K线"""
+        body = b''.join(service.stream_klines('rb9999', fmt='ndjson', page_size=7))
+        rows = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+        assert len(rows) == 30
+        assert rows[-1]['close'] == 29.5
+
+    def test_stream_binary(self, service):
+        """测试二进制帧可按列解码"""
+        frames = list(service.stream_klines('rb9999', fmt='binary', page_size=16))
+        assert len(frames) == 2
+
+        (count,) = KLINE_FRAME_HEADER.unpack_from(frames[1])
+        assert count == 14
+        body = np.frombuffer(frames[1], dtype='<f8', offset=KLINE_FRAME_HEADER.size + 8 * count)
+        np.testing.assert_array_equal(body[3 * count:4 * count], np.arange(16, 30) + 0.5)
+
+    def test_local_time_epoch(self, service, monkeypatch):
+        """测试本地时区不是 UTC 时，毫秒时间戳按本地时间换算且可作为查询参数往返"""
+        monkeypatch.setenv('TZ', 'Asia/Shanghai')
+        time.tzset()
+        try:
+            page = service.get_klines('rb9999', limit=1)
+            epoch = page['klines']['timestamp'][0]
+            assert epoch == int(START.timestamp() * 1000)
+            assert epoch == int((START - timedelta(hours=8) - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+            shifted = service.get_klines('rb9999', start_time=str(epoch + 5 * 60_000), limit=1)
+            assert shifted['klines']['open'] == [5.0]
+            frame = next(service.stream_klines('rb9999', fmt='binary'))
+            stamps = np.frombuffer(frame, dtype='<i8', count=1, offset=KLINE_FRAME_HEADER.size)
+            assert stamps[0] == epoch
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+
+    def test_unsupported_format(self, service):
+        """测试不支持的格式"""
+        with pytest.raises(ValueError):
+            next(service.stream_klines('rb9999', fmt='csv'))
@@ -0,0 +1,71 @@
+import random
+from decimal import Decimal
+from types import SimpleNamespace
+from backend.services.trigger_book import TriggerBook
+
+def make_order(order_id, side, order_type, price, symbol='rb9999'):
+    return SimpleNamespace(
+        order_id=order_id,
+        symbol=symbol,
+        side=side,
+        order_type=order_type,
+        price=Decimal(str(price)) if order_type == 'LIMIT' else None,
+        stop_price=Decimal(str(price)) if order_type == 'STOP' else None,
+        status='PENDING'
+    )
+
+def is_triggered(order, price: Decimal) -> bool:
+    """与原有逐单扫描逻辑一致的触发条件"""
+    if order.order_type == 'LIMIT':
+        return price <= order.price if order.side == 'BUY' else price >= order.price
+    return price >= order.stop_price if order.side == 'BUY' else price <= order.stop_price
+
+class TestTriggerBook:
+    def test_triggers_only_crossed_orders(self):
+        """测试只触发被穿越的订单"""
+        book = TriggerBook()
+        book.add(make_order('b1', 'BUY', 'LIMIT', 4500))
+        book.add(make_order('b2', 'BUY', 'LIMIT', 4400))
+        book.add(make_order('s1', 'SELL', 'LIMIT', 4600))
+        book.add(make_order('ss', 'SELL', 'STOP', 4450))
+        book.add(make_order('bs', 'BUY', 'STOP', 4700))
+
+        assert [o.order_id for o in book.pop_triggered('rb9999', Decimal('4450'))] == ['b1', 'ss']
+        assert [o.order_id for o in book.pop_triggered('rb9999', Decimal('4700'))] == ['s1', 'bs']
+        assert [o.order_id for o in book.pop_triggered('rb9999', Decimal('4400'))] == ['b2']
+        assert len(book) == 0
+
+    def test_discard_and_other_symbols(self):
+        """测试撤单和合约隔离"""
+        book = TriggerBook()
+        book.add(make_order('b1', 'BUY', 'LIMIT', 4500))
+        book.add(make_order('h1', 'BUY', 'LIMIT', 4500, symbol='hc9999'))
+        book.discard('b1')
+
+        assert book.pop_triggered('rb9999', Decimal('4000')) == []
+        assert [o.order_id for o in book.pop_triggered('hc9999', Decimal('4000'))] == ['h1']
+        assert not book.add(make_order('m1', 'BUY', 'MARKET', 4500))
+
+    def test_matches_full_scan(self):
+        """测试与全量扫描结果一致"""
+        rng = random.Random(42)
+        book = TriggerBook()
+        active = {}
+        for i in range(2000):
+            order = make_order(
+                f"o{i}", rng.choice(['BUY', 'SELL']), rng.choice(['LIMIT', 'STOP']),
+                rng.randint(4000, 5000)
+            )
+            book.add(order)
+            active[order.order_id] = order
+        for order_id in rng.sample(sorted(active), 300):
+            book.discard(order_id)
+            del active[order_id]
+
+        for _ in range(200):
+            price = Decimal(rng.randint(3900, 5100))
+            expected = {o.order_id for o in active.values() if is_triggered(o, price)}
+            triggered = {o.order_id for o in book.pop_triggered('rb9999', price)}
+            assert triggered == expected
+            for order_id in triggered:
+                del active[order_id]
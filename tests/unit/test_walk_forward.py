@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backend.services.backtest_service import BacktestService
+from backend.services.parameter_sweep import grid_samples
+from backend.services.walk_forward import WalkForwardOptimizer, make_folds
+from backend.strategy.ma_cross_strategy import MACrossStrategy
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(21)
+    close = 4500 + np.cumsum(rng.normal(0, 5, 3000))
+    index = pd.date_range('2024-01-01', periods=len(close), freq='min')
+    return pd.DataFrame({'close': close}, index=index)
+
+PARAM_SETS = grid_samples({'fast_period': [5, 10], 'slow_period': [20, 50]})
+
+class TestWalkForward:
+    def test_make_folds(self):
+        """测试滚动与锚定窗口划分"""
+        folds = make_folds(100, train_size=40, test_size=20)
+        assert [(f.train_start, f.train_end, f.test_start, f.test_end) for f in folds] == [
+            (0, 40, 40, 60), (20, 60, 60, 80), (40, 80, 80, 100)
+        ]
+        anchored = make_folds(100, train_size=40, test_size=20, anchored=True)
+        assert all(fold.train_start == 0 for fold in anchored)
+
+    def test_make_folds_rejects_overlapping_tests(self):
+        """测试步长小于样本外窗口时报错，大于时窗口之间留空"""
+        with pytest.raises(ValueError):
+            make_folds(100, train_size=40, test_size=20, step=10)
+        folds = make_folds(100, train_size=40, test_size=20, step=30)
+        assert [(f.test_start, f.test_end) for f in folds] == [(40, 60), (70, 90)]
+
+    def test_stitch_scales_trades(self):
+        """测试拼接时后续窗口的成交数量、手续费和盈亏按期初资金比例放大"""
+        optimizer = WalkForwardOptimizer.__new__(WalkForwardOptimizer)
+        optimizer.initial_capital = 100.0
+        optimizer.folds = make_folds(6, train_size=2, test_size=2)
+        trade = {'timestamp': 0, 'type': 'BUY', 'price': 10.0, 'quantity': 1.0, 'commission': 0.1, 'pnl': 5.0}
+        tests = {
+            0: {'equity_curve': [100.0, 150.0], 'trades': [trade]},
+            1: {'equity_curve': [100.0, 120.0], 'trades': [trade]}
+        }
+
+        equity_curve, trades = optimizer._stitch(tests)
+        assert equity_curve == [100.0, 150.0, 150.0, 180.0]
+        assert trades[0] == trade
+        assert (trades[1]['quantity'], trades[1]['commission'], trades[1]['pnl']) == (1.5, pytest.approx(0.15), 7.5)
+        assert trades[1]['price'] == 10.0
+
+    @pytest.mark.parametrize('max_workers', [1, 2])
+    def test_selects_best_and_stitches(self, data, max_workers):
+        """测试每个窗口选出样本内最优参数并拼接样本外权益"""
+        optimizer = WalkForwardOptimizer(
+            MACrossStrategy, data, PARAM_SETS, train_size=1000, test_size=500,
+            strategy_kwargs={'symbol': 'rb9999', 'timeframe': '1m'},
+            rank_by='total_return', max_workers=max_workers
+        )
+        result = optimizer.run()
+
+        assert len(result['folds']) == 4
+        assert len(result['equity_curve']) == len(result['timestamps']) == 2000
+        assert result['timestamps'][0] == data.index[1000]
+
+        # 第一个窗口的最优参数与逐个回测一致
+        fold = result['folds'][0]
+        train = data.iloc[:1000]
+        returns = []
+        for params in PARAM_SETS:
+            strategy = MACrossStrategy('rb9999', '1m', **params)
+            positions = strategy.generate_positions(data)[:1000]
+            returns.append(BacktestService().run_vectorized(train, positions)['metrics']['total_return'])
+        assert fold['best_params'] == PARAM_SETS[int(np.argmax(returns))]
+
+        # 后一窗口从前一窗口的期末权益开始
+        def oos_curve(fold):
+            strategy = MACrossStrategy('rb9999', '1m', **fold['best_params'])
+            positions = strategy.generate_positions(data)[fold['test_start']:fold['test_end']]
+            window = data.iloc[fold['test_start']:fold['test_end']]
+            return BacktestService().run_vectorized(window, positions)['equity_curve']
+
+        first, second = oos_curve(result['folds'][0]), oos_curve(result['folds'][1])
+        np.testing.assert_allclose(result['equity_curve'][:500], first)
+        np.testing.assert_allclose(
+            result['equity_curve'][500:1000], np.asarray(second) * first[-1] / 100000.0
+        )
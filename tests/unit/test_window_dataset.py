@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from backend.data.data_processor import DataProcessor
+from backend.data.window_dataset import FeatureArrayWriter, WindowDataset, open_feature_arrays
+
+def write_segments(directory, lengths, n_features=2):
+    """按段写入可由数值反推行号的特征，标签为全局行号"""
+    offset = 0
+    with FeatureArrayWriter(str(directory), n_features) as writer:
+        for length in lengths:
+            rows = np.arange(offset, offset + length, dtype=float)
+            writer.append(np.repeat(rows[:, None], n_features, axis=1), rows[:-1])
+            offset += length
+
+class TestFeatureArrays:
+    def test_roundtrip_memmap(self, tmp_path):
+        """测试写入后以 memmap 打开，分段与数据一致"""
+        write_segments(tmp_path, [30, 50])
+        X, y, segments = open_feature_arrays(str(tmp_path))
+
+        assert isinstance(X, np.memmap) and X.shape == (80, 2)
+        assert segments == [(0, 30), (30, 80)]
+        np.testing.assert_array_equal(X[:, 0], np.arange(80))
+        assert y[29] == 0 and y[30] == 30
+
+    def test_write_training_arrays_skips_warmup(self, tmp_path):
+        """测试 DataProcessor 写出的数据不含指标预热期的 NaN"""
+        rng = np.random.default_rng(3)
+        frames = []
+        for _ in range(2):
+            close = 4500 + np.cumsum(rng.normal(0, 5, 200))
+            frames.append(pd.DataFrame({'open': close, 'high': close + 1, 'low': close - 1,
+                                        'close': close, 'volume': np.ones(len(close))}))
+
+        rows = DataProcessor.__new__(DataProcessor).write_training_arrays(frames, str(tmp_path))
+        X, y, segments = open_feature_arrays(str(tmp_path))
+        assert rows == len(X) and len(segments) == 2
+        assert np.isfinite(X).all()
+
+class TestWindowDataset:
+    def test_windows_stay_within_segments(self, tmp_path):
+        """测试窗口不跨越分段，样本数与 prepare_training_data 一致"""
+        write_segments(tmp_path, [30, 50])
+        dataset = WindowDataset.from_directory(str(tmp_path), lookback=10, batch_size=8)
+
+        assert dataset.num_samples == (30 - 11) + (50 - 11)
+        for windows, targets in dataset:
+            np.testing.assert_array_equal(windows[:, -1, 0] + 1, targets)
+            assert not ((windows[:, 0, 0] < 30) & (windows[:, -1, 0] >= 30)).any()
+
+    def test_split_and_prefetch(self, tmp_path):
+        """测试每段按时间划分验证集，预取与顺序读取结果一致"""
+        write_segments(tmp_path, [60, 60])
+        dataset = WindowDataset.from_directory(str(tmp_path), lookback=5, batch_size=7, shuffle=True, seed=2)
+        train, val = dataset.split(0.25)
+
+        train_targets = np.concatenate([targets for _, targets in train])
+        val_targets = np.concatenate([targets for _, targets in val])
+        assert len(train_targets) + len(val_targets) == dataset.num_samples
+        assert train_targets[train_targets < 60].max() < val_targets[val_targets < 60].min()
+        assert train_targets[train_targets >= 60].max() < val_targets[val_targets >= 60].min()
+
+        for (X_a, y_a), (X_b, y_b) in zip(val, val.prefetch(buffer_size=3, workers=2)):
+            np.testing.assert_array_equal(X_a, X_b)
+            np.testing.assert_array_equal(y_a, y_b)
+        assert sum(1 for _ in train.prefetch()) == len(train)
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backend.data.data_processor import DataProcessor
+from backend.data.windowing import WindowBatchGenerator, sliding_windows
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(8)
+    close = 4500 + np.cumsum(rng.normal(0, 5, 300))
+    return pd.DataFrame({'open': close, 'high': close + 1, 'low': close - 1,
+                         'close': close, 'volume': np.ones(len(close))})
+
+def loop_windows(X, y, lookback):
+    """原有的逐个切片实现"""
+    X_sequences, y_sequences = [], []
+    for i in range(len(X) - lookback - 1):
+        X_sequences.append(X[i:(i + lookback)])
+        y_sequences.append(y[i + lookback])
+    return np.array(X_sequences), np.array(y_sequences)
+
+class TestSlidingWindows:
+    def test_view_matches_slices(self):
+        """测试窗口视图与切片一致且不复制数据"""
+        X = np.arange(40, dtype=float).reshape(20, 2)
+        windows = sliding_windows(X, 5)
+        assert windows.shape == (16, 5, 2)
+        np.testing.assert_array_equal(windows[3], X[3:8])
+        assert np.shares_memory(windows, X)
+        assert sliding_windows(X, 30).shape == (0, 30, 2)
+
+    def test_prepare_training_data_unchanged(self, frame):
+        """测试 prepare_training_data 与原循环实现结果一致"""
+        processor = DataProcessor.__new__(DataProcessor)
+        X_sequences, y_sequences = processor.prepare_training_data(frame.copy(), lookback=20)
+
+        X, y = processor._training_arrays(frame.copy())
+        expected_X, expected_y = loop_windows(X, y, 20)
+        np.testing.assert_array_equal(X_sequences, expected_X)
+        np.testing.assert_array_equal(y_sequences, expected_y)
+
+class TestWindowBatchGenerator:
+    def test_batches_cover_all_samples(self):
+        """测试按顺序分批覆盖全部样本"""
+        X = np.random.default_rng(0).normal(size=(103, 3))
+        y = np.arange(102)
+        generator = WindowBatchGenerator(X, y, lookback=10, batch_size=32)
+        expected_X, expected_y = loop_windows(X, y, 10)
+
+        batches = list(generator)
+        assert len(batches) == len(generator) == 3
+        np.testing.assert_array_equal(np.concatenate([b[0] for b in batches]), expected_X)
+        np.testing.assert_array_equal(np.concatenate([b[1] for b in batches]), expected_y)
+
+    def test_time_ordered_split_and_shuffle(self, tmp_path):
+        """测试按时间划分训练/验证集，打乱不跨越划分边界，并支持 memmap 数据"""
+        X = np.lib.format.open_memmap(str(tmp_path / 'X.npy'), mode='w+', dtype='f4', shape=(210, 2))
+        X[:] = np.arange(420, dtype='f4').reshape(210, 2)
+        y = np.arange(209)
+        train, val = WindowBatchGenerator(X, y, lookback=9, batch_size=16, shuffle=True, seed=1).split(0.25)
+
+        assert train.num_samples + val.num_samples == 200
+        train_targets = np.concatenate([batch[1] for batch in train])
+        val_targets = np.concatenate([batch[1] for batch in val])
+        assert sorted(train_targets) == list(range(9, 159))
+        assert val_targets.min() > train_targets.max()
+        for windows, targets in val:
+            np.testing.assert_array_equal(windows[:, -1, 0], (targets - 1) * 2)